@@ -47,3 +47,12 @@ def TRIVIA_QA(*args, **kwargs):
     from data_mine.nlp.trivia_qa import TriviaQADataset
     return TriviaQADataset(*args, **kwargs)
 
+
+def get_by_ids(*args, **kwargs):
+    from data_mine.nlp.lookup import get_by_ids
+    return get_by_ids(*args, **kwargs)
+
+
+def iter_batches(*args, **kwargs):
+    from data_mine.nlp.batches import iter_batches
+    return iter_batches(*args, **kwargs)
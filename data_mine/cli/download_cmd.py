@@ -1,3 +1,4 @@
+import functools
 import os
 import sys
 
@@ -11,9 +12,12 @@ def download():
     assert(len(sys.argv) >= 1)
     assert(sys.argv[0] == "data_mine download")
 
-    if len(sys.argv) != 2:
-        msg.error("Usage: python -m data_mine download <dataset_name>", exits=1)  # noqa: E501
-    dataset_name = sys.argv[1]
+    args = sys.argv[1:]
+    force = "--force" in args  # Re-hash all the files of the dataset.
+    args = [arg for arg in args if arg != "--force"]
+    if len(args) != 1:
+        msg.error("Usage: python -m data_mine download <dataset_name> [--force]", exits=1)  # noqa: E501
+    dataset_name = args[0]
     if dataset_name not in set([x.name for x in Collection]):
         msg.error("Invalid dataset: {}".format(dataset_name))
         msg.info("Available datasets:")
@@ -21,7 +25,10 @@ def download():
 
     dataset_id = Collection.from_str(dataset_name)
     msg.info("Checking if {} is already downloaded ...".format(dataset_name))
-    return_code = download_dataset(dataset_id, check_deep_integrity)
+    integrity_check = check_deep_integrity
+    if force:
+        integrity_check = functools.partial(check_deep_integrity, force=True)
+    return_code = download_dataset(dataset_id, integrity_check)
     if return_code == 1:
         msg.info("{} already available at: {}".format(
             dataset_name,
@@ -5,6 +5,10 @@ Description:
     * DATAMINE_CACHE_DIR_ENV_VAR (str): the name of the environment variable
       whose value dictates where the datasets are downloaded.
 
+    * DATAMINE_JSON_BACKEND_ENV_VAR (str): the name of the environment
+      variable which selects the JSON decoder used by the loaders (see
+      `data_mine.utils.json_backend`).
+
     * PROJECT_ROOT (str): the path to the directory containing the main init
       file (the root of the project).
 """
@@ -12,4 +16,5 @@ import os
 
 
 DATAMINE_CACHE_DIR_ENV_VAR = "DATAMINE_CACHE_DIR"
+DATAMINE_JSON_BACKEND_ENV_VAR = "DATAMINE_JSON_BACKEND"
 PROJECT_ROOT = os.path.dirname(os.path.abspath(os.path.realpath(__file__)))
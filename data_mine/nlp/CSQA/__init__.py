@@ -1,2 +1,2 @@
-from .loader import CSQADataset
+from .loader import CSQADataset, get_csqa_by_ids, iter_csqa
 from .types import CSQAType
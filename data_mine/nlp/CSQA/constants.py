@@ -1,5 +1,5 @@
-import os
+# Bump this when the parsing logic changes (invalidates the split cache).
+CSQA_LOADER_VERSION = 1
 
-from data_mine.utils import datamine_cache_dir
-
-CSQA_CACHE_DIR = os.path.join(datamine_cache_dir(), "CSQA")
+# The columns of the DataFrames returned by `CSQADataset`.
+CSQA_COLUMNS = ["id", "question", "answers", "correct", "question_concept"]
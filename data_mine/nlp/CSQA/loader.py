@@ -1,57 +1,145 @@
-import json
-import pandas as pd
-
 from data_mine import Collection
+from data_mine.utils import RecordSelector, Shard, get_json_loads
+from data_mine.utils import read_json_range, shard_lines
 from data_mine.zookeeper import check_shallow_integrity, download_dataset
+from data_mine.zookeeper import read_split_cache, write_split_cache
+from data_mine.zookeeper.record_index import index_jsonl_file
+from data_mine.zookeeper.record_index import load_record_index, lookup_records
 from six import string_types
+from .constants import CSQA_COLUMNS, CSQA_LOADER_VERSION
 from .types import CSQAType
 from .utils import type_to_data_file
 
 
-def CSQADataset(csqa_type):
+def CSQADataset(csqa_type, use_cache=False, columns=None, where=None,
+                shard_index=None, num_shards=None, seed=None):
     """
     TODO(sebisebi): add description
+
+    `columns` is the list of columns to return (all if None) and `where`
+    selects the questions to return (all if None). See
+    `data_mine.utils.RecordSelector` for the details. Both are applied
+    while parsing (after the split cache is read, if `use_cache` is True).
+
+    `shard_index`, `num_shards` and `seed` load a part of the split for
+    data-parallel training (see `data_mine.utils.Shard`): the lines of the
+    data file are divided in `num_shards` ranges (shuffled first if `seed`
+    is not None) and only the lines of the range `shard_index` are parsed.
+    The split cache cannot be used with a shard.
     """
     assert(isinstance(csqa_type, CSQAType))
+    selector = RecordSelector(CSQA_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    assert(not use_cache or shard.is_whole_split), "The split cache stores whole splits"  # noqa: E501
     download_dataset(Collection.CSQA, check_shallow_integrity)
-    all_ids = set()
-    all_data = []
-    with open(type_to_data_file(csqa_type), "rt") as f:
-        for line in f:
-            entry = json.loads(line)
-            assert(len(entry) == 2 if csqa_type == CSQAType.TEST else 3)
-            question_id = entry["id"]
-            correct_answer = entry.get("answerKey", None)
-            entry = entry["question"]
-            assert(isinstance(question_id, string_types))
-            if csqa_type != CSQAType.TEST:
-                assert(correct_answer in ["A", "B", "C", "D", "E"])
-            else:
-                assert(correct_answer is None)
-            assert(len(entry) == 3)
-
-            question = entry["stem"]
-            question_concept = entry["question_concept"]
-            answers = [
-                choice["text"]
-                for choice in sorted(
-                    entry["choices"],
-                    key=lambda x: x["label"])
-            ]
-            assert(isinstance(question, string_types))
-            assert(isinstance(question_concept, string_types))
-            assert(len(answers) == 5)
-            for answer in answers:
-                assert(isinstance(answer, string_types))
-            assert(question_id not in all_ids)
-            all_ids.add(question_id)
-            all_data.append({
-                "id": question_id,
-                "question": question,
-                "answers": answers,
-                "correct": correct_answer,
-                "question_concept": question_concept
-            })
-    assert(len(all_ids) == len(all_data))
-    df = pd.DataFrame(all_data)
+    if use_cache:
+        df = read_split_cache(Collection.CSQA, csqa_type, CSQA_LOADER_VERSION)
+        if df is not None:
+            return selector.apply(df)
+        parse_selector = RecordSelector(CSQA_COLUMNS)
+    else:
+        parse_selector = selector
+    df = parse_selector.frame(list(stream_csqa(csqa_type, parse_selector, shard)))  # noqa: E501
+    if use_cache:
+        write_split_cache(Collection.CSQA, csqa_type, CSQA_LOADER_VERSION, df)
+        df = selector.apply(df)
     return df
+
+
+def iter_csqa(csqa_type, columns=None, where=None, shard_index=None,
+              num_shards=None, seed=None):
+    """
+    Yields the CSQA questions of the given split one at a time.
+
+    The records are the rows of the DataFrame returned by `CSQADataset`
+    (dictionaries with the selected columns) and the arguments have the
+    same meaning. The data file is read line by line, so the first records
+    are available before the split is fully parsed.
+    """
+    assert(isinstance(csqa_type, CSQAType))
+    selector = RecordSelector(CSQA_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    download_dataset(Collection.CSQA, check_shallow_integrity)
+    return stream_csqa(csqa_type, selector, shard)
+
+
+def stream_csqa(csqa_type, selector=None, shard=None):
+    # Generator behind `CSQADataset` and `iter_csqa`. It does not download
+    # the dataset.
+    if selector is None:
+        selector = RecordSelector(CSQA_COLUMNS)
+    if shard is None:
+        shard = Shard()
+    all_ids = set()
+    loads = get_json_loads()
+    with open(type_to_data_file(csqa_type), "rb") as f:
+        for line in shard_lines(f, shard):
+            record = parse_entry(loads(line), csqa_type)
+            assert(record["id"] not in all_ids)
+            all_ids.add(record["id"])
+            record = selector.select(record)
+            if record is not None:
+                yield record
+
+
+def parse_entry(entry, csqa_type):
+    """
+    Validates a raw CSQA entry (a decoded line) and converts it to a record.
+
+    The record has the keys described in `CSQADataset`.
+    """
+    assert(len(entry) == 2 if csqa_type == CSQAType.TEST else 3)
+    question_id = entry["id"]
+    correct_answer = entry.get("answerKey", None)
+    entry = entry["question"]
+    assert(isinstance(question_id, string_types))
+    if csqa_type != CSQAType.TEST:
+        assert(correct_answer in ["A", "B", "C", "D", "E"])
+    else:
+        assert(correct_answer is None)
+    assert(len(entry) == 3)
+
+    question = entry["stem"]
+    question_concept = entry["question_concept"]
+    answers = [
+        choice["text"]
+        for choice in sorted(
+            entry["choices"],
+            key=lambda x: x["label"])
+    ]
+    assert(isinstance(question, string_types))
+    assert(isinstance(question_concept, string_types))
+    assert(len(answers) == 5)
+    for answer in answers:
+        assert(isinstance(answer, string_types))
+
+    return {
+        "id": question_id,
+        "question": question,
+        "answers": answers,
+        "correct": correct_answer,
+        "question_concept": question_concept
+    }
+
+
+def get_csqa_by_ids(csqa_type, ids):
+    """
+    Returns the CSQA questions with the given IDs (records with the keys
+    described in `CSQADataset`), in the order of `ids`.
+
+    Only the requested questions are read and parsed, using an index of
+    their byte ranges (built and saved in the split cache on the first
+    call). A KeyError is raised if an ID is missing.
+    """
+    assert(isinstance(csqa_type, CSQAType))
+    download_dataset(Collection.CSQA, check_shallow_integrity)
+    data_file = type_to_data_file(csqa_type)
+    index = load_record_index(
+            Collection.CSQA, csqa_type, data_file,
+            lambda: index_jsonl_file(data_file, lambda entry: entry["id"])
+    )
+    with open(data_file, "rb") as f:
+        return lookup_records(
+                index, ids,
+                lambda start, end: [parse_entry(read_json_range(f, start, end), csqa_type)]  # noqa: E501
+        )
@@ -1,9 +1,16 @@
 import os
 
-from .constants import CSQA_CACHE_DIR
+from data_mine.utils import datamine_cache_dir
 from .types import CSQAType
 
 
+def csqa_cache_dir():
+    """
+    Returns the directory of the CSQA dataset (inside the DataMine cache).
+    """
+    return os.path.join(datamine_cache_dir(), "CSQA")
+
+
 def type_to_data_file(csqa_type):
     """
     Computes the path of the CSQA data file given the type.
@@ -11,8 +18,9 @@ def type_to_data_file(csqa_type):
     Each CSQA type has the corresponding data located in one file.
     """
     assert(isinstance(csqa_type, CSQAType))
+    data_dir = csqa_cache_dir()
     return {
-            CSQAType.TRAIN: os.path.join(CSQA_CACHE_DIR, "train_rand_split.jsonl"),  # noqa: E501
-            CSQAType.DEV: os.path.join(CSQA_CACHE_DIR, "dev_rand_split.jsonl"),
-            CSQAType.TEST: os.path.join(CSQA_CACHE_DIR, "test_rand_split_no_answers.jsonl"),  # noqa: E501
+            CSQAType.TRAIN: os.path.join(data_dir, "train_rand_split.jsonl"),
+            CSQAType.DEV: os.path.join(data_dir, "dev_rand_split.jsonl"),
+            CSQAType.TEST: os.path.join(data_dir, "test_rand_split_no_answers.jsonl"),  # noqa: E501
     }[csqa_type]
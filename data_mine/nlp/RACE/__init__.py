@@ -1,2 +1,2 @@
-from .loader import RACEDataset
+from .loader import RACEDataset, get_race_by_ids, iter_race
 from .types import RACEType
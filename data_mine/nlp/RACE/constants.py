@@ -1,5 +1,5 @@
-import os
+# Bump this when the parsing logic changes (invalidates the split cache).
+RACE_LOADER_VERSION = 1
 
-from data_mine.utils import datamine_cache_dir
-
-RACE_CACHE_DIR = os.path.join(datamine_cache_dir(), "RACE")
+# The columns of the DataFrames returned by `RACEDataset`.
+RACE_COLUMNS = ["article", "question", "answers", "correct", "id"]
@@ -1,16 +1,22 @@
-import json
+import multiprocessing
 import os
-import pandas as pd
 
 from data_mine import Collection
+from data_mine.utils import RecordSelector, Shard, json_load
+from data_mine.utils import normalize_column
 from data_mine.zookeeper import check_shallow_integrity, download_dataset
+from data_mine.zookeeper import read_split_cache, write_split_cache
+from data_mine.zookeeper.record_index import RecordIndex, load_record_index
 from six import string_types
+from .constants import RACE_COLUMNS, RACE_LOADER_VERSION
 from .types import RACEType
 from .utils import next_question_id
 from .utils import type_to_data_directory
 
 
-def RACEDataset(race_type):
+def RACEDataset(race_type, use_cache=False, num_workers=1, normalized=False,
+                columns=None, where=None, shard_index=None, num_shards=None,
+                seed=None):
     """
     Loads a RACE dataset given the type (see the RACEType enum).
     Any error during reading will generate an exception.
@@ -30,64 +36,289 @@ def RACEDataset(race_type):
     necessary in order to guarantee that IDs are unique (the file name is
     not sufficient). We translate the `passage_id` into the `question_id`
     using the per-passage-question counter.
+
+    If `normalized` is True, a tuple (passages, questions) of DataFrames is
+    returned instead. `passages` has one column ('article') and one row for
+    each distinct passage. `questions` has the columns above except 'article'
+    which is replaced by 'passage_idx' (int), the row of the passage in the
+    `passages` DataFrame. Each passage is stored only once which makes the
+    data much cheaper to serialize (e.g. when sent to worker processes).
+
+    The passage files are parsed by a pool of `num_workers` processes when
+    `num_workers` is greater than 1. The result does not depend on the
+    number of workers.
+
+    `columns` is the list of columns to return (all if None) and `where`
+    selects the questions to return (all if None), e.g.
+    `where={"correct": "A"}`. See `data_mine.utils.RecordSelector` for the
+    details. Both are applied while parsing (the question IDs do not depend
+    on `where`). If `normalized` is True, `columns` must contain 'article'.
+
+    If `use_cache` is True, the processed split is saved in the split cache
+    (under the DataMine cache directory) on the first call and later calls
+    load it from there instead of parsing the raw data again. The cache
+    always stores the whole split (`columns` and `where` are applied after).
+
+    `shard_index`, `num_shards` and `seed` load a part of the split for
+    data-parallel training (see `data_mine.utils.Shard`). The passage files
+    are the units: only the files of the shard are read and parsed. The
+    question IDs are the ones of a full load (the index of the split, see
+    `load_race_index`, is used to continue the counters of passage IDs
+    shared by several files). On a cold cache, the first sharded call
+    builds this index: it parses every file of the split once (with
+    `num_workers` processes) and saves the index in the split cache, so
+    later calls (and other ranks) only parse their files. The split cache
+    cannot be used with a shard.
+    """
+    assert(isinstance(race_type, RACEType))
+    selector = RecordSelector(RACE_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    assert(not use_cache or shard.is_whole_split), "The split cache stores whole splits"  # noqa: E501
+    assert(not normalized or "article" in selector.columns)
+
+    def output(df):
+        if normalized:
+            return normalize_column(df, "article", "passage_idx")
+        return df
+
+    download_dataset(Collection.RACE, check_shallow_integrity)
+    if use_cache:
+        df = read_split_cache(Collection.RACE, race_type, RACE_LOADER_VERSION)
+        if df is not None:
+            return output(selector.apply(df))
+        parse_selector = RecordSelector(RACE_COLUMNS)
+    else:
+        parse_selector = selector
+    records = stream_race(race_type, parse_selector, shard, num_workers)
+    df = parse_selector.frame(list(records))
+    if use_cache:
+        write_split_cache(Collection.RACE, race_type, RACE_LOADER_VERSION, df)
+        df = selector.apply(df)
+    return output(df)
+
+
+def iter_race(race_type, num_workers=1, columns=None, where=None,
+              shard_index=None, num_shards=None, seed=None):
+    """
+    Yields the RACE questions of the given split one at a time.
+
+    The records are the rows of the (not normalized) DataFrame returned by
+    `RACEDataset` and the arguments have the same meaning. The questions of
+    a passage file are yielded as soon as the file is parsed (in listing
+    order, also when the files are parsed by `num_workers` processes). As
+    in `RACEDataset`, the first sharded call on a cold cache parses the
+    whole split once to build the index of the question IDs.
     """
     assert(isinstance(race_type, RACEType))
+    selector = RecordSelector(RACE_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
     download_dataset(Collection.RACE, check_shallow_integrity)
+    return stream_race(race_type, selector, shard, num_workers)
+
+
+def stream_race(race_type, selector=None, shard=None, num_workers=1):
+    # Generator behind `RACEDataset` and `iter_race`. It does not download
+    # the dataset.
+    if selector is None:
+        selector = RecordSelector(RACE_COLUMNS)
+    if shard is None:
+        shard = Shard()
     dirpath = type_to_data_directory(race_type)
-    all_data = []
+    if shard.is_whole_split:
+        index = None
+        names = os.listdir(dirpath)
+        positions = list(range(0, len(names)))
+    else:
+        index = load_race_index(race_type, num_workers)
+        names = index.names
+        positions = shard.positions(len(names))
+    paths = [os.path.join(dirpath, names[i]) for i in positions]
     q_ids = {}
-    for path in os.listdir(dirpath):
-        assert(os.path.isfile(os.path.join(dirpath, path)))
-        with open(os.path.join(dirpath, path), 'rt') as f:
-            entry = json.load(f)
-
-            """
-            Each passage is a JSON file. The JSON file contains these fields:
-
-            1. article: A string, which is the passage.
-            2. questions: A string list. Each string is a query. We have two
-                          types of questions. First one is an interrogative
-                          sentence. Another one has a placeholder, which is
-                          represented by _.
-            3. options: A list of the options list. Each options list contains
-                        4 strings, which are the candidate option.
-            4. answers: A list contains the golden label of each query.
-            5. id: Each passage has an id in this dataset. Note: the ids are
-                   not unique in the question set! Questions in the same file
-                   have the same id (the name of the file). This id is more of
-                   a passage id than a question id.
-            """
-            assert(len(entry) == 5)
-            assert(set(entry.keys()) == {
-                "article",
-                "questions",
-                "options",
-                "answers",
-                "id"
+    # Files are parsed concurrently but merged in the listing order, so the
+    # question IDs are the same as the ones computed by a serial load.
+    results = map_race_files(parse_race_file, paths, num_workers)
+    for file_index, (q_id, questions) in zip(positions, results):
+        for j, (article, question, option, answer) in enumerate(questions):
+            if index is None:
+                question_id = next_question_id(q_ids, q_id)
+            else:
+                question_id = indexed_question_id(index, q_id, file_index, j)  # noqa: E501
+            record = selector.select({
+                'article': article,
+                'question': question,
+                'answers': option,
+                'correct': answer,
+                'id': question_id
             })
-            article = entry["article"]
-            questions = entry["questions"]
-            options = entry["options"]
-            answers = entry["answers"]
-            q_id = entry["id"]
-            assert(isinstance(article, string_types))
-            assert(isinstance(questions, list))
-            assert(isinstance(options, list))
-            assert(isinstance(answers, list))
-            assert(isinstance(q_id, string_types))
-            assert(len(questions) == len(options))
-            assert(len(questions) == len(answers))
-            for question, option, answer in zip(questions, options, answers):
-                assert(isinstance(question, string_types))
-                assert(isinstance(option, list) and len(option) == 4)
-                assert(isinstance(answer, string_types))
-                assert(answer in ["A", "B", "C", "D"])
-                all_data.append({
-                    'article': article,
-                    'question': question,
-                    'answers': option,
-                    'correct': answer,
-                    'id': next_question_id(q_ids, q_id)
-                })
-    df = pd.DataFrame(all_data)
-    return df
+            if record is not None:
+                yield record
+
+
+def get_race_by_ids(race_type, ids):
+    """
+    Returns the RACE questions with the given IDs (records with the keys
+    described in `RACEDataset`), in the order of `ids`.
+
+    Only the passage files of the requested questions are read and parsed.
+    The (file, question) positions of all the questions are stored in an
+    index which is built (and saved in the split cache) on the first call
+    and rebuilt if the listing of the data directory changes. A KeyError is
+    raised if an ID is missing.
+    """
+    assert(isinstance(race_type, RACEType))
+    download_dataset(Collection.RACE, check_shallow_integrity)
+    dirpath = type_to_data_directory(race_type)
+    index = load_race_index(race_type)
+    records = []
+    for record_id in ids:
+        record = None
+        for file_index, question_index in index.positions(record_id):
+            path = os.path.join(dirpath, index.names[file_index])
+            q_id, questions = parse_race_file(path)
+            if record_id.split("-", 1)[-1] != q_id:
+                continue  # A hash collision.
+            article, question, option, answer = questions[question_index]
+            record = {
+                'article': article,
+                'question': question,
+                'answers': option,
+                'correct': answer,
+                'id': record_id
+            }
+            break
+        if record is None:
+            raise KeyError(record_id)
+        records.append(record)
+    return records
+
+
+def load_race_index(race_type, num_workers=1):
+    """
+    Returns the index of a RACE split (see `RecordIndex`).
+
+    The names of the index are the passage files (in listing order) and
+    the position of a question is (file index, question index in file).
+    The index is built (and saved in the split cache) on the first call
+    and rebuilt if the listing of the data directory changes. Building it
+    parses every passage file of the split, with a pool of `num_workers`
+    processes if `num_workers` is greater than 1.
+    """
+    dirpath = type_to_data_directory(race_type)
+
+    def build():
+        # Same listing order (and thus same IDs) as `RACEDataset`.
+        names = os.listdir(dirpath)
+        paths = [os.path.join(dirpath, name) for name in names]
+        entries = []
+        q_ids = {}
+        for i, (q_id, num_questions) in enumerate(map_race_files(count_race_questions, paths, num_workers)):  # noqa: E501
+            for j in range(0, num_questions):
+                entries.append((next_question_id(q_ids, q_id), i, j))
+        return RecordIndex.build(entries, names)
+
+    return load_record_index(Collection.RACE, race_type, dirpath, build)
+
+
+def indexed_question_id(index, passage_id, file_index, question_index):
+    """
+    Returns the ID of the question `question_index` of the file
+    `file_index` (positions in `index`, see `load_race_index`) without
+    counting the questions of the previous files (see `next_question_id`).
+
+    The counter of a passage ID only continues in another file if the
+    passage ID is shared by several files, so the first candidate is
+    almost always the right one.
+    """
+    position = (file_index, question_index)
+    for counter in range(question_index + 1, len(index) + 1):
+        question_id = "{}-{}".format(counter, passage_id)
+        if position in index.positions(question_id):
+            return question_id
+    raise KeyError("{}-{}".format(question_index + 1, passage_id))
+
+
+def map_race_files(fn, paths, num_workers):
+    """
+    Applies `fn` to every path and yields the results in the same order.
+
+    If `num_workers` is greater than 1, the paths are split in chunks
+    which are processed by a pool of `num_workers` processes. The results
+    are yielded as soon as they are ready (in order) and the pool is
+    terminated if the caller stops early.
+    """
+    assert(num_workers >= 1)
+    if num_workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield fn(path)
+        return
+    chunksize = max(1, len(paths) // (num_workers * 4))
+    pool = multiprocessing.Pool(num_workers)
+    try:
+        for result in pool.imap(fn, paths, chunksize=chunksize):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def count_race_questions(path):
+    # Returns (passage_id, number of questions) of a RACE file. Only these
+    # are sent back by the worker processes building the index.
+    q_id, questions = parse_race_file(path)
+    return q_id, len(questions)
+
+
+def parse_race_file(path):
+    """
+    Parses and validates a RACE file (one passage with its questions).
+
+    Returns a tuple (passage_id, questions) where `questions` is a list of
+    (article, question, options, correct answer) tuples in file order.
+    """
+    assert(os.path.isfile(path))
+    with open(path, 'rb') as f:
+        entry = json_load(f)
+
+    """
+    Each passage is a JSON file. The JSON file contains these fields:
+
+    1. article: A string, which is the passage.
+    2. questions: A string list. Each string is a query. We have two
+                  types of questions. First one is an interrogative
+                  sentence. Another one has a placeholder, which is
+                  represented by _.
+    3. options: A list of the options list. Each options list contains
+                4 strings, which are the candidate option.
+    4. answers: A list contains the golden label of each query.
+    5. id: Each passage has an id in this dataset. Note: the ids are
+           not unique in the question set! Questions in the same file
+           have the same id (the name of the file). This id is more of
+           a passage id than a question id.
+    """
+    assert(len(entry) == 5)
+    assert(set(entry.keys()) == {
+        "article",
+        "questions",
+        "options",
+        "answers",
+        "id"
+    })
+    article = entry["article"]
+    questions = entry["questions"]
+    options = entry["options"]
+    answers = entry["answers"]
+    q_id = entry["id"]
+    assert(isinstance(article, string_types))
+    assert(isinstance(questions, list))
+    assert(isinstance(options, list))
+    assert(isinstance(answers, list))
+    assert(isinstance(q_id, string_types))
+    assert(len(questions) == len(options))
+    assert(len(questions) == len(answers))
+    for question, option, answer in zip(questions, options, answers):
+        assert(isinstance(question, string_types))
+        assert(isinstance(option, list) and len(option) == 4)
+        assert(isinstance(answer, string_types))
+        assert(answer in ["A", "B", "C", "D"])
+    return q_id, list(zip([article] * len(questions), questions, options, answers))  # noqa: E501
@@ -1,7 +1,14 @@
 import os
 
+from data_mine.utils import datamine_cache_dir
 from .types import RACEType
-from .constants import RACE_CACHE_DIR
+
+
+def race_cache_dir():
+    """
+    Returns the directory of the RACE dataset (inside the DataMine cache).
+    """
+    return os.path.join(datamine_cache_dir(), "RACE")
 
 
 def next_question_id(next_ids, id_base):
@@ -37,4 +44,4 @@ def type_to_data_directory(race_type):
     assert(isinstance(race_type, RACEType))
     path = str(race_type.name).lower().split('_')
     assert(len(path) == 2)
-    return os.path.join(RACE_CACHE_DIR, "RACE", path[0], path[1])
+    return os.path.join(race_cache_dir(), "RACE", path[0], path[1])
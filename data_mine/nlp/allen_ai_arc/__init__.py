@@ -1,2 +1,2 @@
-from .loader import ARCDataset
+from .loader import ARCDataset, get_arc_by_ids, iter_arc
 from .types import ARCType
@@ -1,5 +1,5 @@
-import os
+# Bump this when the parsing logic changes (invalidates the split cache).
+ARC_LOADER_VERSION = 1
 
-from data_mine.utils import datamine_cache_dir
-
-ARC_CACHE_DIR = os.path.join(datamine_cache_dir(), "ALLEN_AI_ARC")
+# The columns of the DataFrames returned by `ARCDataset`.
+ARC_COLUMNS = ["id", "question", "answers", "correct"]
@@ -1,14 +1,18 @@
-import json
-import pandas as pd
-
 from data_mine import Collection
+from data_mine.utils import RecordSelector, Shard, get_json_loads
+from data_mine.utils import read_json_range, shard_lines
 from data_mine.zookeeper import check_shallow_integrity, download_dataset
+from data_mine.zookeeper import read_split_cache, write_split_cache
+from data_mine.zookeeper.record_index import index_jsonl_file
+from data_mine.zookeeper.record_index import load_record_index, lookup_records
 from six import string_types
+from .constants import ARC_COLUMNS, ARC_LOADER_VERSION
 from .types import ARCType
 from .utils import type_to_data_file, valid_choices
 
 
-def ARCDataset(arc_type):
+def ARCDataset(arc_type, use_cache=False, columns=None, where=None,
+               shard_index=None, num_shards=None, seed=None):
     """
     Loads an ARC dataset given the partition (see the ARCType enum).
     Any error during reading will generate an exception.
@@ -18,52 +22,146 @@ def ARCDataset(arc_type):
     * 'question': string
     * 'answers': list[string], 3 <= length <= 5
     * 'correct': oneof('A', 'B', 'C', D', 'E', '1', '2', '3', '4')
+
+    `columns` is the list of columns to return (all if None) and `where`
+    selects the questions to return (all if None), e.g.
+    `where={"correct": "A"}`. See `data_mine.utils.RecordSelector` for the
+    details. Both are applied while parsing.
+
+    If `use_cache` is True, the processed split is saved in the split cache
+    (under the DataMine cache directory) on the first call and later calls
+    load it from there instead of parsing the raw data again. The cache
+    always stores the whole split (`columns` and `where` are applied after).
+
+    `shard_index`, `num_shards` and `seed` load a part of the split for
+    data-parallel training (see `data_mine.utils.Shard`): the lines of the
+    data file are divided in `num_shards` ranges (shuffled first if `seed`
+    is not None) and only the lines of the range `shard_index` are parsed.
+    The split cache cannot be used with a shard.
     """
     assert(isinstance(arc_type, ARCType))
+    selector = RecordSelector(ARC_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    assert(not use_cache or shard.is_whole_split), "The split cache stores whole splits"  # noqa: E501
     download_dataset(Collection.ALLEN_AI_ARC, check_shallow_integrity)
-    all_data = []
-    all_ids = set()
-    with open(type_to_data_file(arc_type), "rt") as f:
-        for line in f:
-            entry = json.loads(line)
-            assert(isinstance(entry, dict))
-            assert(len(entry) == 3)
-
-            # Extract fields.
-            question_id = entry["id"]
-            correct_answer = entry["answerKey"]
-            entry = entry["question"]
-            assert(len(entry) == 2)
-            question = entry["stem"]
-            for choice in entry["choices"]:
-                assert(isinstance(choice["label"], string_types))
-                assert(len(choice["label"]) == 1)
-            answers = [
-                choice["text"]
-                for choice in sorted(
-                    entry["choices"],
-                    key=lambda x: x["label"])
-            ]
-
-            # Validate fields.
-            assert(isinstance(question_id, string_types))
-            assert(isinstance(correct_answer, string_types))
-            assert(correct_answer in ["A", "B", "C", "D", "E", "1", "2", "3", "4"])  # noqa: E501
-            assert(correct_answer in [x["label"] for x in entry["choices"]])
-            assert(valid_choices([x["label"] for x in entry["choices"]]))
-            assert(isinstance(question, string_types))
-            assert(len(answers) in [3, 4, 5])
-            for answer in answers:
-                assert(isinstance(answer, string_types))
-
-            assert(question_id not in all_ids)
-            all_ids.add(question_id)
-            all_data.append({
-                "id": question_id,
-                "question": question,
-                "answers": answers,
-                "correct": correct_answer
-            })
-    assert(len(all_data) == len(all_ids))
-    df = pd.DataFrame(all_data)
+    if use_cache:
+        df = read_split_cache(
+                Collection.ALLEN_AI_ARC, arc_type,
+                ARC_LOADER_VERSION
+        )
+        if df is not None:
+            return selector.apply(df)
+        parse_selector = RecordSelector(ARC_COLUMNS)
+    else:
+        parse_selector = selector
+    df = parse_selector.frame(list(stream_arc(arc_type, parse_selector, shard)))  # noqa: E501
+    if use_cache:
+        write_split_cache(
+                Collection.ALLEN_AI_ARC, arc_type,
+                ARC_LOADER_VERSION, df
+        )
+        df = selector.apply(df)
     return df
+
+
+def iter_arc(arc_type, columns=None, where=None, shard_index=None,
+             num_shards=None, seed=None):
+    """
+    Yields the ARC questions of the given partition one at a time.
+
+    The records are the rows of the DataFrame returned by `ARCDataset`
+    (dictionaries with the selected columns) and the arguments have the
+    same meaning. The data file is read line by line.
+    """
+    assert(isinstance(arc_type, ARCType))
+    selector = RecordSelector(ARC_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    download_dataset(Collection.ALLEN_AI_ARC, check_shallow_integrity)
+    return stream_arc(arc_type, selector, shard)
+
+
+def stream_arc(arc_type, selector=None, shard=None):
+    # Generator behind `ARCDataset` and `iter_arc`. It does not download the
+    # dataset.
+    if selector is None:
+        selector = RecordSelector(ARC_COLUMNS)
+    if shard is None:
+        shard = Shard()
+    all_ids = set()
+    loads = get_json_loads()
+    with open(type_to_data_file(arc_type), "rb") as f:
+        for line in shard_lines(f, shard):
+            record = parse_entry(loads(line))
+            assert(record["id"] not in all_ids)
+            all_ids.add(record["id"])
+            record = selector.select(record)
+            if record is not None:
+                yield record
+
+
+def parse_entry(entry):
+    """
+    Validates a raw ARC entry (a decoded line) and converts it to a record.
+
+    The record has the keys described in `ARCDataset`.
+    """
+    assert(isinstance(entry, dict))
+    assert(len(entry) == 3)
+
+    # Extract fields.
+    question_id = entry["id"]
+    correct_answer = entry["answerKey"]
+    entry = entry["question"]
+    assert(len(entry) == 2)
+    question = entry["stem"]
+    for choice in entry["choices"]:
+        assert(isinstance(choice["label"], string_types))
+        assert(len(choice["label"]) == 1)
+    answers = [
+        choice["text"]
+        for choice in sorted(
+            entry["choices"],
+            key=lambda x: x["label"])
+    ]
+
+    # Validate fields.
+    assert(isinstance(question_id, string_types))
+    assert(isinstance(correct_answer, string_types))
+    assert(correct_answer in ["A", "B", "C", "D", "E", "1", "2", "3", "4"])  # noqa: E501
+    assert(correct_answer in [x["label"] for x in entry["choices"]])
+    assert(valid_choices([x["label"] for x in entry["choices"]]))
+    assert(isinstance(question, string_types))
+    assert(len(answers) in [3, 4, 5])
+    for answer in answers:
+        assert(isinstance(answer, string_types))
+
+    return {
+        "id": question_id,
+        "question": question,
+        "answers": answers,
+        "correct": correct_answer
+    }
+
+
+def get_arc_by_ids(arc_type, ids):
+    """
+    Returns the ARC questions with the given IDs (records with the keys
+    described in `ARCDataset`), in the order of `ids`.
+
+    Only the requested questions are read and parsed: the byte ranges of
+    the questions are stored in an index which is built (and saved in the
+    split cache) on the first call. A KeyError is raised if an ID is
+    missing.
+    """
+    assert(isinstance(arc_type, ARCType))
+    download_dataset(Collection.ALLEN_AI_ARC, check_shallow_integrity)
+    data_file = type_to_data_file(arc_type)
+    index = load_record_index(
+            Collection.ALLEN_AI_ARC, arc_type, data_file,
+            lambda: index_jsonl_file(data_file, lambda entry: entry["id"])
+    )
+    with open(data_file, "rb") as f:
+        return lookup_records(
+                index, ids,
+                lambda start, end: [parse_entry(read_json_range(f, start, end))]  # noqa: E501
+        )
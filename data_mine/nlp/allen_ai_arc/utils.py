@@ -1,11 +1,18 @@
 import os
 
 from copy import deepcopy
+from data_mine.utils import datamine_cache_dir
 from six import string_types
-from .constants import ARC_CACHE_DIR
 from .types import ARCType
 
 
+def arc_cache_dir():
+    """
+    Returns the directory of the ARC dataset (inside the DataMine cache).
+    """
+    return os.path.join(datamine_cache_dir(), "ALLEN_AI_ARC")
+
+
 def type_to_data_file(arc_type):
     """
     Computes the path of the ARC data file given the type.
@@ -13,7 +20,7 @@ def type_to_data_file(arc_type):
     Each ARC split has the corresponding data located in one file.
     """
     assert(isinstance(arc_type, ARCType))
-    data_dir = os.path.join(ARC_CACHE_DIR, "ARC-V1-Feb2018-2")
+    data_dir = os.path.join(arc_cache_dir(), "ARC-V1-Feb2018-2")
     split, category = tuple(arc_type.name.lower().split("_"))
 
     category = "ARC-{}".format(category.capitalize())
@@ -1,3 +1,3 @@
-from .loader import DROPDataset
+from .loader import DROPDataset, get_drop_by_ids, iter_drop
 from .translators import DROP2MC
 from .types import DROPType
@@ -1,5 +1,12 @@
-import os
+# Bump this when the parsing logic changes (invalidates the split cache).
+DROP_LOADER_VERSION = 1
 
-from data_mine.utils import datamine_cache_dir
+# The columns of the DataFrames returned by `DROPDataset`.
+DROP_COLUMNS = [
+    "query_id", "question", "passage",
+    "answer_type", "parsed_answer", "original_answer"
+]
 
-DROP_CACHE_DIR = os.path.join(datamine_cache_dir(), "ALLEN_AI_DROP")
+# Bump this when the DROP2MC translation changes (invalidates the cached
+# multiple-choice questions).
+DROP2MC_VERSION = 1
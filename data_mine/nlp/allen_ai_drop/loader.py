@@ -1,24 +1,174 @@
-import json
-import pandas as pd
-
 from data_mine import Collection
+from data_mine.utils import RecordSelector, Shard, json_load
+from data_mine.utils import normalize_column
+from data_mine.utils import iter_json_object, read_json_range
 from data_mine.zookeeper import check_shallow_integrity, download_dataset
+from data_mine.zookeeper import read_split_cache, write_split_cache
+from data_mine.zookeeper.record_index import RecordIndex, load_record_index
+from data_mine.zookeeper.record_index import lookup_records
 from six import string_types
+from .constants import DROP_COLUMNS, DROP_LOADER_VERSION
 from .types import DROPType
 from .utils import serialize_date, type_to_data_file
 
 
-def DROPDataset(drop_type):
+def DROPDataset(drop_type, use_cache=False, normalized=False,
+                columns=None, where=None, shard_index=None, num_shards=None,
+                seed=None):
     """
     TODO(sebisebi): add description
+
+    `columns` is the list of columns to return (all if None) and `where`
+    selects the questions to return (all if None), e.g.
+    `where={"answer_type": "number"}`. See `data_mine.utils.RecordSelector`
+    for the details. Both are applied while parsing (after the split cache
+    is read, if `use_cache` is True). If `normalized` is True, `columns`
+    must contain 'passage'.
+
+    `shard_index`, `num_shards` and `seed` load a part of the split for
+    data-parallel training (see `data_mine.utils.Shard`). The subjects (the
+    top-level keys, in sorted order) are the units: only the subjects of
+    the shard are read (from their byte ranges), parsed and materialized.
+    The byte ranges are stored in an index (see `load_drop_subject_index`)
+    which is built by the first sharded call, so that call parses the
+    whole split once. The split cache cannot be used with a shard.
     """
     assert(isinstance(drop_type, DROPType))
+    selector = RecordSelector(DROP_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    assert(not use_cache or shard.is_whole_split), "The split cache stores whole splits"  # noqa: E501
+    assert(not normalized or "passage" in selector.columns)
+
+    def output(df):
+        if normalized:
+            return normalize_column(df, "passage", "passage_idx")
+        return df
+
     download_dataset(Collection.ALLEN_AI_DROP, check_shallow_integrity)
+    if use_cache:
+        df = read_split_cache(
+                Collection.ALLEN_AI_DROP, drop_type,
+                DROP_LOADER_VERSION
+        )
+        if df is not None:
+            return output(selector.apply(df))
+        parse_selector = RecordSelector(DROP_COLUMNS)
+    else:
+        parse_selector = selector
+
+    df = parse_selector.frame(list(stream_drop(drop_type, parse_selector, shard)))  # noqa: E501
+    if use_cache:
+        write_split_cache(
+                Collection.ALLEN_AI_DROP, drop_type,
+                DROP_LOADER_VERSION, df
+        )
+        df = selector.apply(df)
+    return output(df)
+
+
+def iter_drop(drop_type, columns=None, where=None, shard_index=None,
+              num_shards=None, seed=None):
+    """
+    Yields the DROP questions of the given split one at a time.
+
+    The records are the rows of the (not normalized) DataFrame returned by
+    `DROPDataset` and the arguments have the same meaning. The data file
+    of a whole split is decoded at once (a shard only decodes its
+    subjects), but the questions are validated and converted to records
+    one subject at a time.
+    """
+    assert(isinstance(drop_type, DROPType))
+    selector = RecordSelector(DROP_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    download_dataset(Collection.ALLEN_AI_DROP, check_shallow_integrity)
+    return stream_drop(drop_type, selector, shard)
+
+
+def stream_drop(drop_type, selector=None, shard=None):
+    # Generator behind `DROPDataset` and `iter_drop`. It does not download
+    # the dataset.
+    if selector is None:
+        selector = RecordSelector(DROP_COLUMNS)
+    if shard is None:
+        shard = Shard()
+
+    # The Subject ID represents the context category. Examples include
+    # history_4122, nfl_3073 or history_3259. It seems that all questions
+    # target NFL or history subjects.
+    all_query_ids = set()
+    for subject in iter_subjects(drop_type, shard):
+        for record in parse_subject(subject):
+            query_id = record["query_id"]
+            # This is a duplicate query.
+            if query_id == "28553293-d719-441b-8f00-ce3dc6df5398":
+                if query_id in all_query_ids:
+                    continue
+            assert(str(query_id) not in all_query_ids)
+            all_query_ids.add(str(query_id))
+            record = selector.select(record)
+            if record is not None:
+                yield record
+
+
+def iter_subjects(drop_type, shard):
+    # Yields the raw subjects of a shard, in the order of the shard. The
+    # whole split is decoded at once, a shard is read from the byte ranges
+    # of its subjects.
+    data_file = type_to_data_file(drop_type)
+    if shard.is_whole_split:
+        with open(data_file, "rb") as f:
+            data = json_load(f)
+        for subject_id in sorted(data.keys()):
+            yield data[subject_id]
+        return
+    index = load_drop_subject_index(drop_type)
+    with open(data_file, "rb") as f:
+        for i in shard.positions(len(index.names)):
+            positions = index.positions(index.names[i])
+            assert(len(positions) == 1), "Subject ID hash collision: {}".format(index.names[i])  # noqa: E501
+            start, end = positions[0]
+            yield read_json_range(f, start, end)
+
+
+def load_drop_subject_index(drop_type):
+    """
+    Returns the index of the byte ranges of the subjects of a DROP split
+    (see `RecordIndex`), building it on the first call.
+
+    The IDs are the subject IDs and the names of the index are the subject
+    IDs in sorted order (the units of a shard, see `DROPDataset`). The
+    index is built with a single pass over the data file and saved in the
+    split cache.
+    """
+    data_file = type_to_data_file(drop_type)
+
+    def build():
+        subjects = sorted(
+            (subject_id, start, end)
+            for subject_id, _, start, end in iter_json_object(data_file, with_offsets=True)  # noqa: E501
+        )
+        return RecordIndex.build(subjects, [s[0] for s in subjects])
+
+    return load_record_index(
+            Collection.ALLEN_AI_DROP, drop_type, data_file, build,
+            kind="subject_index"
+    )
 
-    def parse_answer(answer):
-        """
-        Answer format (sanitized of other unwanted fields):
 
+def parse_subject(entry):
+    """
+    Validates a raw DROP subject (a passage with its questions) and
+    converts its questions to records.
+
+    Yields the records (with the keys described in `DROPDataset`) in file
+    order. Questions with an empty answer are skipped.
+    """
+    assert(len(entry) == 3)  # passage, qa_pairs and wiki_url
+    passage = entry["passage"]
+    assert(isinstance(passage, string_types))
+    """
+    {
+        "question": "How many points were scored first?",
         "answer": {
             "number": "3",
             "date": {
@@ -27,140 +177,153 @@ def DROPDataset(drop_type):
                 "year": ""
             },
             "spans": [],
-        }
 
-        Returns the type and the answer as a string.
+            "hit_id": "",  # Not useful, always empty when present.
+            "worker_id": ""  # Not useful, always empty when present.
+        },
+        "query_id": "33f9f7bd-518b-45ae-86d5-c1475167d54f",
+        "highlights": [],  # Always empty or missing.
+        "question_type": [],  # Always empty or missing.
+        "validated_answers": [],  # Always empty or missing.
+        "expert_answers": []  # Always empty or missing.
+    }
+    """
+    for qa_pair in entry["qa_pairs"]:
+        unwanted_fields = [
+            "highlights",
+            "question_type",
+            "validated_answers",
+            "expert_answers",
+            "workerid",
+            "workerscore",
+            "incorrect_options",
+            "ai_answer"
+        ]
+        for unwanted_field in unwanted_fields:
+            if unwanted_field in qa_pair:
+                del qa_pair[unwanted_field]
+        assert(len(qa_pair) == 3)
+
+        question = qa_pair["question"]
+        answer = qa_pair["answer"]
+        query_id = qa_pair["query_id"]
+        assert(isinstance(question, string_types))
+        assert(isinstance(answer, dict))
+        assert(isinstance(query_id, string_types))
 
-        The type can be:
-            a) "number" (be aware that this can be integer or real).
-            b) "date"
-            c) "spans"
-            d) None, some answer are completely empty.
-        """
+        # This answer has 2 correct answers. Manually remove the false one.
+        if query_id == "daf712ed-3849-48a1-b9b5-f7d21b0c0ab7":
+            answer["number"] = ""
+
+        # Sanitize the answer object.
+        unwanted_fields = [
+                "worker_id",
+                "hit_id"
+        ]
+        for unwanted_field in unwanted_fields:
+            if unwanted_field in answer:
+                assert(len(answer[unwanted_field]) == 0)
+                del answer[unwanted_field]
         assert(len(answer) == 3)
-        assert(set(answer.keys()) == set(["number", "date", "spans"]))
+        answer_type, parsed_answer = parse_answer(answer)
+        if answer_type is None:
+            continue  # Some answers are completely empty.
+        assert(answer_type in ["number", "date", "spans"])
+        assert(len(parsed_answer) >= 1)
+        yield {
+            "query_id": query_id,
+            "question": question,
+            "passage": passage,
+            "answer_type": answer_type,
+            "parsed_answer": parsed_answer,
+            "original_answer": answer
+        }
 
-        def is_number():
-            return len(answer["number"]) > 0
 
-        def is_date():
-            date = answer["date"]
-            if len(date) == 0:
-                return False
-            assert(set(date.keys()) == set(["day", "month", "year"]))
-            return len("" + date["day"] + date["month"] + date["year"]) > 0
+def parse_answer(answer):
+    """
+    Answer format (sanitized of other unwanted fields):
 
-        def is_span():
-            return len(answer["spans"]) > 0
+    "answer": {
+        "number": "3",
+        "date": {
+            "day": "",
+            "month": "",
+            "year": ""
+        },
+        "spans": [],
+    }
 
-        if is_number():
-            assert(not is_date())
-            assert(not is_span())
-            float(answer["number"])
-            return "number", str(answer["number"])
+    Returns the type and the answer as a string.
 
-        if is_date():
-            assert(not is_number())
-            assert(not is_span())
-            return "date", serialize_date(answer["date"])
+    The type can be:
+        a) "number" (be aware that this can be integer or real).
+        b) "date"
+        c) "spans"
+        d) None, some answer are completely empty.
+    """
+    assert(len(answer) == 3)
+    assert(set(answer.keys()) == set(["number", "date", "spans"]))
 
-        if is_span():
-            assert(not is_number())
-            assert(not is_date())
-            return "spans", ", ".join(answer["spans"])
+    def is_number():
+        return len(answer["number"]) > 0
 
-        return None, None
+    def is_date():
+        date = answer["date"]
+        if len(date) == 0:
+            return False
+        assert(set(date.keys()) == set(["day", "month", "year"]))
+        return len("" + date["day"] + date["month"] + date["year"]) > 0
 
-    # The Subject ID represents the context category. Examples include
-    # history_4122, nfl_3073 or history_3259. It seems that all questions
-    # target NFL or history subjects.
-    all_query_ids = set()
-    all_questions = []
-    data = json.load(open(type_to_data_file(drop_type), "rt"))
-    for subject_id in sorted(data.keys()):
-        entry = data[subject_id]
-        assert(len(entry) == 3)  # passage, qa_pairs and wiki_url
-        passage = entry["passage"]
-        assert(isinstance(passage, string_types))
-        """
-        {
-            "question": "How many points were scored first?",
-            "answer": {
-                "number": "3",
-                "date": {
-                    "day": "",
-                    "month": "",
-                    "year": ""
-                },
-                "spans": [],
-
-                "hit_id": "",  # Not useful, always empty when present.
-                "worker_id": ""  # Not useful, always empty when present.
-            },
-            "query_id": "33f9f7bd-518b-45ae-86d5-c1475167d54f",
-            "highlights": [],  # Always empty or missing.
-            "question_type": [],  # Always empty or missing.
-            "validated_answers": [],  # Always empty or missing.
-            "expert_answers": []  # Always empty or missing.
-        }
-        """
-        for qa_pair in entry["qa_pairs"]:
-            unwanted_fields = [
-                "highlights",
-                "question_type",
-                "validated_answers",
-                "expert_answers",
-                "workerid",
-                "workerscore",
-                "incorrect_options",
-                "ai_answer"
-            ]
-            for unwanted_field in unwanted_fields:
-                if unwanted_field in qa_pair:
-                    del qa_pair[unwanted_field]
-            assert(len(qa_pair) == 3)
-
-            question = qa_pair["question"]
-            answer = qa_pair["answer"]
-            query_id = qa_pair["query_id"]
-            assert(isinstance(question, string_types))
-            assert(isinstance(answer, dict))
-            assert(isinstance(query_id, string_types))
-
-            # This answer has 2 correct answers. Manually remove the false one.
-            if query_id == "daf712ed-3849-48a1-b9b5-f7d21b0c0ab7":
-                answer["number"] = ""
+    def is_span():
+        return len(answer["spans"]) > 0
 
-            # This is a duplicate query.
-            if query_id == "28553293-d719-441b-8f00-ce3dc6df5398":
-                if query_id in all_query_ids:
-                    continue
+    if is_number():
+        assert(not is_date())
+        assert(not is_span())
+        float(answer["number"])
+        return "number", str(answer["number"])
 
-            # Sanitize the answer object.
-            unwanted_fields = [
-                    "worker_id",
-                    "hit_id"
-            ]
-            for unwanted_field in unwanted_fields:
-                if unwanted_field in answer:
-                    assert(len(answer[unwanted_field]) == 0)
-                    del answer[unwanted_field]
-            assert(len(answer) == 3)
-            answer_type, parsed_answer = parse_answer(answer)
-            if answer_type is None:
-                continue
-            assert(answer_type in ["number", "date", "spans"])
-            assert(len(parsed_answer) >= 1)
-            all_query_ids.add(str(query_id))
-            all_questions.append({
-                "query_id": query_id,
-                "question": question,
-                "passage": passage,
-                "answer_type": answer_type,
-                "parsed_answer": parsed_answer,
-                "original_answer": answer
-            })
-    assert(len(all_questions) == len(all_query_ids))
-
-    df = pd.DataFrame(all_questions)
-    return df
+    if is_date():
+        assert(not is_number())
+        assert(not is_span())
+        return "date", serialize_date(answer["date"])
+
+    if is_span():
+        assert(not is_number())
+        assert(not is_date())
+        return "spans", ", ".join(answer["spans"])
+
+    return None, None
+
+
+def get_drop_by_ids(drop_type, ids):
+    """
+    Returns the DROP questions with the given query IDs (records with the
+    keys described in `DROPDataset`), in the order of `ids`.
+
+    Only the subjects (passages) of the requested questions are read and
+    parsed, using an index of their byte ranges (built and saved in the
+    split cache on the first call). A KeyError is raised if an ID is
+    missing.
+    """
+    assert(isinstance(drop_type, DROPType))
+    download_dataset(Collection.ALLEN_AI_DROP, check_shallow_integrity)
+    data_file = type_to_data_file(drop_type)
+
+    def build():
+        return RecordIndex.build(
+            (qa_pair["query_id"], start, end)
+            for _, entry, start, end in iter_json_object(data_file, with_offsets=True)  # noqa: E501
+            for qa_pair in entry["qa_pairs"]
+        )
+
+    index = load_record_index(
+            Collection.ALLEN_AI_DROP, drop_type, data_file, build
+    )
+    with open(data_file, "rb") as f:
+        return lookup_records(
+                index, ids,
+                lambda start, end: parse_subject(read_json_range(f, start, end)),  # noqa: E501
+                id_key="query_id"
+        )
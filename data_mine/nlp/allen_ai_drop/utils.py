@@ -1,9 +1,16 @@
 import os
 
-from .constants import DROP_CACHE_DIR
+from data_mine.utils import datamine_cache_dir
 from .types import DROPType
 
 
+def drop_cache_dir():
+    """
+    Returns the directory of the DROP dataset (inside the DataMine cache).
+    """
+    return os.path.join(datamine_cache_dir(), "ALLEN_AI_DROP")
+
+
 def type_to_data_file(drop_type):
     """
     Computes the path of the DROP data file given the type.
@@ -11,7 +18,7 @@ def type_to_data_file(drop_type):
     Each DROP type has the corresponding data located in one file.
     """
     assert(isinstance(drop_type, DROPType))
-    data_dir = os.path.join(DROP_CACHE_DIR, "drop_dataset")
+    data_dir = os.path.join(drop_cache_dir(), "drop_dataset")
     return {
             DROPType.TRAIN: os.path.join(data_dir, "drop_dataset_train.json"),
             DROPType.DEV: os.path.join(data_dir, "drop_dataset_dev.json"),
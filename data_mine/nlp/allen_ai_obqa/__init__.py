@@ -1,2 +1,5 @@
-from .loader import OBQADataset, OBQAFacts
+from .bm25 import BM25Index, OBQAFactsBM25
+from .embedding_store import EmbeddingStore
+from .loader import OBQADataset, OBQAFacts, get_obqa_by_ids
+from .loader import iter_obqa
 from .types import OBQAType
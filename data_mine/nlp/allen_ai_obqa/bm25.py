@@ -0,0 +1,241 @@
+import re
+
+from data_mine.utils import top_k
+from .loader import OBQAFacts
+
+# Same stop words as Lucene's `EnglishAnalyzer`.
+ENGLISH_STOP_WORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in",
+    "into", "is", "it", "no", "not", "of", "on", "or", "such", "that", "the",
+    "their", "then", "there", "these", "they", "this", "to", "was", "will",
+    "with"
+])
+
+# Bump this when the layout of the saved index (.npz) changes.
+BM25_INDEX_FORMAT_VERSION = 1
+
+_POSSESSIVE_RE = re.compile(r"'s\b", re.UNICODE)
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def minimal_stem(token):
+    # A port of Lucene's `EnglishMinimalStemmer` (plural forms only).
+    if len(token) < 3 or token[-1] != "s":
+        return token
+    if token[-2] in "us":
+        return token
+    if token[-2] == "e":
+        if len(token) > 3 and token[-3] == "i" and token[-4] not in "ae":
+            return token[:-3] + "y"
+        if token[-3] in "iaoe":
+            return token
+    return token[:-1]
+
+
+def tokenize(text):
+    """
+    Splits a text in the terms used by the BM25 index.
+
+    The text is lowercased, possessives are removed, the stop words are
+    dropped and plural forms are reduced to the singular form (e.g.
+    "The plants' leaves" becomes ["plant", "leave"]).
+    """
+    text = _POSSESSIVE_RE.sub("", text.lower())
+    return [
+        minimal_stem(token) for token in _TOKEN_RE.findall(text)
+        if token not in ENGLISH_STOP_WORDS
+    ]
+
+
+class BM25Index(object):
+    """
+    An Okapi BM25 index over a list of documents (strings).
+
+    The index is a sparse term-document matrix stored in the compressed
+    sparse column format (one column per term): the postings of term `t`
+    are `doc_ids[term_indptr[t]:term_indptr[t + 1]]` and their BM25
+    weights are stored in `weights`. Scores match Lucene's `BM25Similarity`:
+
+        idf(t) * tf / (tf + k1 * (1 - b + b * len(doc) / avg_len))
+
+    Use `BM25Index.build` to create an index and `save` / `BM25Index.load`
+    to store it as a `.npz` file.
+    """
+
+    def __init__(self, documents, vocabulary, term_indptr, doc_ids, weights):
+        import numpy as np
+
+        assert(len(term_indptr) == len(vocabulary) + 1)
+        assert(len(doc_ids) == len(weights) == term_indptr[-1])
+        self.documents = np.asarray(documents, dtype=np.str_)
+        self.vocabulary = np.asarray(vocabulary, dtype=np.str_)
+        self.term_indptr = np.asarray(term_indptr, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary.tolist())}  # noqa: E501
+
+    @classmethod
+    def build(cls, documents, k1=1.2, b=0.75):
+        """
+        Builds the index of a list of documents (strings).
+
+        The documents are identified by their position in the list. The
+        `k1` and `b` parameters have the usual BM25 meaning.
+        """
+        import numpy as np
+
+        assert(k1 >= 0)
+        assert(0 <= b <= 1)
+        documents = list(documents)
+        assert(len(documents) > 0)
+        term_ids = {}
+        terms, docs = [], []
+        for doc_id, document in enumerate(documents):
+            for token in tokenize(document):
+                terms.append(term_ids.setdefault(token, len(term_ids)))
+            docs.extend([doc_id] * (len(terms) - len(docs)))
+        num_docs, num_terms = len(documents), len(term_ids)
+        terms = np.asarray(terms, dtype=np.int64)
+        docs = np.asarray(docs, dtype=np.int64)
+
+        # Sorted (term, doc) pairs with their frequencies = the CSC matrix.
+        pairs, tf = np.unique(terms * num_docs + docs, return_counts=True)
+        pair_terms, pair_docs = pairs // num_docs, pairs % num_docs
+        df = np.bincount(pair_terms, minlength=num_terms)
+        doc_len = np.bincount(docs, minlength=num_docs).astype(np.float64)
+        avg_len = max(doc_len.mean(), 1.0)
+        idf = np.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * doc_len[pair_docs] / avg_len)
+        weights = idf[pair_terms] * tf / (tf + norm)
+
+        vocabulary = [None] * num_terms
+        for term, term_id in term_ids.items():
+            vocabulary[term_id] = term
+        term_indptr = np.zeros(num_terms + 1, dtype=np.int64)
+        term_indptr[1:] = np.cumsum(df)
+        return cls(documents, vocabulary, term_indptr, pair_docs, weights)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index saved with `save`.
+        """
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as data:
+            assert(int(data["format_version"]) == BM25_INDEX_FORMAT_VERSION)
+            return cls(
+                    data["documents"], data["vocabulary"],
+                    data["term_indptr"], data["doc_ids"], data["weights"]
+            )
+
+    def save(self, path):
+        """
+        Saves the index as a (compressed) `.npz` file.
+
+        Numpy appends the `.npz` extension to `path` if it is missing.
+        """
+        import numpy as np
+
+        np.savez_compressed(
+                path,
+                format_version=np.int64(BM25_INDEX_FORMAT_VERSION),
+                documents=self.documents,
+                vocabulary=self.vocabulary,
+                term_indptr=self.term_indptr,
+                doc_ids=self.doc_ids,
+                weights=self.weights
+        )
+
+    def __len__(self):
+        return len(self.documents)
+
+    def query_matrix(self, queries):
+        # Returns the sparse (COO) query-term matrix: (rows, terms, counts).
+        import numpy as np
+
+        rows, terms = [], []
+        for row, query in enumerate(queries):
+            for token in tokenize(query):
+                term_id = self.term_ids.get(token)
+                if term_id is not None:
+                    rows.append(row)
+                    terms.append(term_id)
+        num_terms = max(1, len(self.vocabulary))
+        pairs, counts = np.unique(
+                np.asarray(rows, dtype=np.int64) * num_terms +
+                np.asarray(terms, dtype=np.int64),
+                return_counts=True
+        )
+        return pairs // num_terms, pairs % num_terms, counts
+
+    def scores(self, queries):
+        """
+        Returns the (len(queries), len(index)) matrix of BM25 scores.
+
+        The product between the sparse query-term matrix and the sparse
+        term-document matrix is computed with a single `np.bincount`. A
+        query term repeated n times contributes n times (as in Lucene).
+        """
+        import numpy as np
+
+        queries = list(queries)
+        num_docs = len(self.documents)
+        rows, terms, counts = self.query_matrix(queries)
+        starts = self.term_indptr[terms]
+        lengths = self.term_indptr[terms + 1] - starts
+        # Positions of all the postings of all the query terms.
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)  # noqa: E501
+        cells = np.repeat(rows, lengths) * num_docs + self.doc_ids[positions]
+        values = self.weights[positions] * np.repeat(counts, lengths)
+        scores = np.bincount(cells, weights=values, minlength=len(queries) * num_docs)  # noqa: E501
+        return scores.reshape(len(queries), num_docs)
+
+    def search(self, queries, k=10, batch_size=1024):
+        """
+        Finds the `k` most relevant documents for each query.
+
+        Returns a tuple (indices, scores) of arrays with the shape
+        (len(queries), k): `indices[i]` are the positions of the documents
+        (see `documents`) in decreasing order of the score (equal scores
+        are ordered by position). If fewer than `k` documents share a term
+        with a query, the remaining positions are -1 (with a score of 0).
+
+        The top `k` documents are selected in linear time (see
+        `data_mine.utils.top_k`). The queries are scored in batches of
+        `batch_size` so the memory usage is bounded by
+        `batch_size * len(index)` scores.
+        """
+        import numpy as np
+
+        assert(k >= 1)
+        assert(batch_size >= 1)
+        queries = list(queries)
+        k_eff = min(k, len(self.documents))
+        all_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.zeros((len(queries), k), dtype=np.float32)
+        for start in range(0, len(queries), batch_size):
+            scores = self.scores(queries[start:start + batch_size])
+            top, top_scores = top_k(scores, k_eff)
+            top[top_scores <= 0] = -1
+            top_scores[top_scores <= 0] = 0
+            end = start + len(scores)
+            all_indices[start:end, :k_eff] = top
+            all_scores[start:end, :k_eff] = top_scores
+        return all_indices, all_scores
+
+
+def OBQAFactsBM25(k1=1.2, b=0.75):
+    """
+    Builds a BM25 index over the distinct OpenBookQA core science facts.
+
+    The facts are indexed in lexicographic order so the positions returned
+    by `BM25Index.search` do not depend on the order of the facts file.
+
+    Example:
+        index = OBQAFactsBM25()
+        indices, scores = index.search(["wind causes erosion"], k=5)
+        facts = index.documents[indices[0][indices[0] >= 0]]
+    """
+    return BM25Index.build(sorted(set(OBQAFacts())), k1=k1, b=b)
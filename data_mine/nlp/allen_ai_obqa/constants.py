@@ -1,5 +1,10 @@
-import os
+# Bump this when the parsing logic changes (invalidates the split cache).
+OBQA_LOADER_VERSION = 1
 
-from data_mine.utils import datamine_cache_dir
+# The columns of the DataFrames returned by `OBQADataset` (the last one is
+# only present if the retrieved facts are requested).
+OBQA_COLUMNS = ["id", "question", "answers", "correct", "retrieved_facts"]
 
-OBQA_CACHE_DIR = os.path.join(datamine_cache_dir(), "ALLEN_AI_OBQA")
+# The number of questions whose retrieved facts are looked up together by
+# the streaming loader (see `iter_obqa`).
+RETRIEVED_FACTS_CHUNK_SIZE = 1024
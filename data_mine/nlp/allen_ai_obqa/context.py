@@ -0,0 +1,105 @@
+import functools
+import itertools
+import multiprocessing
+
+from collections import OrderedDict
+from six.moves import zip_longest
+
+CONTEXT_SEPARATOR = " . "
+
+
+def unique(items):
+    """
+    Returns the distinct items of a list, in the order of first appearance.
+    """
+    return list(OrderedDict.fromkeys(items))
+
+
+def token_lengths(facts, tokenize, num_workers=1):
+    """
+    Computes the number of tokens of every distinct fact.
+
+    Returns a dictionary from fact to `len(tokenize(fact))`. Each distinct
+    fact is tokenized exactly once. If `num_workers` is greater than 1, the
+    facts are tokenized by a pool of processes (`tokenize` must be
+    picklable, e.g. a module level function such as `nltk.word_tokenize`).
+    """
+    assert(num_workers >= 1)
+    facts = unique(facts)
+    if num_workers == 1 or len(facts) <= 1:
+        lengths = [num_tokens(fact, tokenize) for fact in facts]
+    else:
+        pool = multiprocessing.Pool(num_workers)
+        try:
+            chunksize = max(1, len(facts) // (num_workers * 4))
+            lengths = pool.map(functools.partial(num_tokens, tokenize=tokenize), facts, chunksize)  # noqa: E501
+        finally:
+            pool.close()
+            pool.join()
+    return dict(zip(facts, lengths))
+
+
+def num_tokens(fact, tokenize):
+    return len(tokenize(fact))
+
+
+def pack_context(facts1, facts2, lengths, max_tokens=512, num_head=5):
+    """
+    Builds a context (string) from two ranked lists of facts.
+
+    The context starts with the top `num_head` facts of each list. The
+    remaining facts are interleaved and appended while the context has
+    fewer than `max_tokens` tokens. Duplicate facts are then removed (the
+    first occurrence is kept) and the facts are joined by " . ".
+
+    `lengths` maps every fact to its number of tokens (see `token_lengths`).
+    """
+    facts = facts1[:num_head] + facts2[:num_head]
+    remaining = itertools.chain(*zip_longest(facts1[num_head:], facts2[num_head:]))  # noqa: E501
+    num_total_tokens = sum(lengths[fact] for fact in facts)
+    for fact in remaining:
+        if num_total_tokens >= max_tokens:
+            break
+        if fact is not None:
+            facts.append(fact)
+            num_total_tokens += lengths[fact]
+    return CONTEXT_SEPARATOR.join(unique(facts))
+
+
+def pack_contexts(fact_lists, tokenize, num_workers=1, max_tokens=512, num_head=5):  # noqa: E501
+    """
+    Builds the contexts (see `pack_context`) of many pairs of fact lists.
+
+    `fact_lists` is a list of (facts1, facts2) tuples. The distinct facts
+    of all the pairs are tokenized once (see `token_lengths`) and the pairs
+    are then packed using the table of token lengths. Both steps run on a
+    pool of `num_workers` processes if `num_workers` is greater than 1.
+
+    Returns the list of contexts, in the order of `fact_lists`.
+    """
+    assert(num_workers >= 1)
+    fact_lists = list(fact_lists)
+    all_facts = itertools.chain(*[facts1 + facts2 for facts1, facts2 in fact_lists])  # noqa: E501
+    lengths = token_lengths(all_facts, tokenize, num_workers=num_workers)
+    pack = functools.partial(
+            pack_chunk, lengths=lengths,
+            max_tokens=max_tokens, num_head=num_head
+    )
+    if num_workers == 1 or len(fact_lists) <= 1:
+        return pack(fact_lists)
+    num_chunks = min(len(fact_lists), num_workers * 4)
+    bounds = [len(fact_lists) * i // num_chunks for i in range(0, num_chunks + 1)]  # noqa: E501
+    chunks = [fact_lists[bounds[i]:bounds[i + 1]] for i in range(0, num_chunks)]  # noqa: E501
+    pool = multiprocessing.Pool(num_workers)
+    try:
+        return list(itertools.chain(*pool.map(pack, chunks)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def pack_chunk(fact_lists, lengths, max_tokens, num_head):
+    return [
+        pack_context(facts1, facts2, lengths, max_tokens, num_head)
+        for facts1, facts2 in fact_lists
+    ]
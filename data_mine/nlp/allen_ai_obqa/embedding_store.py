@@ -0,0 +1,157 @@
+import json
+import os
+
+from data_mine.utils import top_k
+
+EMBEDDINGS_FILE_SUFFIX = ".npy"
+SENTENCES_FILE_SUFFIX = ".sentences.json"
+
+
+class EmbeddingStore(object):
+    """
+    A matrix of sentence embeddings with a sentence -> row index.
+
+    On disk, a store with the path `PATH` is made of two files:
+    * `PATH.npy`: a float32 matrix with one (unit length) embedding per row;
+    * `PATH.sentences.json`: the list of sentences (the i-th sentence is
+      the sentence of the i-th row).
+
+    The matrix is memory-mapped when the store is loaded, so loading does
+    not copy (or read) the embeddings: only the rows that are used are
+    paged in by the operating system.
+
+    Embeddings are normalized when the store is created, so the similarity
+    between two embeddings (their dot product) is the cosine similarity.
+    """
+
+    def __init__(self, sentences, matrix):
+        assert(len(matrix.shape) == 2)
+        assert(len(sentences) == matrix.shape[0])
+        self.sentences = list(sentences)
+        self.matrix = matrix
+        self.sentence_rows = {s: i for i, s in enumerate(self.sentences)}
+        assert(len(self.sentence_rows) == len(self.sentences))  # Unique.
+
+    @classmethod
+    def create(cls, path, sentences, embeddings):
+        """
+        Saves the embeddings of a list of (distinct) sentences at `path`.
+
+        `embeddings` is a matrix (or a list of vectors) with one embedding per
+        sentence. The embeddings are stored as unit length float32 vectors.
+        Returns the (memory-mapped) store.
+        """
+        import numpy as np
+
+        sentences = list(sentences)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        assert(len(matrix.shape) == 2)
+        assert(len(sentences) == len(matrix))
+        assert(len(set(sentences)) == len(sentences))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, np.finfo(np.float32).tiny)
+        np.save(path + EMBEDDINGS_FILE_SUFFIX, matrix)
+        with open(path + SENTENCES_FILE_SUFFIX, "wt") as g:
+            json.dump(sentences, g)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads the store saved at `path` (see `create`).
+
+        If `mmap` is False, the embeddings are read in memory.
+        """
+        import numpy as np
+
+        embeddings_file = path + EMBEDDINGS_FILE_SUFFIX
+        if not os.path.isfile(embeddings_file):
+            raise RuntimeError("Cannot find the embeddings at: {}".format(embeddings_file))  # noqa: E501
+        matrix = np.load(embeddings_file, mmap_mode="r" if mmap else None)
+        with open(path + SENTENCES_FILE_SUFFIX, "rt") as f:
+            sentences = json.load(f)
+        return cls(sentences, matrix)
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def __contains__(self, sentence):
+        return sentence in self.sentence_rows
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def rows(self, sentences):
+        """
+        Returns the rows (np.array) of a list of sentences.
+
+        A KeyError is raised if a sentence is not in the store.
+        """
+        import numpy as np
+
+        return np.array([self.sentence_rows[s] for s in sentences], dtype=np.int64)  # noqa: E501
+
+    def vectors(self, sentences):
+        """
+        Returns the (len(sentences), dim) matrix with the embeddings of a list
+        of sentences. Only the requested rows are read.
+        """
+        return self.matrix[self.rows(sentences)]
+
+    def search(self, queries, k=10, candidates=None, batch_size=1024, ann_index=None):  # noqa: E501
+        """
+        Finds the `k` most similar candidates for each query embedding.
+
+        `queries` is a (num_queries, dim) matrix (e.g. `vectors(sentences)`)
+        and `candidates` is a list of sentences from the store (all the
+        sentences if None). Returns a tuple (indices, similarities) of arrays
+        with the shape (num_queries, k): `indices[i]` are positions in
+        `candidates` (rows of the store if None), in decreasing order of the
+        cosine similarity. If there are fewer than `k` candidates, the
+        remaining positions are -1.
+
+        Exact search: the similarities of `batch_size` queries are computed
+        with a single matrix product and the top `k` are selected in linear
+        time (see `data_mine.utils.top_k`).
+
+        Approximate search: `ann_index` is an `annoy.AnnoyIndex` (angular
+        metric) whose item i is the embedding of the i-th candidate. Each
+        query is sent to the index and the angular distances are converted
+        back to cosine similarities.
+        """
+        import numpy as np
+
+        assert(k >= 1)
+        assert(batch_size >= 1)
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        assert(queries.shape[1] == self.dim)
+        if candidates is None:
+            matrix = self.matrix  # No copy (memory-mapped).
+        else:
+            matrix = self.vectors(candidates)
+        k_eff = min(k, len(matrix))
+        all_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        all_similarities = np.zeros((len(queries), k), dtype=np.float32)
+        if k_eff == 0:
+            return all_indices, all_similarities
+
+        if ann_index is not None:
+            for i, query in enumerate(queries):
+                items, distances = ann_index.get_nns_by_vector(query, k_eff, include_distances=True)  # noqa: E501
+                all_indices[i, :len(items)] = items
+                # Annoy's angular distance is sqrt(2 * (1 - cos(u, v))).
+                all_similarities[i, :len(items)] = 1.0 - np.square(distances) / 2.0  # noqa: E501
+            return all_indices, all_similarities
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.maximum(norms, np.finfo(np.float32).tiny)
+        for start in range(0, len(queries), batch_size):
+            similarities = np.dot(queries[start:start + batch_size], matrix.T)
+            indices, similarities = top_k(similarities, k_eff)
+            end = start + len(indices)
+            all_indices[start:end, :k_eff] = indices
+            all_similarities[start:end, :k_eff] = similarities
+        return all_indices, all_similarities
@@ -1,17 +1,24 @@
-import json
 import os
-import pandas as pd
 import string
 
 from data_mine import Collection
+from data_mine.utils import RecordSelector, Shard, get_json_loads
+from data_mine.utils import read_json_range, shard_lines
 from data_mine.zookeeper import check_shallow_integrity, download_dataset
+from data_mine.zookeeper import read_split_cache, write_split_cache
+from data_mine.zookeeper.record_index import index_jsonl_file
+from data_mine.zookeeper.record_index import load_record_index, lookup_records
 from six import string_types
-from .constants import OBQA_CACHE_DIR
+from .constants import OBQA_COLUMNS, OBQA_LOADER_VERSION
+from .constants import RETRIEVED_FACTS_CHUNK_SIZE
+from .retrieved_facts import load_retrieved_facts_index
 from .types import OBQAType
-from .utils import type_to_data_file
+from .utils import obqa_cache_dir, type_to_data_file
 
 
-def OBQADataset(obqa_type, with_retrieved_facts=False):
+def OBQADataset(obqa_type, with_retrieved_facts=False, use_cache=False,
+                columns=None, where=None, shard_index=None,
+                num_shards=None, seed=None):
     """
     Loads an OpenBookQA dataset given the type (see the OBQAType enum).
     Any error during reading will generate an exception.
@@ -35,62 +42,194 @@ def OBQADataset(obqa_type, with_retrieved_facts=False):
     constructed string using the top 5 token facts, top 5 vector facts and
     then interleaving the remaining facts (until about 500 tokens made up
     context). Facts are concatenated using " . " as a separator.
+
+    `columns` is the list of columns to return (all if None) and `where`
+    selects the questions to return (all if None), e.g.
+    `where={"correct": "A"}`. See `data_mine.utils.RecordSelector` for the
+    details. Both are applied while parsing: the retrieved facts are only
+    read for the selected questions (and only if 'retrieved_facts' is one
+    of the columns). `where` cannot use the retrieved facts.
+
+    If `use_cache` is True, the processed split is saved in the split cache
+    (under the DataMine cache directory) on the first call and later calls
+    load it from there instead of parsing the raw data again. The cache
+    always stores the whole split (`columns` and `where` are applied after).
+
+    `shard_index`, `num_shards` and `seed` load a part of the split for
+    data-parallel training (see `data_mine.utils.Shard`): the lines of the
+    data file are divided in `num_shards` ranges (shuffled first if `seed`
+    is not None) and only the lines of the range `shard_index` are parsed.
+    The split cache cannot be used with a shard.
     """
     assert(isinstance(obqa_type, OBQAType))
+    all_columns = OBQA_COLUMNS if with_retrieved_facts else OBQA_COLUMNS[:-1]  # noqa: E501
+    selector = RecordSelector(all_columns, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    assert(not use_cache or shard.is_whole_split), "The split cache stores whole splits"  # noqa: E501
+    if isinstance(where, dict):
+        assert("retrieved_facts" not in where)
     download_dataset(Collection.ALLEN_AI_OBQA, check_shallow_integrity)
-    all_data = []
-    all_ids = set()
-    retrieved_facts = None
-    if with_retrieved_facts:
-        retrieved_facts = json.load(open(os.path.join(OBQA_CACHE_DIR, "extracted_facts.json")))  # noqa: E501
-    with open(type_to_data_file(obqa_type), "rt") as f:
-        for line in f:
-            entry = json.loads(line)
-            assert(len(entry) == 3)
-
-            question_id = entry["id"]
-            correct_answer = entry["answerKey"]
-            assert(isinstance(question_id, string_types))
-            assert(correct_answer in ["A", "B", "C", "D"])
-
-            entry = entry["question"]
-            assert(len(entry) == 2)
-            question = entry["stem"]
-            answers = [
-                choice["text"]
-                for choice in sorted(
-                    entry["choices"],
-                    key=lambda x: x["label"])
-            ]
-            assert(isinstance(question, string_types))
-            assert(len(answers) == 4)
-            for answer in answers:
-                assert(isinstance(answer, string_types))
-            assert(question_id not in all_ids)
-            all_ids.add(question_id)
-            new_row = {
-                "id": question_id,
-                "question": question,
-                "answers": answers,
-                "correct": correct_answer
-            }
-            if with_retrieved_facts:
-                queries = [question + " " + answer for answer in answers]
-                facts = [retrieved_facts[query] for query in queries]
-                assert(len(facts) == 4)
-                for fact in facts:
-                    assert(len(fact) == 3)
-                    assert(isinstance(fact, dict))
-                    assert("context" in fact)
-                    assert("token_based" in fact)
-                    assert("vector_based" in fact)
-                new_row["retrieved_facts"] = facts
-            all_data.append(new_row)
-    assert(len(all_data) == len(all_ids))
-    df = pd.DataFrame(all_data)
+    cache_variant = "with_retrieved_facts" if with_retrieved_facts else None
+    if use_cache:
+        df = read_split_cache(
+                Collection.ALLEN_AI_OBQA, obqa_type,
+                OBQA_LOADER_VERSION, variant=cache_variant
+        )
+        if df is not None:
+            return selector.apply(df)
+        parse_selector = RecordSelector(all_columns)
+    else:
+        parse_selector = selector
+    records = stream_obqa(obqa_type, parse_selector, shard)
+    df = parse_selector.frame(list(records))
+    if use_cache:
+        write_split_cache(
+                Collection.ALLEN_AI_OBQA, obqa_type,
+                OBQA_LOADER_VERSION, df, variant=cache_variant
+        )
+        df = selector.apply(df)
     return df
 
 
+def iter_obqa(obqa_type, with_retrieved_facts=False, columns=None,
+              where=None, shard_index=None, num_shards=None, seed=None):
+    """
+    Yields the OpenBookQA questions of the given split one at a time.
+
+    The records are the rows of the DataFrame returned by `OBQADataset`
+    and the arguments have the same meaning. The data file is read line by
+    line and the retrieved facts (if selected) are looked up for chunks of
+    `RETRIEVED_FACTS_CHUNK_SIZE` questions.
+    """
+    assert(isinstance(obqa_type, OBQAType))
+    all_columns = OBQA_COLUMNS if with_retrieved_facts else OBQA_COLUMNS[:-1]  # noqa: E501
+    selector = RecordSelector(all_columns, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    if isinstance(where, dict):
+        assert("retrieved_facts" not in where)
+    download_dataset(Collection.ALLEN_AI_OBQA, check_shallow_integrity)
+    return stream_obqa(obqa_type, selector, shard)
+
+
+def stream_obqa(obqa_type, selector=None, shard=None):
+    # Generator behind `OBQADataset` and `iter_obqa`. It does not download
+    # the dataset.
+    if selector is None:
+        selector = RecordSelector(OBQA_COLUMNS[:-1])
+    if shard is None:
+        shard = Shard()
+    with_retrieved_facts = "retrieved_facts" in selector.columns
+    all_ids = set()
+    chunk = []
+    loads = get_json_loads()
+    with open(type_to_data_file(obqa_type), "rb") as f:
+        for line in shard_lines(f, shard):
+            new_row = parse_entry(loads(line))
+            assert(new_row["id"] not in all_ids)
+            all_ids.add(new_row["id"])
+            if not selector.matches(new_row):
+                continue
+            if not with_retrieved_facts:
+                yield selector.project(new_row)
+                continue
+            chunk.append(new_row)
+            if len(chunk) == RETRIEVED_FACTS_CHUNK_SIZE:
+                for row in add_retrieved_facts(chunk):
+                    yield selector.project(row)
+                chunk = []
+    for row in add_retrieved_facts(chunk):
+        yield selector.project(row)
+
+
+def add_retrieved_facts(rows):
+    """
+    Adds the retrieved facts (see `OBQADataset`) to a list of records.
+
+    The facts of all the records are read with a single lookup. Returns
+    the records.
+    """
+    if len(rows) == 0:
+        return rows
+    # Only the records of the queries of these questions are read.
+    queries = [
+        row["question"] + " " + answer
+        for row in rows for answer in row["answers"]
+    ]
+    all_facts = load_retrieved_facts_index().lookup(queries)
+    for i, row in enumerate(rows):
+        facts = all_facts[4 * i:4 * i + 4]
+        assert(len(facts) == 4)
+        for fact in facts:
+            assert(len(fact) == 3)
+            assert(isinstance(fact, dict))
+            assert("context" in fact)
+            assert("token_based" in fact)
+            assert("vector_based" in fact)
+        row["retrieved_facts"] = facts
+    return rows
+
+
+def parse_entry(entry):
+    """
+    Validates a raw OpenBookQA entry (a decoded line) and converts it to a
+    record.
+
+    The record has the keys described in `OBQADataset` (without the
+    retrieved facts).
+    """
+    assert(len(entry) == 3)
+
+    question_id = entry["id"]
+    correct_answer = entry["answerKey"]
+    assert(isinstance(question_id, string_types))
+    assert(correct_answer in ["A", "B", "C", "D"])
+
+    entry = entry["question"]
+    assert(len(entry) == 2)
+    question = entry["stem"]
+    answers = [
+        choice["text"]
+        for choice in sorted(
+            entry["choices"],
+            key=lambda x: x["label"])
+    ]
+    assert(isinstance(question, string_types))
+    assert(len(answers) == 4)
+    for answer in answers:
+        assert(isinstance(answer, string_types))
+
+    return {
+        "id": question_id,
+        "question": question,
+        "answers": answers,
+        "correct": correct_answer
+    }
+
+
+def get_obqa_by_ids(obqa_type, ids):
+    """
+    Returns the OpenBookQA questions with the given IDs (records with the
+    keys described in `OBQADataset`, without the retrieved facts), in the
+    order of `ids`.
+
+    Only the requested questions are read and parsed, using an index of
+    their byte ranges (built and saved in the split cache on the first
+    call). A KeyError is raised if an ID is missing.
+    """
+    assert(isinstance(obqa_type, OBQAType))
+    download_dataset(Collection.ALLEN_AI_OBQA, check_shallow_integrity)
+    data_file = type_to_data_file(obqa_type)
+    index = load_record_index(
+            Collection.ALLEN_AI_OBQA, obqa_type, data_file,
+            lambda: index_jsonl_file(data_file, lambda entry: entry["id"])
+    )
+    with open(data_file, "rb") as f:
+        return lookup_records(
+                index, ids,
+                lambda start, end: [parse_entry(read_json_range(f, start, end))]  # noqa: E501
+        )
+
+
 def OBQAFacts():
     """
     Yields the 1326 core science facts from the OpenBook QA dataset.
@@ -103,7 +242,7 @@ def OBQAFacts():
     """
     download_dataset(Collection.ALLEN_AI_OBQA, check_shallow_integrity)
     facts_file = os.path.join(
-            OBQA_CACHE_DIR, "OpenBookQA-V1-Sep2018",
+            obqa_cache_dir(), "OpenBookQA-V1-Sep2018",
             "Data", "Main", "openbook.txt"
     )
     with open(facts_file, "rt") as f:
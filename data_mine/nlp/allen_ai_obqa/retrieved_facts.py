@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+from data_mine import Collection
+from data_mine.utils import json_load, json_loads
+from data_mine.zookeeper.integrity_manifest import file_signature
+from data_mine.zookeeper.split_cache import split_cache_dir
+from .utils import obqa_cache_dir
+
+# Bump this when the layout of the retrieved facts index changes.
+RETRIEVED_FACTS_FORMAT_VERSION = 1
+
+FACTS_TABLE_FILENAME = "facts.json"
+RECORDS_FILENAME = "records.jsonl"
+OFFSETS_FILENAME = "offsets.npz"
+
+# The indexes opened by this process, keyed by their directory.
+_LOADED_INDEXES = {}
+
+
+def retrieved_facts_file():
+    # The facts shipped with the dataset (see `RetrievedFactsIndex`).
+    return os.path.join(obqa_cache_dir(), "extracted_facts.json")
+
+
+def query_hash(query):
+    # A stable 64-bit hash of a query (first 8 bytes of SHA1).
+    return struct.unpack(">Q", hashlib.sha1(query.encode("utf-8")).digest()[:8])[0]  # noqa: E501
+
+
+def retrieved_facts_index_dir(facts_file):
+    """
+    Returns the directory of the index built from `facts_file`.
+
+    The name of the directory depends on the format version and on the
+    stat signature of `facts_file` (see `file_signature`), so a new copy of
+    the facts file (e.g. after a new download) gets a new index.
+    Example: `DATAMINE_CACHE_DIR/.split_cache/ALLEN_AI_OBQA/retrieved_facts.v1.0c3f9a1b2d4e5f60`.
+    """  # noqa: E501
+    signature = file_signature(facts_file)
+    assert(signature is not None), "Missing file: {}".format(facts_file)
+    key = hashlib.sha256(json.dumps(signature).encode()).hexdigest()[:16]
+    return os.path.join(
+            split_cache_dir(Collection.ALLEN_AI_OBQA),
+            "retrieved_facts.v{}.{}".format(RETRIEVED_FACTS_FORMAT_VERSION, key)  # noqa: E501
+    )
+
+
+class RetrievedFactsIndex(object):
+    """
+    Compact indexed storage of the facts retrieved for the OBQA queries.
+
+    The original `extracted_facts.json` maps every query (`question + " " +
+    answer`) to a dictionary with a context and two lists of facts. The
+    index directory is made of:
+    * `facts.json`: the table of distinct facts (each fact stored once);
+    * `records.jsonl`: one line per query with [query, context, token based
+      fact IDs, vector based fact IDs] (IDs are positions in the table);
+    * `offsets.npz`: the sorted 64-bit hashes of the queries and the byte
+      offsets of their records.
+
+    A lookup reads (seeks to) only the records of the requested queries.
+    """
+
+    def __init__(self, index_dir):
+        import numpy as np
+
+        self.records_file = os.path.join(index_dir, RECORDS_FILENAME)
+        with open(os.path.join(index_dir, FACTS_TABLE_FILENAME), "rb") as f:
+            self.facts = json_load(f)
+        with np.load(os.path.join(index_dir, OFFSETS_FILENAME), allow_pickle=False) as data:  # noqa: E501
+            self.hashes = data["hashes"]
+            self.offsets = data["offsets"]
+
+    @classmethod
+    def build(cls, facts_file, index_dir):
+        """
+        Converts `facts_file` (see `extracted_facts.json`) to an index.
+
+        The index is written to a temporary directory which is then renamed
+        to `index_dir`, so readers never observe a partially written index.
+        """
+        import numpy as np
+
+        with open(facts_file, "rb") as f:
+            retrieved_facts = json_load(f)
+        assert(isinstance(retrieved_facts, dict))
+        parent_dir = os.path.dirname(index_dir)
+        if not os.path.isdir(parent_dir):
+            os.makedirs(parent_dir, mode=0o755)
+        temp_dir = tempfile.mkdtemp(prefix=".building-", dir=parent_dir)
+        try:
+            fact_ids = {}
+            hashes, offsets = [], []
+            records_file = os.path.join(temp_dir, RECORDS_FILENAME)
+            with open(records_file, "wb") as g:
+                for query in sorted(retrieved_facts):
+                    entry = retrieved_facts[query]
+                    record = [
+                        query,
+                        entry["context"],
+                        [fact_ids.setdefault(f, len(fact_ids)) for f in entry["token_based"]],  # noqa: E501
+                        [fact_ids.setdefault(f, len(fact_ids)) for f in entry["vector_based"]]  # noqa: E501
+                    ]
+                    hashes.append(query_hash(query))
+                    offsets.append(g.tell())
+                    g.write(json.dumps(record).encode("utf-8"))
+                    g.write(b"\n")
+            facts = [None] * len(fact_ids)
+            for fact, fact_id in fact_ids.items():
+                facts[fact_id] = fact
+            with open(os.path.join(temp_dir, FACTS_TABLE_FILENAME), "wt") as g:
+                json.dump(facts, g)
+            hashes = np.array(hashes, dtype=np.uint64)
+            offsets = np.array(offsets, dtype=np.int64)
+            order = np.argsort(hashes, kind="mergesort")
+            np.savez(
+                    os.path.join(temp_dir, OFFSETS_FILENAME),
+                    hashes=hashes[order], offsets=offsets[order]
+            )
+            if os.path.isdir(index_dir):
+                shutil.rmtree(index_dir)  # A concurrent build finished.
+            os.rename(temp_dir, index_dir)
+        finally:
+            if os.path.isdir(temp_dir):
+                shutil.rmtree(temp_dir)
+        return cls(index_dir)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def lookup(self, queries):
+        """
+        Returns the retrieved facts of a list of queries (in order).
+
+        Each result is a dictionary with the keys `context` (string),
+        `token_based` and `vector_based` (lists of facts), just like the
+        values of the original `extracted_facts.json`. A KeyError is raised
+        if a query is missing. The records are read in the order of their
+        offsets (a single forward pass over the records file).
+        """
+        import numpy as np
+
+        queries = list(queries)
+        hashes = np.array([query_hash(q) for q in queries], dtype=np.uint64)
+        starts = np.searchsorted(self.hashes, hashes, side="left")
+        ends = np.searchsorted(self.hashes, hashes, side="right")
+        results = [None] * len(queries)
+        candidates = sorted(
+            (offset, i)
+            for i, (start, end) in enumerate(zip(starts, ends))
+            for offset in self.offsets[start:end].tolist()
+        )
+        with open(self.records_file, "rb") as f:
+            for offset, i in candidates:
+                f.seek(offset)
+                query, context, token_ids, vector_ids = json_loads(f.readline())  # noqa: E501
+                if query == queries[i]:  # Hash collisions are not matches.
+                    results[i] = {
+                        "context": context,
+                        "token_based": [self.facts[j] for j in token_ids],
+                        "vector_based": [self.facts[j] for j in vector_ids]
+                    }
+        for query, result in zip(queries, results):
+            if result is None:
+                raise KeyError(query)
+        return results
+
+
+def load_retrieved_facts_index(facts_file=None):
+    """
+    Opens the index of `facts_file`, building it on the first call.
+
+    The default facts file is the one shipped with the dataset. The opened
+    index is kept in memory for the lifetime of the process, so the table
+    of facts is decoded once. Indexes of older versions of the facts file
+    (or of the format) are removed when a new index is built.
+    """
+    if facts_file is None:
+        facts_file = retrieved_facts_file()
+    index_dir = retrieved_facts_index_dir(facts_file)
+    index = _LOADED_INDEXES.get(index_dir)
+    if index is not None:
+        return index
+    if os.path.isdir(index_dir):
+        index = RetrievedFactsIndex(index_dir)
+    else:
+        index = RetrievedFactsIndex.build(facts_file, index_dir)
+        parent_dir = os.path.dirname(index_dir)
+        for name in os.listdir(parent_dir):
+            if name.startswith("retrieved_facts.v") and name != os.path.basename(index_dir):  # noqa: E501
+                shutil.rmtree(os.path.join(parent_dir, name), ignore_errors=True)  # noqa: E501
+    _LOADED_INDEXES[index_dir] = index
+    return index
@@ -1,9 +1,16 @@
 import os
 
-from .constants import OBQA_CACHE_DIR
+from data_mine.utils import datamine_cache_dir
 from .types import OBQAType
 
 
+def obqa_cache_dir():
+    """
+    Returns the directory of the OBQA dataset (inside the DataMine cache).
+    """
+    return os.path.join(datamine_cache_dir(), "ALLEN_AI_OBQA")
+
+
 def type_to_data_file(obqa_type):
     """
     Computes the path of the OBQA data file given the type.
@@ -12,7 +19,7 @@ def type_to_data_file(obqa_type):
     """
     assert(isinstance(obqa_type, OBQAType))
     data_dir = os.path.join(
-            OBQA_CACHE_DIR,
+            obqa_cache_dir(),
             "OpenBookQA-V1-Sep2018",
             "Data", "Main"
     )
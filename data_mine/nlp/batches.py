@@ -0,0 +1,71 @@
+from data_mine import Collection
+from data_mine.nlp.allen_ai_arc import iter_arc
+from data_mine.nlp.allen_ai_drop import iter_drop
+from data_mine.nlp.allen_ai_obqa import iter_obqa
+from data_mine.nlp.cosmos_qa import iter_cosmos_qa
+from data_mine.nlp.CSQA import iter_csqa
+from data_mine.nlp.hotpot_qa import iter_hotpot_qa
+from data_mine.nlp.RACE import iter_race
+from data_mine.utils import batch_records, prefetch, shuffle_records
+
+# The functions yielding the records of a split (see `iter_batches`).
+ITER_RECORDS = {
+    Collection.ALLEN_AI_ARC: iter_arc,
+    Collection.ALLEN_AI_DROP: iter_drop,
+    Collection.ALLEN_AI_OBQA: iter_obqa,
+    Collection.COSMOS_QA: iter_cosmos_qa,
+    Collection.CSQA: iter_csqa,
+    Collection.HOTPOT_QA: iter_hotpot_qa,
+    Collection.RACE: iter_race
+}
+
+
+def iter_batches(collection, split, batch_size=256, shuffle_buffer_size=0,
+                 seed=None, prefetch_batches=2, drop_last=False, **kwargs):
+    """
+    Yields the questions of a dataset split in columnar batches.
+
+    `split` is a value of the type enum of the dataset (e.g. RACEType.DEV).
+    Each batch is a dictionary {column: list of values} with `batch_size`
+    questions (the last batch may be smaller, unless `drop_last` is True).
+    The other keyword arguments are passed to the record iterator of the
+    dataset (e.g. `columns`, `where`, `shard_index` and `num_shards`, see
+    `iter_race`).
+
+    The split is parsed incrementally by a background thread which stays
+    `prefetch_batches` batches ahead of the consumer, so the first batches
+    are available before the split is fully parsed.
+
+    If `shuffle_buffer_size` is positive, the questions are shuffled with a
+    buffer of that many questions (see `data_mine.utils.shuffle_records`).
+    `seed` makes the order deterministic: it seeds the buffer. It is passed
+    to the record iterator only when a shard is requested (`shard_index`
+    and `num_shards`), so that the shards are random samples of the split
+    (see `data_mine.utils.Shard`). A seeded shard of a RACE, DROP or
+    HotpotQA split uses the index of the split, which the first call on a
+    cold cache builds. An unsharded call never builds the index.
+
+    The supported collections are the keys of `ITER_RECORDS` (all but
+    TRIVIA_QA, which has no loader yet). A ValueError is raised for the
+    other collections.
+
+    Example:
+        for batch in iter_batches(Collection.RACE, RACEType.TRAIN_HIGH):
+            train_step(batch["question"], batch["answers"])
+    """
+    assert(isinstance(collection, Collection))
+    assert(shuffle_buffer_size >= 0)
+    assert(prefetch_batches >= 0)
+    if collection not in ITER_RECORDS:
+        raise ValueError("Batches are not supported for {}. Supported collections: {}".format(  # noqa: E501
+            collection.name, ", ".join(sorted(c.name for c in ITER_RECORDS))
+        ))
+    if kwargs.get("num_shards") is not None:
+        kwargs["seed"] = seed
+    records = ITER_RECORDS[collection](split, **kwargs)
+    if shuffle_buffer_size > 0:
+        records = shuffle_records(records, shuffle_buffer_size, seed)
+    batches = batch_records(records, batch_size, drop_last)
+    if prefetch_batches > 0:
+        batches = prefetch(batches, prefetch_batches)
+    return batches
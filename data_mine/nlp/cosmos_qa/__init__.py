@@ -1,2 +1,3 @@
-from .loader import CosmosQADataset
+from .loader import CosmosQADataset, get_cosmos_qa_by_ids
+from .loader import iter_cosmos_qa
 from .types import CosmosQAType
@@ -1,5 +1,5 @@
-import os
+# Bump this when the parsing logic changes (invalidates the split cache).
+COSMOS_QA_LOADER_VERSION = 1
 
-from data_mine.utils import datamine_cache_dir
-
-COSMOS_QA_CACHE_DIR = os.path.join(datamine_cache_dir(), "COSMOS_QA")
+# The columns of the DataFrames returned by `CosmosQADataset`.
+COSMOS_QA_COLUMNS = ["id", "question", "context", "answers", "correct"]
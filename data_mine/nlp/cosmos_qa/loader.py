@@ -1,14 +1,20 @@
-import json
-import pandas as pd
-
 from data_mine import Collection
+from data_mine.utils import RecordSelector, normalize_column
+from data_mine.utils import Shard, get_json_loads, read_json_range
+from data_mine.utils import shard_lines
 from data_mine.zookeeper import check_shallow_integrity, download_dataset
+from data_mine.zookeeper import read_split_cache, write_split_cache
+from data_mine.zookeeper.record_index import index_jsonl_file
+from data_mine.zookeeper.record_index import load_record_index, lookup_records
 from six import string_types
+from .constants import COSMOS_QA_COLUMNS, COSMOS_QA_LOADER_VERSION
 from .types import CosmosQAType
 from .utils import type_to_data_file
 
 
-def CosmosQADataset(cosmos_qa_type):
+def CosmosQADataset(cosmos_qa_type, use_cache=False, normalized=False,
+                    columns=None, where=None, shard_index=None,
+                    num_shards=None, seed=None):
     """
     Loads a Cosmos QA dataset given the split (see the CosmosQAType enum).
     Any error during reading will generate an exception.
@@ -19,10 +25,107 @@ def CosmosQADataset(cosmos_qa_type):
     * 'context': string
     * 'answers': list[string], length = 4
     * 'correct': oneof('A', 'B', 'C', D') or None for the test split
+
+    If `normalized` is True, a tuple (passages, questions) of DataFrames is
+    returned instead. `passages` has one column ('context') and one row for
+    each distinct passage. `questions` has the columns above except 'context'
+    which is replaced by 'passage_idx' (int), the row of the passage in the
+    `passages` DataFrame. Each passage is stored only once which makes the
+    data much cheaper to serialize (e.g. when sent to worker processes).
+
+    `columns` is the list of columns to return (all if None) and `where`
+    selects the questions to return (all if None), e.g.
+    `where={"correct": ["A", "B"]}`. See `data_mine.utils.RecordSelector`
+    for the details. Both are applied while parsing. If `normalized` is
+    True, `columns` must contain 'context'.
+
+    If `use_cache` is True, the processed split is saved in the split cache
+    (under the DataMine cache directory) on the first call and later calls
+    load it from there instead of parsing the raw data again. The cache
+    always stores the whole split (`columns` and `where` are applied after).
+
+    `shard_index`, `num_shards` and `seed` load a part of the split for
+    data-parallel training (see `data_mine.utils.Shard`): the lines of the
+    data file are divided in `num_shards` ranges (shuffled first if `seed`
+    is not None) and only the lines of the range `shard_index` are parsed.
+    The split cache cannot be used with a shard.
     """
     assert(isinstance(cosmos_qa_type, CosmosQAType))
+    selector = RecordSelector(COSMOS_QA_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    assert(not use_cache or shard.is_whole_split), "The split cache stores whole splits"  # noqa: E501
+    assert(not normalized or "context" in selector.columns)
+
+    def output(df):
+        if normalized:
+            return normalize_column(df, "context", "passage_idx")
+        return df
+
     download_dataset(Collection.COSMOS_QA, check_shallow_integrity)
+    if use_cache:
+        df = read_split_cache(
+                Collection.COSMOS_QA, cosmos_qa_type,
+                COSMOS_QA_LOADER_VERSION
+        )
+        if df is not None:
+            return output(selector.apply(df))
+        parse_selector = RecordSelector(COSMOS_QA_COLUMNS)
+    else:
+        parse_selector = selector
+
+    records = stream_cosmos_qa(cosmos_qa_type, parse_selector, shard)
+    df = parse_selector.frame(list(records))
+    if use_cache:
+        write_split_cache(
+                Collection.COSMOS_QA, cosmos_qa_type,
+                COSMOS_QA_LOADER_VERSION, df
+        )
+        df = selector.apply(df)
+    return output(df)
+
 
+def iter_cosmos_qa(cosmos_qa_type, columns=None, where=None,
+                   shard_index=None, num_shards=None, seed=None):
+    """
+    Yields the Cosmos QA questions of the given split one at a time.
+
+    The records are the rows of the (not normalized) DataFrame returned by
+    `CosmosQADataset` and the arguments have the same meaning. The data
+    file is read line by line.
+    """
+    assert(isinstance(cosmos_qa_type, CosmosQAType))
+    selector = RecordSelector(COSMOS_QA_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    download_dataset(Collection.COSMOS_QA, check_shallow_integrity)
+    return stream_cosmos_qa(cosmos_qa_type, selector, shard)
+
+
+def stream_cosmos_qa(cosmos_qa_type, selector=None, shard=None):
+    # Generator behind `CosmosQADataset` and `iter_cosmos_qa`. It does not
+    # download the dataset.
+    if selector is None:
+        selector = RecordSelector(COSMOS_QA_COLUMNS)
+    if shard is None:
+        shard = Shard()
+    all_ids = set()
+    loads = get_json_loads()
+    with open(type_to_data_file(cosmos_qa_type), "rb") as f:
+        for line in shard_lines(f, shard):
+            record = parse_entry(loads(line), cosmos_qa_type)
+            assert(record["id"] not in all_ids)
+            all_ids.add(record["id"])
+            record = selector.select(record)
+            if record is not None:
+                yield record
+
+
+def parse_entry(entry, cosmos_qa_type):
+    """
+    Validates a raw Cosmos QA entry (a decoded line) and converts it to a
+    record.
+
+    The record has the keys described in `CosmosQADataset`.
+    """
     def extract_answers(entry):
         for i in range(0, 4):
             key = "answer{}".format(i)
@@ -31,45 +134,58 @@ def CosmosQADataset(cosmos_qa_type):
             yield answer
             del entry[key]
 
-    all_ids = set()
-    all_data = []
-    with open(type_to_data_file(cosmos_qa_type), "rt") as f:
-        for line in f:
-            entry = json.loads(line)
-            assert(isinstance(entry, dict))
-            if cosmos_qa_type != CosmosQAType.TEST:
-                assert(len(entry) == 8)
-            else:
-                assert(len(entry) == 7)
-
-            # Extract data.
-            question_id = entry["id"]
-            question = entry["question"]
-            context = entry["context"]
-            answers = list(extract_answers(entry))
-            label = entry.get("label", None)
-            if label is not None:
-                label = chr(ord('A') + int(label))
-
-            # Validate data.
-            assert(isinstance(question_id, string_types))
-            assert(isinstance(question, string_types))
-            assert(isinstance(context, string_types))
-            assert(isinstance(answers, list) and len(answers) == 4)
-            if cosmos_qa_type == CosmosQAType.TEST:
-                assert(label is None)
-            else:
-                assert(label in ["A", "B", "C", "D"])
-
-            assert(question_id not in all_ids)
-            all_ids.add(question_id)
-            all_data.append({
-                "id": question_id,
-                "question": question,
-                "context": context,
-                "answers": answers,
-                "correct": label,
-            })
-    assert(len(all_data) == len(all_ids))
-    df = pd.DataFrame(all_data)
-    return df
+    assert(isinstance(entry, dict))
+    if cosmos_qa_type != CosmosQAType.TEST:
+        assert(len(entry) == 8)
+    else:
+        assert(len(entry) == 7)
+
+    # Extract data.
+    question_id = entry["id"]
+    question = entry["question"]
+    context = entry["context"]
+    answers = list(extract_answers(entry))
+    label = entry.get("label", None)
+    if label is not None:
+        label = chr(ord('A') + int(label))
+
+    # Validate data.
+    assert(isinstance(question_id, string_types))
+    assert(isinstance(question, string_types))
+    assert(isinstance(context, string_types))
+    assert(isinstance(answers, list) and len(answers) == 4)
+    if cosmos_qa_type == CosmosQAType.TEST:
+        assert(label is None)
+    else:
+        assert(label in ["A", "B", "C", "D"])
+
+    return {
+        "id": question_id,
+        "question": question,
+        "context": context,
+        "answers": answers,
+        "correct": label,
+    }
+
+
+def get_cosmos_qa_by_ids(cosmos_qa_type, ids):
+    """
+    Returns the Cosmos QA questions with the given IDs (records with the
+    keys described in `CosmosQADataset`), in the order of `ids`.
+
+    Only the requested questions are read and parsed, using an index of
+    their byte ranges (built and saved in the split cache on the first
+    call). A KeyError is raised if an ID is missing.
+    """
+    assert(isinstance(cosmos_qa_type, CosmosQAType))
+    download_dataset(Collection.COSMOS_QA, check_shallow_integrity)
+    data_file = type_to_data_file(cosmos_qa_type)
+    index = load_record_index(
+            Collection.COSMOS_QA, cosmos_qa_type, data_file,
+            lambda: index_jsonl_file(data_file, lambda entry: entry["id"])
+    )
+    with open(data_file, "rb") as f:
+        return lookup_records(
+                index, ids,
+                lambda start, end: [parse_entry(read_json_range(f, start, end), cosmos_qa_type)]  # noqa: E501
+        )
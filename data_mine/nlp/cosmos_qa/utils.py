@@ -1,9 +1,16 @@
 import os
 
-from .constants import COSMOS_QA_CACHE_DIR
+from data_mine.utils import datamine_cache_dir
 from .types import CosmosQAType
 
 
+def cosmos_qa_cache_dir():
+    """
+    Returns the directory of the Cosmos QA dataset (inside the DataMine cache).
+    """
+    return os.path.join(datamine_cache_dir(), "COSMOS_QA")
+
+
 def type_to_data_file(cosmos_qa_type):
     """
     Computes the path of the Cosmos QA data file given the type.
@@ -11,7 +18,7 @@ def type_to_data_file(cosmos_qa_type):
     Each Cosmos QA type has the corresponding data located in one file.
     """
     assert(isinstance(cosmos_qa_type, CosmosQAType))
-    data_dir = COSMOS_QA_CACHE_DIR
+    data_dir = cosmos_qa_cache_dir()
     return {
             CosmosQAType.TRAIN: os.path.join(data_dir, "train.jsonl"),
             CosmosQAType.DEV: os.path.join(data_dir, "valid.jsonl"),
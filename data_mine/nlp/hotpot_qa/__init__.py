@@ -1,2 +1,3 @@
-from .loader import HotpotQADataset
+from .loader import HotpotQADataset, get_hotpot_qa_by_ids
+from .loader import iter_hotpot_qa
 from .types import HotpotQAType
@@ -1,5 +1,8 @@
-import os
+# Bump this when the parsing logic changes (invalidates the split cache).
+HOTPOT_QA_LOADER_VERSION = 1
 
-from data_mine.utils import datamine_cache_dir
-
-HOTPOT_QA_CACHE_DIR = os.path.join(datamine_cache_dir(), "HOTPOT_QA")
+# The columns of the DataFrames returned by `HotpotQADataset`.
+HOTPOT_QA_COLUMNS = [
+    "id", "question", "answer", "gold_paragraphs", "supporting_facts",
+    "context", "question_type", "question_level"
+]
@@ -1,15 +1,18 @@
-import json
-import more_itertools
-import pandas as pd
-
 from data_mine import Collection
+from data_mine.utils import RecordSelector, Shard, iter_json_array
+from data_mine.utils import read_json_range
 from data_mine.zookeeper import check_shallow_integrity, download_dataset
+from data_mine.zookeeper import read_split_cache, write_split_cache
+from data_mine.zookeeper.record_index import RecordIndex, load_record_index
+from data_mine.zookeeper.record_index import lookup_records
 from six import string_types
+from .constants import HOTPOT_QA_COLUMNS, HOTPOT_QA_LOADER_VERSION
 from .types import HotpotQAType
 from .utils import type_to_data_file
 
 
-def HotpotQADataset(hotpot_qa_type):
+def HotpotQADataset(hotpot_qa_type, use_cache=False, columns=None, where=None,  # noqa: E501
+                    shard_index=None, num_shards=None, seed=None):
     """
     Loads a HotpotQA dataset given the split (see the HotpotQAType esplit.
     Any error during reading will generate an exception.
@@ -26,82 +29,215 @@ def HotpotQADataset(hotpot_qa_type):
 
     Please read the dataset's additional information page for a detailed
     explanation on the semantics of the fields above.
+
+    `columns` is the list of columns to return (all if None) and `where`
+    selects the questions to return (all if None), e.g.
+    `where={"question_level": "hard"}`. See `data_mine.utils.RecordSelector`
+    for the details. Both are applied while parsing: the questions that do
+    not match are never added to the DataFrame and the gold paragraphs are
+    not built unless they are requested.
+
+    If `use_cache` is True, the processed split is saved in the split cache
+    (under the DataMine cache directory) on the first call and later calls
+    load it from there instead of parsing the raw data again. The cache
+    always stores the whole split (`columns` and `where` are applied after).
+
+    `shard_index`, `num_shards` and `seed` load a part of the split for
+    data-parallel training (see `data_mine.utils.Shard`). The questions are
+    the units: only the questions of the shard are read and parsed, using
+    the index of their byte ranges (see `load_hotpot_qa_index`). On a cold
+    cache, the first sharded call builds this index, which decodes the
+    whole data file once; later calls (and other ranks) reuse the index
+    saved in the split cache. The split cache cannot be used with a shard.
+    """
+    assert(isinstance(hotpot_qa_type, HotpotQAType))
+    selector = RecordSelector(HOTPOT_QA_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    assert(not use_cache or shard.is_whole_split), "The split cache stores whole splits"  # noqa: E501
+    download_dataset(Collection.HOTPOT_QA, check_shallow_integrity)
+    if not use_cache:
+        return selector.frame(list(stream_hotpot_qa(hotpot_qa_type, selector, shard)))  # noqa: E501
+    df = read_split_cache(
+            Collection.HOTPOT_QA, hotpot_qa_type,
+            HOTPOT_QA_LOADER_VERSION
+    )
+    if df is None:
+        full_selector = RecordSelector(HOTPOT_QA_COLUMNS)
+        df = full_selector.frame(list(stream_hotpot_qa(hotpot_qa_type, full_selector)))  # noqa: E501
+        write_split_cache(
+                Collection.HOTPOT_QA, hotpot_qa_type,
+                HOTPOT_QA_LOADER_VERSION, df
+        )
+    return selector.apply(df)
+
+
+def iter_hotpot_qa(hotpot_qa_type, columns=None, where=None, shard_index=None,
+                   num_shards=None, seed=None):
+    """
+    Yields the HotpotQA questions of the given split one at a time.
+
+    The records are the rows of the DataFrame returned by `HotpotQADataset`
+    (dictionaries with the same 8 keys) and are validated the same way.
+    The data file is parsed incrementally, so the memory usage stays flat
+    no matter how large the split is. Use this function instead of
+    `HotpotQADataset` when the whole split is not needed at once.
+
+    The other arguments have the same meaning as in `HotpotQADataset`.
+    """
+    assert(isinstance(hotpot_qa_type, HotpotQAType))
+    selector = RecordSelector(HOTPOT_QA_COLUMNS, columns, where)
+    shard = Shard(shard_index, num_shards, seed)
+    download_dataset(Collection.HOTPOT_QA, check_shallow_integrity)
+    return stream_hotpot_qa(hotpot_qa_type, selector, shard)
+
+
+def get_hotpot_qa_by_ids(hotpot_qa_type, ids):
+    """
+    Returns the HotpotQA questions with the given IDs (records with the
+    keys described in `HotpotQADataset`), in the order of `ids`.
+
+    Only the requested questions are read and parsed, using an index of
+    their byte ranges (built and saved in the split cache on the first
+    call). A KeyError is raised if an ID is missing.
     """
     assert(isinstance(hotpot_qa_type, HotpotQAType))
     download_dataset(Collection.HOTPOT_QA, check_shallow_integrity)
-    data = json.load(open(type_to_data_file(hotpot_qa_type), "rt"))
-    assert(isinstance(data, list))
-    processed_data = []
+    data_file = type_to_data_file(hotpot_qa_type)
+    index = load_hotpot_qa_index(hotpot_qa_type)
+    with open(data_file, "rb") as f:
+        return lookup_records(
+                index, ids,
+                lambda start, end: [parse_entry(read_json_range(f, start, end), hotpot_qa_type)]  # noqa: E501
+        )
+
+
+def load_hotpot_qa_index(hotpot_qa_type):
+    """
+    Returns the index of the byte ranges of the questions of a HotpotQA
+    split (see `RecordIndex`), building it on the first call.
+
+    Building the index decodes the whole data file once (incrementally).
+    The index is saved in the split cache.
+    """
+    data_file = type_to_data_file(hotpot_qa_type)
+
+    def build():
+        return RecordIndex.build(
+            (entry["_id"], start, end)
+            for entry, start, end in iter_json_array(data_file, with_offsets=True)  # noqa: E501
+        )
+
+    return load_record_index(
+            Collection.HOTPOT_QA, hotpot_qa_type, data_file, build
+    )
+
+
+def iter_shard_entries(hotpot_qa_type, shard):
+    # Yields the raw entries of a shard, read from their byte ranges. The
+    # first call on a cold cache decodes the whole file to build the index.
+    index = load_hotpot_qa_index(hotpot_qa_type)
+    ranges = sorted(zip(index.starts.tolist(), index.ends.tolist()))
+    with open(type_to_data_file(hotpot_qa_type), "rb") as f:
+        for i in shard.positions(len(ranges)):
+            yield read_json_range(f, ranges[i][0], ranges[i][1])
+
+
+def stream_hotpot_qa(hotpot_qa_type, selector=None, shard=None):
+    # Generator behind `iter_hotpot_qa`. It does not download the dataset.
+    if selector is None:
+        selector = RecordSelector(HOTPOT_QA_COLUMNS)
+    if shard is None or shard.is_whole_split:
+        entries = iter_json_array(type_to_data_file(hotpot_qa_type))
+    else:
+        entries = iter_shard_entries(hotpot_qa_type, shard)
+    gold_paragraphs = selector.needs("gold_paragraphs")
     all_ids = set()
-    for entry in data:
-        assert(isinstance(entry, dict))
-        if hotpot_qa_type != HotpotQAType.TEST_FULLWIKI:
-            assert(len(entry) == 7)
-        else:
-            assert(len(entry) == 3)  # _id, question, context
-
-        # Extract fields.
-        question_id = entry["_id"]
-        question = entry["question"]
-        answer = entry.get("answer", None)
-        supporting_facts = entry.get("supporting_facts", [])
-        context = entry["context"]
-        question_type = entry.get("type", None)
-        question_level = entry.get("level", None)
-
-        # Validate fields.
-        assert(isinstance(question_id, string_types))
-        assert(isinstance(question, string_types))
-        assert(isinstance(supporting_facts, list))
-        assert(isinstance(context, list))
-        if hotpot_qa_type != HotpotQAType.TEST_FULLWIKI:
-            assert(isinstance(answer, string_types))
-            assert(len(supporting_facts) > 0)
-            assert(question_type in ["comparison", "bridge"])
-            assert(question_level in ["easy", "medium", "hard"])
-        else:
-            assert(answer is None)
-            assert(len(supporting_facts) == 0)
-            assert(question_type is None)
-            assert(question_level is None)
-        # Note: most the the questions have 10 contexts.
-        assert(len(context) <= 10)
-
-        # Get the list of supporting sentences by joining the supporting
-        # facts with the context by title. There can be duplicate titles
-        # in the supporting facts.
-        titles = [title for title, _ in supporting_facts]
-        titles = list(more_itertools.unique_everseen(titles))
-        title2contents = {title: sentences for title, sentences in context}
-        assert(len(title2contents) == len(context))
-        if hotpot_qa_type == HotpotQAType.DEV_FULLWIKI:
-            titles = filter(lambda title: title in title2contents, titles)
-        gold_paragraphs = [' '.join(title2contents[title]) for title in titles]
-        for paragraph in gold_paragraphs:
-            assert(isinstance(paragraph, string_types))
-        if hotpot_qa_type == HotpotQAType.TRAIN:
-            assert(len(gold_paragraphs) == 2)
-        elif hotpot_qa_type == HotpotQAType.DEV_DISTRACTOR:
-            assert(len(gold_paragraphs) == 2)
-        elif hotpot_qa_type == HotpotQAType.DEV_FULLWIKI:
-            assert(len(gold_paragraphs) <= 2)
-        else:
-            assert(hotpot_qa_type == HotpotQAType.TEST_FULLWIKI)
-            assert(len(gold_paragraphs) == 0)
-
-        assert(question_id not in all_ids)
-        all_ids.add(question_id)
-        processed_data.append({
-            "id": question_id,
-            "question": question,
-            "answer": answer,
-            "gold_paragraphs": gold_paragraphs,
-            "supporting_facts": supporting_facts,
-            "context": context,
-            "question_type": question_type,
-            "question_level": question_level
-        })
-    assert(len(processed_data) == len(data))
-    assert(len(data) == len(all_ids))
-    df = pd.DataFrame(processed_data)
-    return df
+    for entry in entries:
+        record = parse_entry(entry, hotpot_qa_type, gold_paragraphs)
+        assert(record["id"] not in all_ids)
+        all_ids.add(record["id"])
+        record = selector.select(record)
+        if record is not None:
+            yield record
+
+
+def parse_entry(entry, hotpot_qa_type, gold_paragraphs=True):
+    """
+    Validates a raw HotpotQA entry and converts it to a record (dict).
+
+    The record has the keys described in `HotpotQADataset`. If
+    `gold_paragraphs` is False, the gold paragraphs are validated but not
+    built (the value of the key is None).
+    """
+    import more_itertools
+
+    assert(isinstance(entry, dict))
+    if hotpot_qa_type != HotpotQAType.TEST_FULLWIKI:
+        assert(len(entry) == 7)
+    else:
+        assert(len(entry) == 3)  # _id, question, context
+
+    # Extract fields.
+    question_id = entry["_id"]
+    question = entry["question"]
+    answer = entry.get("answer", None)
+    supporting_facts = entry.get("supporting_facts", [])
+    context = entry["context"]
+    question_type = entry.get("type", None)
+    question_level = entry.get("level", None)
+
+    # Validate fields.
+    assert(isinstance(question_id, string_types))
+    assert(isinstance(question, string_types))
+    assert(isinstance(supporting_facts, list))
+    assert(isinstance(context, list))
+    if hotpot_qa_type != HotpotQAType.TEST_FULLWIKI:
+        assert(isinstance(answer, string_types))
+        assert(len(supporting_facts) > 0)
+        assert(question_type in ["comparison", "bridge"])
+        assert(question_level in ["easy", "medium", "hard"])
+    else:
+        assert(answer is None)
+        assert(len(supporting_facts) == 0)
+        assert(question_type is None)
+        assert(question_level is None)
+    # Note: most the the questions have 10 contexts.
+    assert(len(context) <= 10)
+
+    # Get the list of supporting sentences by joining the supporting
+    # facts with the context by title. There can be duplicate titles
+    # in the supporting facts.
+    titles = [title for title, _ in supporting_facts]
+    titles = list(more_itertools.unique_everseen(titles))
+    title2contents = {title: sentences for title, sentences in context}
+    assert(len(title2contents) == len(context))
+    if hotpot_qa_type == HotpotQAType.DEV_FULLWIKI:
+        titles = filter(lambda title: title in title2contents, titles)
+    titles = list(titles)
+    for title in titles:
+        for sentence in title2contents[title]:
+            assert(isinstance(sentence, string_types))
+    if hotpot_qa_type == HotpotQAType.TRAIN:
+        assert(len(titles) == 2)
+    elif hotpot_qa_type == HotpotQAType.DEV_DISTRACTOR:
+        assert(len(titles) == 2)
+    elif hotpot_qa_type == HotpotQAType.DEV_FULLWIKI:
+        assert(len(titles) <= 2)
+    else:
+        assert(hotpot_qa_type == HotpotQAType.TEST_FULLWIKI)
+        assert(len(titles) == 0)
+    if gold_paragraphs:
+        gold_paragraphs = [' '.join(title2contents[title]) for title in titles]  # noqa: E501
+    else:
+        gold_paragraphs = None
+
+    return {
+        "id": question_id,
+        "question": question,
+        "answer": answer,
+        "gold_paragraphs": gold_paragraphs,
+        "supporting_facts": supporting_facts,
+        "context": context,
+        "question_type": question_type,
+        "question_level": question_level
+    }
@@ -1,9 +1,16 @@
 import os
 
-from .constants import HOTPOT_QA_CACHE_DIR
+from data_mine.utils import datamine_cache_dir
 from .types import HotpotQAType
 
 
+def hotpot_qa_cache_dir():
+    """
+    Returns the directory of the Hotpot QA dataset (inside the DataMine cache).
+    """
+    return os.path.join(datamine_cache_dir(), "HOTPOT_QA")
+
+
 def type_to_data_file(hotpot_qa_type):
     """
     Computes the path of the Hotpot QA data file given the type.
@@ -11,7 +18,7 @@ def type_to_data_file(hotpot_qa_type):
     Each Hotpot QA type has the corresponding data located in one file.
     """
     assert(isinstance(hotpot_qa_type, HotpotQAType))
-    data_dir = HOTPOT_QA_CACHE_DIR
+    data_dir = hotpot_qa_cache_dir()
     return {
             HotpotQAType.TRAIN: os.path.join(data_dir, "hotpot_train_v1.1.json"),  # noqa: E501
             HotpotQAType.DEV_DISTRACTOR: os.path.join(data_dir, "hotpot_dev_distractor_v1.json"),  # noqa: E501
@@ -0,0 +1,48 @@
+from data_mine import Collection
+from data_mine.nlp.allen_ai_arc import get_arc_by_ids
+from data_mine.nlp.allen_ai_drop import get_drop_by_ids
+from data_mine.nlp.allen_ai_obqa import get_obqa_by_ids
+from data_mine.nlp.cosmos_qa import get_cosmos_qa_by_ids
+from data_mine.nlp.CSQA import get_csqa_by_ids
+from data_mine.nlp.hotpot_qa import get_hotpot_qa_by_ids
+from data_mine.nlp.RACE import get_race_by_ids
+from six import string_types
+
+# The functions returning the records of a split by ID (see `get_by_ids`).
+GET_BY_IDS = {
+    Collection.ALLEN_AI_ARC: get_arc_by_ids,
+    Collection.ALLEN_AI_DROP: get_drop_by_ids,
+    Collection.ALLEN_AI_OBQA: get_obqa_by_ids,
+    Collection.COSMOS_QA: get_cosmos_qa_by_ids,
+    Collection.CSQA: get_csqa_by_ids,
+    Collection.HOTPOT_QA: get_hotpot_qa_by_ids,
+    Collection.RACE: get_race_by_ids
+}
+
+
+def get_by_ids(collection, split, ids):
+    """
+    Returns the questions of a dataset split with the given IDs.
+
+    `split` is a value of the type enum of the dataset (e.g. CSQAType.DEV)
+    and `ids` is a list of question IDs (`query_id` for DROP). Returns a
+    list of records (dictionaries with the columns of the dataset loader)
+    in the order of `ids`. A KeyError is raised if an ID is missing.
+
+    Only the requested questions are read from the raw data, using an index
+    of their positions which is built on the first call for each split.
+
+    The supported collections are the keys of `GET_BY_IDS` (all but
+    TRIVIA_QA, which has no loader yet). A ValueError is raised for the
+    other collections.
+
+    Example:
+        records = get_by_ids(Collection.CSQA, CSQAType.DEV, ["1afa02d0..."])
+    """
+    assert(isinstance(collection, Collection))
+    assert(not isinstance(ids, string_types)), "`ids` must be a list"
+    if collection not in GET_BY_IDS:
+        raise ValueError("Lookup by ID is not supported for {}. Supported collections: {}".format(  # noqa: E501
+            collection.name, ", ".join(sorted(c.name for c in GET_BY_IDS))
+        ))
+    return GET_BY_IDS[collection](split, ids)
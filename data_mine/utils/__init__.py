@@ -2,11 +2,28 @@ from __future__ import absolute_import
 
 from .archive_utils import is_archive
 from .archive_utils import extract_archive
+from .batch_utils import batch_records
+from .batch_utils import prefetch
+from .batch_utils import shuffle_records
+from .dataframe_utils import normalize_column
+from .dataframe_utils import RecordSelector
+from .json_utils import get_json_loads
+from .json_utils import iter_json_array
+from .json_utils import iter_json_object
+from .json_utils import json_backend
+from .json_utils import json_load
+from .json_utils import json_loads
+from .json_utils import read_json_range
 from .misc_utils import datamine_cache_dir
 from .misc_utils import file_sha256
 from .misc_utils import get_home_dir
 from .misc_utils import is_integer
 from .misc_utils import num_decimal_places
 from .misc_utils import url_to_filename
+from .ranking_utils import top_k
+from .requests_utils import download_and_extract_tar
 from .requests_utils import download_file
 from .requests_utils import download_file_if_missing
+from .shard_utils import Shard
+from .shard_utils import shard_lines
+from .thread_utils import thread_map
@@ -1,5 +1,35 @@
+import gzip
+import multiprocessing
 import os
-import patoolib
+import shutil
+import tarfile
+import zipfile
+
+from data_mine.utils.thread_utils import thread_map
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def native_archive_format(filepath):
+    """
+    Returns the format of an archive that can be extracted in-process.
+
+    The result is one of "zip", "tar" (including compressed tarballs such
+    as .tar.gz or .tar.bz2) and "gzip" (a single compressed file), or None
+    if the format is not supported natively (see `extract_archive`). The
+    format is detected from the contents of the file, not from its name.
+    """
+    if zipfile.is_zipfile(filepath):
+        return "zip"
+    try:
+        if tarfile.is_tarfile(filepath):
+            return "tar"
+    except Exception:  # pylint: disable=broad-except
+        pass  # E.g. EOFError for truncated compressed files.
+    with open(filepath, "rb") as f:
+        if f.read(len(GZIP_MAGIC)) == GZIP_MAGIC:
+            return "gzip"
+    return None
 
 
 def is_archive(filepath):
@@ -13,6 +43,10 @@ def is_archive(filepath):
     assert(os.path.isfile(filepath))
     assert(os.access(filepath, os.R_OK))
 
+    if native_archive_format(filepath) is not None:
+        return True
+    import patoolib
+
     try:
         fmt, compression = patoolib.get_archive_format(filepath)
         patoolib.check_archive_format(fmt, compression)
@@ -23,7 +57,7 @@ def is_archive(filepath):
         return False
 
 
-def extract_archive(filepath, outdir):
+def extract_archive(filepath, outdir, verified=False, num_workers=None):
     """
     Extracts the contents of the archive in the output directory.
 
@@ -31,11 +65,100 @@ def extract_archive(filepath, outdir):
     The output directory and all parent directories are created if missing.
     An exception is raised if the archive does not exist, is not readable
     or is not a valid archive (best guess, not all formats are supported).
+
+    Zip archives, tarballs and gzip files are extracted in-process (zip
+    members by `num_workers` threads). Other formats are extracted by
+    `patool`. If `verified` is True (e.g. the SHA256 of the archive has
+    already been checked), the archive is not validated before extraction.
+    """
+    assert(os.path.isfile(filepath))
+    if not verified:
+        assert(is_archive(filepath))
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir, mode=0o755)
+
+    fmt = native_archive_format(filepath)
+    if fmt == "zip":
+        if num_workers is None:
+            num_workers = min(8, multiprocessing.cpu_count())
+        extract_zip(filepath, outdir, num_workers)
+    elif fmt == "tar":
+        extract_tar(filepath, outdir)
+    elif fmt == "gzip":
+        extract_gzip(filepath, outdir)
+    else:
+        import patoolib
+
+        patoolib.extract_archive(
+                filepath,
+                verbosity=-1,
+                outdir=outdir,
+                interactive=False
+        )
+
+
+def extract_zip(filepath, outdir, num_workers):
+    # The members are split in `num_workers` groups of (roughly) the same
+    # compressed size. Each group is extracted by a thread with its own file
+    # handle (zlib releases the GIL while decompressing).
+    assert(num_workers >= 1)
+    with zipfile.ZipFile(filepath) as archive:
+        members = archive.infolist()
+    for member in members:  # Avoid races between threads creating dirs.
+        path = os.path.dirname(member.filename.rstrip("/"))
+        path = os.path.join(outdir, *[p for p in path.split("/") if p not in ["", ".", ".."]])  # noqa: E501
+        if not os.path.isdir(path):
+            os.makedirs(path, mode=0o755)
+
+    groups = [[] for _ in range(0, min(num_workers, max(1, len(members))))]
+    sizes = [0] * len(groups)
+    for member in sorted(members, key=lambda m: -m.compress_size):
+        index = sizes.index(min(sizes))
+        groups[index].append(member)
+        sizes[index] += member.compress_size + 1
+
+    def extract_group(group):
+        with zipfile.ZipFile(filepath) as archive:
+            for member in group:
+                archive.extract(member, outdir)
+
+    thread_map(extract_group, groups, len(groups))
+
+
+def extract_tar(filepath, outdir):
+    # The members are extracted while the archive is read (a single pass
+    # over the compressed data).
+    with tarfile.open(filepath, "r:*") as archive:
+        extract_tar_members(archive, outdir)
+
+
+def extract_tar_members(archive, outdir):
+    """
+    Extracts the members of an open `tarfile.TarFile` in `outdir`.
+
+    Members that would be written outside of `outdir` (absolute paths, "..",
+    links) are rejected. Works for archives opened in stream mode as well.
     """
-    assert(is_archive(filepath))
-    patoolib.extract_archive(
-            filepath,
-            verbosity=-1,
-            outdir=outdir,
-            interactive=False
-    )
+    if hasattr(tarfile, "data_filter"):
+        archive.extractall(outdir, filter="data")
+        return
+
+    def safe_members():  # pragma: no cover (Python < 3.8.17)
+        for member in archive:
+            for name in [member.name, member.linkname or ""]:
+                name = os.path.normpath(name)
+                if os.path.isabs(name) or name.split(os.sep)[0] == "..":
+                    raise RuntimeError("Unsafe path in archive: {}".format(member.name))  # noqa: E501
+            yield member
+
+    archive.extractall(outdir, members=safe_members())
+
+
+def extract_gzip(filepath, outdir):
+    # A single compressed file: "x.json.gz" is decompressed to "x.json".
+    filename, extension = os.path.splitext(os.path.basename(filepath))
+    if len(extension) == 0:
+        filename = filename + ".out"
+    with gzip.open(filepath, "rb") as f:
+        with open(os.path.join(outdir, filename), "wb") as g:
+            shutil.copyfileobj(f, g, 1024 * 1024)
@@ -0,0 +1,106 @@
+import random
+import threading
+
+from six.moves import queue
+
+# Marks the end of the items produced by the thread of `prefetch`.
+_END_OF_ITEMS = object()
+
+
+def shuffle_records(records, buffer_size, seed=None):
+    """
+    Yields the records in a random order, using a bounded buffer.
+
+    The first `buffer_size` records fill the buffer. Then, for each new
+    record, a random record of the buffer is yielded and replaced by the new
+    one. Finally, the buffer is shuffled and yielded. The memory usage only
+    depends on `buffer_size`, at the cost of a shuffle that is local (a
+    record moves at most about `buffer_size` positions earlier). The order
+    only depends on the records and on `seed` (random if None).
+    """
+    assert(buffer_size >= 1)
+    rng = random.Random(seed)
+    buffer = []
+    for record in records:
+        if len(buffer) < buffer_size:
+            buffer.append(record)
+            continue
+        i = rng.randrange(buffer_size)
+        yield buffer[i]
+        buffer[i] = record
+    rng.shuffle(buffer)
+    for record in buffer:
+        yield record
+
+
+def batch_records(records, batch_size, drop_last=False):
+    """
+    Groups records (dictionaries with the same keys) in columnar batches.
+
+    Yields dictionaries {column: list of values} with `batch_size` values
+    per column (except, possibly, the last batch which is dropped if
+    `drop_last` is True). The columns keep the order of the keys of the
+    records.
+    """
+    assert(batch_size >= 1)
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield {column: [r[column] for r in batch] for column in batch[0]}
+            batch = []
+    if len(batch) > 0 and not drop_last:
+        yield {column: [r[column] for r in batch] for column in batch[0]}
+
+
+def prefetch(items, size=1):
+    """
+    Yields the items of the iterable `items`, which are produced by a
+    background thread running (at most) `size` items ahead.
+
+    The consumer can work on an item (e.g. a training step) while the next
+    ones are produced. An exception raised by `items` is re-raised by the
+    consumer, after the items produced before it (this includes exceptions
+    which are not an `Exception`, e.g. SystemExit). If the consumer stops
+    early (the generator is closed), the thread stops before producing more
+    than one extra item.
+    """
+    assert(size >= 1)
+    ready = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+
+    def put(entry):
+        # Returns False if the consumer stopped.
+        while not stopped.is_set():
+            try:
+                ready.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        error = None
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except BaseException as e:  # pylint: disable=broad-except
+            error = e
+        finally:
+            # Always sent, so the consumer never waits forever.
+            put((_END_OF_ITEMS, error))
+
+    thread = threading.Thread(target=producer)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = ready.get()
+            if item is _END_OF_ITEMS:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
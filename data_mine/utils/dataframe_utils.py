@@ -0,0 +1,118 @@
+from six import string_types
+
+
+def normalize_column(df, column, index_column):
+    """
+    Moves the distinct values of `column` in a separate table.
+
+    Returns a tuple (values, rows) of Pandas DataFrames:
+    * `values` has a single column (`column`) with the distinct values in
+      the order of their first appearance. The row number is the index of
+      the value;
+    * `rows` is a copy of `df` where `column` is replaced by `index_column`
+      (int), the index of the corresponding value in the `values` table.
+
+    The original DataFrame can be recovered with:
+        rows[column] = values[column].values[rows[index_column]]
+
+    This is useful for datasets where many rows share a large value (e.g.
+    multiple questions about the same passage): each distinct value is
+    stored (and serialized) only once.
+    """
+    import pandas as pd
+
+    if len(df) == 0 and column not in df.columns:  # No rows, no columns.
+        return pd.DataFrame(columns=[column]), pd.DataFrame(columns=[index_column])  # noqa: E501
+    assert(column in df.columns)
+    assert(index_column not in df.columns)
+    codes, uniques = pd.factorize(df[column], sort=False)
+    rows = df.drop(columns=[column])
+    rows.insert(list(df.columns).index(column), index_column, codes)
+    values = pd.DataFrame({column: uniques})
+    return values, rows
+
+
+class RecordSelector(object):
+    """
+    A column projection and a row predicate applied by the loaders.
+
+    `all_columns` are the columns of a dataset (in the loader's order).
+    `columns` is the list of columns to keep (all if None), in the order
+    of the output. `where` selects the rows (all if None) and is either:
+    * a dictionary {column: value}: a record matches if, for every column,
+      its value is equal to `value` (or is in `value` if `value` is a list,
+      a tuple or a set). Example: {"question_level": "hard"};
+    * a callable which receives a record (dict with all the columns) and
+      returns True for the records to keep.
+
+    The loaders apply the selector while parsing, so records that do not
+    match are never materialized and unused columns are never copied.
+    """
+
+    def __init__(self, all_columns, columns=None, where=None):
+        self.all_columns = list(all_columns)
+        if columns is None:
+            columns = self.all_columns
+        assert(not isinstance(columns, string_types)), "`columns` must be a list"  # noqa: E501
+        self.columns = list(columns)
+        assert(len(set(self.columns)) == len(self.columns))
+        for column in self.columns:
+            assert(column in self.all_columns), "Unknown column: {}".format(column)  # noqa: E501
+        assert(where is None or isinstance(where, dict) or callable(where))
+        if isinstance(where, dict):
+            for column in where:
+                assert(column in self.all_columns), "Unknown column: {}".format(column)  # noqa: E501
+        self.where = where
+
+    def needs(self, column):
+        """
+        Returns True if `column` is part of the output or of the predicate.
+        """
+        if column in self.columns or callable(self.where):
+            return True
+        return isinstance(self.where, dict) and column in self.where
+
+    def matches(self, record):
+        if self.where is None:
+            return True
+        if callable(self.where):
+            return bool(self.where(record))
+        for column, value in self.where.items():
+            if isinstance(value, (list, tuple, set, frozenset)):
+                if record[column] not in value:
+                    return False
+            elif record[column] != value:
+                return False
+        return True
+
+    def project(self, record):
+        return {column: record[column] for column in self.columns}
+
+    def select(self, record):
+        """
+        Returns the projected record or None if the record does not match.
+        """
+        if not self.matches(record):
+            return None
+        return self.project(record)
+
+    def frame(self, records):
+        """
+        Builds a Pandas DataFrame from (projected) records.
+        """
+        import pandas as pd
+
+        return pd.DataFrame(records, columns=self.columns)
+
+    def apply(self, df):
+        """
+        Selects the rows and the columns of a DataFrame with all the columns
+        (e.g. a split loaded from the split cache).
+        """
+        import pandas as pd
+
+        if self.where is not None:
+            mask = [self.matches(record) for record in df.to_dict("records")]
+            df = df.loc[pd.Series(mask, index=df.index, dtype=bool)]
+            df = df.reset_index(drop=True)
+        return df[self.columns]
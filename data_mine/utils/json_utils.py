@@ -0,0 +1,263 @@
+import io
+import json
+import os
+
+from data_mine.constants import DATAMINE_JSON_BACKEND_ENV_VAR
+
+JSON_WHITESPACE = " \t\n\r"
+
+# The JSON backends, in the order in which they are tried by "auto" (see
+# `get_json_loads`). "json" is the standard library.
+JSON_BACKENDS = ["orjson", "ujson", "json"]
+
+# The selected (backend name, loads function) for each value of the
+# environment variable.
+_JSON_LOADS = {}
+
+# States of the top-level container parser (see `iter_json_container`).
+_EXPECT_START = 0
+_EXPECT_FIRST_ITEM = 1
+_EXPECT_KEY = 2
+_EXPECT_COLON = 3
+_EXPECT_VALUE = 4
+_EXPECT_SEPARATOR = 5
+_EXPECT_EOF = 6
+
+
+def iter_json_array(file_path, chunk_size=1024 * 1024, with_offsets=False):
+    """
+    Yields the elements of the top-level JSON array stored at `file_path`.
+
+    The file is read in chunks of (at least) `chunk_size` characters and the
+    elements are decoded one at a time. Only the element being decoded is
+    kept in memory, so the memory usage does not depend on the size of the
+    file but on the size of the largest element.
+
+    If `with_offsets` is True, tuples (element, start, end) are yielded
+    instead, where [start, end) is the byte range of the element in the
+    file (see `read_json_range`).
+
+    A ValueError is raised if the file does not contain a JSON array.
+    """
+    for _, value, start, end in iter_json_container(file_path, "[", chunk_size, with_offsets):  # noqa: E501
+        if with_offsets:
+            yield value, start, end
+        else:
+            yield value
+
+
+def iter_json_object(file_path, chunk_size=1024 * 1024, with_offsets=False):
+    """
+    Yields the (key, value) pairs of the top-level JSON object stored at
+    `file_path`, in file order.
+
+    Just like `iter_json_array`, the values are decoded one at a time. If
+    `with_offsets` is True, tuples (key, value, start, end) are yielded
+    instead, where [start, end) is the byte range of the value in the file.
+
+    A ValueError is raised if the file does not contain a JSON object.
+    """
+    for key, value, start, end in iter_json_container(file_path, "{", chunk_size, with_offsets):  # noqa: E501
+        if with_offsets:
+            yield key, value, start, end
+        else:
+            yield key, value
+
+
+def read_json_range(f, start, end):
+    """
+    Decodes the JSON value stored in the byte range [start, end) of the
+    file `f` (opened in binary mode).
+    """
+    f.seek(start)
+    return json_loads(f.read(end - start))
+
+
+def stdlib_json_loads(data):
+    # `json.loads` only accepts bytes since Python 3.6.
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+def load_json_backend(name):
+    """
+    Returns the loads function of a JSON backend (see `JSON_BACKENDS`).
+
+    An ImportError is raised if the backend is not installed.
+    """
+    assert(name in JSON_BACKENDS), "Unknown JSON backend: {}".format(name)
+    if name == "orjson":
+        import orjson
+        return orjson.loads
+    if name == "ujson":
+        import ujson
+        return ujson.loads
+    return stdlib_json_loads
+
+
+def json_backend():
+    """
+    Returns the name of the JSON backend used by the loaders.
+
+    The backend is chosen by the DATAMINE_JSON_BACKEND environment variable:
+    "orjson", "ujson" or "json" (the standard library) selects a backend
+    (an ImportError is raised if it is not installed) while "auto" (the
+    default) selects the first installed one in `JSON_BACKENDS`.
+    """
+    return select_json_backend()[0]
+
+
+def get_json_loads():
+    """
+    Returns the loads function of the JSON backend (see `json_backend`).
+
+    The function decodes a JSON document given as text or as UTF-8 bytes.
+    Bytes are passed to the backend as they are (the fast backends decode
+    them faster than Python decodes text). Errors are ValueErrors, as for
+    `json.loads`. Loaders call this once per file, not once per document.
+    """
+    return select_json_backend()[1]
+
+
+def json_loads(data):
+    """
+    Decodes a JSON document (text or UTF-8 bytes) with the JSON backend.
+    """
+    return get_json_loads()(data)
+
+
+def json_load(f):
+    """
+    Decodes the JSON document stored in the file `f` with the JSON backend.
+
+    Open the file in binary mode so the contents are not decoded twice.
+    """
+    return json_loads(f.read())
+
+
+def select_json_backend():
+    # Returns the selected (name, loads function), memoized for each value
+    # of the environment variable.
+    choice = os.getenv(DATAMINE_JSON_BACKEND_ENV_VAR, "") or "auto"
+    selected = _JSON_LOADS.get(choice)
+    if selected is not None:
+        return selected
+    if choice == "auto":
+        for name in JSON_BACKENDS:
+            try:
+                selected = (name, load_json_backend(name))
+                break
+            except ImportError:
+                continue
+    elif choice in JSON_BACKENDS:
+        selected = (choice, load_json_backend(choice))
+    else:
+        raise ValueError("Invalid {}: {} (expected auto or one of {})".format(
+            DATAMINE_JSON_BACKEND_ENV_VAR, choice, ", ".join(JSON_BACKENDS)
+        ))
+    _JSON_LOADS[choice] = selected
+    return selected
+
+
+def iter_json_container(file_path, opening, chunk_size, with_offsets=False):
+    """
+    Parser behind `iter_json_array` and `iter_json_object`.
+
+    `opening` is "[" (array) or "{" (object). Yields (key, value, start,
+    end) tuples where `key` is None for arrays and [start, end) is the byte
+    range of the value (start and end are None if `with_offsets` is False).
+    """
+    assert(opening in ["[", "{"])
+    assert(chunk_size >= 1)
+    closing = "]" if opening == "[" else "}"
+    kind = "array" if opening == "[" else "object"
+    decoder = json.JSONDecoder()
+    # Newlines are not translated so that the byte offsets are exact.
+    with io.open(file_path, "rt", encoding="utf-8", newline="") as f:
+        buf = ""
+        pos = 0
+        offset = 0  # The byte offset of `buf[pos]` in the file.
+        eof = False
+        key = None
+        state = _EXPECT_START
+        while True:
+            start = pos
+            while pos < len(buf) and buf[pos] in JSON_WHITESPACE:
+                pos += 1
+            offset += pos - start  # Whitespace is ASCII (one byte).
+            if pos == len(buf):
+                if eof:
+                    break
+                buf = f.read(chunk_size)
+                pos = 0
+                eof = len(buf) == 0
+                continue
+
+            c = buf[pos]
+            if state == _EXPECT_START:
+                if c != opening:
+                    raise ValueError("Expected a JSON {} in {}".format(kind, file_path))  # noqa: E501
+                pos += 1
+                state = _EXPECT_FIRST_ITEM
+            elif state == _EXPECT_EOF:
+                raise ValueError("Extra data after the JSON {} in {}".format(kind, file_path))  # noqa: E501
+            elif c == closing and state in [_EXPECT_FIRST_ITEM, _EXPECT_SEPARATOR]:  # noqa: E501
+                pos += 1
+                state = _EXPECT_EOF
+            elif state == _EXPECT_SEPARATOR:
+                if c != ",":
+                    raise ValueError("Expected `,` or `{}` in {}".format(closing, file_path))  # noqa: E501
+                pos += 1
+                state = _EXPECT_KEY if opening == "{" else _EXPECT_VALUE
+            elif state == _EXPECT_COLON:
+                if c != ":":
+                    raise ValueError("Expected `:` in {}".format(file_path))
+                pos += 1
+                state = _EXPECT_VALUE
+            else:
+                expect_key = state == _EXPECT_KEY or (
+                    state == _EXPECT_FIRST_ITEM and opening == "{"
+                )
+                if expect_key and c != "\"":
+                    raise ValueError("Expected a key in {}".format(file_path))  # noqa: E501
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    # Numbers and literals may continue in the next chunk
+                    # (e.g. "6." followed by "5e3") so they are complete
+                    # only if a delimiter follows them.
+                    complete = buf[end - 1] in "]}\"" or (
+                        end < len(buf) and buf[end] in JSON_WHITESPACE + ",]}"  # noqa: E501
+                    )
+                except ValueError:
+                    if eof:
+                        raise
+                    complete = False
+                if not complete and not eof:
+                    # Grow the buffer geometrically so that large elements
+                    # are not decoded from scratch too many times.
+                    more = f.read(max(chunk_size, len(buf) - pos))
+                    buf = buf[pos:] + more
+                    pos = 0
+                    eof = len(more) == 0
+                    continue
+                if with_offsets:
+                    size = len(buf[pos:end].encode("utf-8"))
+                else:
+                    size = end - pos  # Not needed, the offsets are unused.
+                if expect_key:
+                    key = value
+                    state = _EXPECT_COLON
+                elif with_offsets:
+                    yield key, value, offset, offset + size
+                    state = _EXPECT_SEPARATOR
+                else:
+                    yield key, value, None, None
+                    state = _EXPECT_SEPARATOR
+                pos = end
+                offset += size
+                continue
+            offset += 1  # A single (ASCII) punctuation character.
+
+    if state != _EXPECT_EOF:
+        raise ValueError("Unexpected end of JSON {} in {}".format(kind, file_path))  # noqa: E501
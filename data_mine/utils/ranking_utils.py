@@ -0,0 +1,38 @@
+def top_k_columns(scores, k):
+    """
+    Returns the columns of the `k` largest values of each row of `scores`.
+
+    The k-th largest value of each row is found with `np.partition` (linear
+    time). Values equal to it are taken in the order of the columns so the
+    result is deterministic. The columns of each row are returned in
+    increasing order (not sorted by value).
+    """
+    import numpy as np
+
+    assert(1 <= k <= scores.shape[1])
+    if k == scores.shape[1]:
+        return np.tile(np.arange(k), (len(scores), 1))
+    kth = np.partition(scores, scores.shape[1] - k, axis=1)[:, [-k]]
+    greater = scores > kth
+    needed = k - greater.sum(axis=1, keepdims=True)
+    equal = scores == kth
+    selected = greater | (equal & (np.cumsum(equal, axis=1) <= needed))
+    return np.nonzero(selected)[1].reshape(len(scores), k)
+
+
+def top_k(scores, k):
+    """
+    Returns the `k` largest values of each row of `scores` and their columns.
+
+    The result is a tuple (columns, values) of arrays with the shape
+    (len(scores), k), sorted in decreasing order of the value (equal values
+    are ordered by column). `k` must not exceed the number of columns.
+    """
+    import numpy as np
+
+    columns = top_k_columns(scores, k)
+    values = np.take_along_axis(scores, columns, axis=1)
+    order = np.lexsort((columns, -values), axis=1)
+    columns = np.take_along_axis(columns, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+    return columns, values
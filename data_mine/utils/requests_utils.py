@@ -2,16 +2,40 @@
 
 import hashlib
 import os
-import requests
+import shutil
 import six
+import tarfile
+import tempfile
+import threading
+import time
 
 from data_mine.utils import file_sha256
+from data_mine.utils.archive_utils import extract_tar_members
 from six import string_types
-from tqdm import tqdm
-from unidecode import unidecode
 
+# Protects the progress bars shared by concurrent downloads.
+_PROGRESS_BAR_LOCK = threading.Lock()
 
-def download_file(url, output_file_path, expected_sha256=None, desc=None):
+# Data is downloaded to `output_file_path + PARTIAL_DOWNLOAD_SUFFIX` first.
+PARTIAL_DOWNLOAD_SUFFIX = ".part"
+
+# Seconds to wait for the server to accept the connection / send data.
+DOWNLOAD_TIMEOUT = 60
+
+
+class IncompleteDownloadError(IOError):
+    """
+    Raised when the body of a response is shorter than its Content-Length.
+
+    Depending on the version of urllib3, a connection closed in the middle
+    of the body may look like the end of the data, so the downloaded size
+    is always checked. The download can be retried (or resumed).
+    """
+    pass
+
+
+def download_file(url, output_file_path, expected_sha256=None, desc=None,
+                  progress_bar=None, max_retries=5, backoff_factor=1.0):
     """
     Downloads the resource from `url` and saves it to the `output_file_path`.
 
@@ -20,13 +44,117 @@ def download_file(url, output_file_path, expected_sha256=None, desc=None):
     If the expected SHA256 is provided, the data is checked for
     corruption. If the data is corrupted, a RuntimeError is raised.
 
+    The data is first written to `output_file_path + ".part"` which is
+    renamed when the download is complete (and not corrupted). If the
+    connection drops, the download is retried (at most `max_retries` times,
+    waiting `backoff_factor * 2 ^ (retry - 1)` seconds before each retry)
+    and resumed from the end of the partial file if the server supports
+    HTTP range requests. A body shorter than its Content-Length counts as a
+    dropped connection. A partial file left by a previous call is resumed
+    in the same way.
+
     Note: `desc` is a description to be shown during the download process.
     If None, a generic message will be shown. The description must not contain
     special Unicode characters (e.g. must be ASCII decodable).
+
+    Note: if `progress_bar` (a `tqdm` object) is provided, then the download
+    progress is added to it instead of being shown on a separate progress
+    bar (and `desc` is ignored). This way, multiple concurrent downloads can
+    share the same progress bar.
     """
     assert(isinstance(url, string_types))
     assert(isinstance(output_file_path, string_types))
     assert(expected_sha256 is None or isinstance(expected_sha256, string_types))  # noqa: E501
+    assert(max_retries >= 0)
+
+    shared_progress_bar = progress_bar is not None
+    if not shared_progress_bar:
+        progress_bar = new_progress_bar(desc)
+
+    part_file_path = output_file_path + PARTIAL_DOWNLOAD_SUFFIX
+    progress = DownloadProgress(progress_bar)
+    num_retries = 0
+    try:
+        while True:
+            try:
+                sha256 = download_to_part_file(url, part_file_path, progress)  # noqa: E501
+                if sha256 is not None:
+                    break
+            except Exception as e:  # pylint: disable=broad-except
+                if not is_retryable_error(e) or num_retries >= max_retries:
+                    raise
+                num_retries += 1
+                time.sleep(backoff_factor * (2 ** (num_retries - 1)))
+    finally:
+        if not shared_progress_bar:
+            progress_bar.close()
+
+    if expected_sha256 is not None and expected_sha256 != sha256:
+        os.remove(part_file_path)  # Do not resume from corrupted data.
+        raise RuntimeError(
+                "Downloaded file is corrupt. SHA256 = {}".format(sha256)
+        )
+    if os.path.isfile(output_file_path):
+        os.remove(output_file_path)
+    os.rename(part_file_path, output_file_path)
+
+
+def new_progress_bar(desc=None):
+    # A progress bar (in bytes) with an ASCII description.
+    from tqdm import tqdm
+    from unidecode import unidecode
+
+    desc = str(desc or "Downloading file")
+    if six.PY2:  # pragma: no cover
+        desc = desc.decode('utf-8', 'replace')
+    desc = unidecode(desc)  # Remove non-ASCII characters.
+    return tqdm(desc=desc, total=0, unit='B', unit_scale=True)
+
+
+class DownloadProgress(object):
+    """
+    Tracks the contribution of a single download to a (shared) progress bar.
+
+    When a download is restarted or resumed, the bytes already counted are
+    adjusted so that the progress bar never counts a byte twice.
+    """
+
+    def __init__(self, progress_bar):
+        self.progress_bar = progress_bar
+        self.total = 0
+        self.count = 0
+
+    def reset(self, count, total):
+        with _PROGRESS_BAR_LOCK:
+            self.progress_bar.total = (self.progress_bar.total or 0) + total - self.total  # noqa: E501
+            self.progress_bar.update(count - self.count)
+            self.total = total
+            self.count = count
+
+    def update(self, num_bytes):
+        with _PROGRESS_BAR_LOCK:
+            self.progress_bar.update(num_bytes)
+            self.count += num_bytes
+
+
+def download_to_part_file(url, part_file_path, progress):
+    """
+    Appends the missing data of `url` to the partial file `part_file_path`.
+
+    Sends a range request if the partial file is not empty. If the server
+    does not support range requests, the partial file is overwritten.
+    Returns the SHA256 (hex) of the complete file or None if the partial
+    file could not be resumed (it is removed and the download must be
+    restarted).
+    """
+    import requests
+
+    offset = 0
+    if os.path.isfile(part_file_path):
+        offset = os.path.getsize(part_file_path)
+    headers = {}
+    if offset > 0:
+        headers["Range"] = "bytes={}-".format(offset)
 
     # Iterates through a request data yielding chunks. To be used along
     # with Response.raw (see the comment below).
@@ -41,36 +169,85 @@ def download_file(url, output_file_path, expected_sha256=None, desc=None):
     # transfer-encodings. Response.raw is a raw stream of bytes – it does not
     # transform the response content. If you really need access to the bytes
     # as they were returned, use Response.raw.
-    with requests.get(url, stream=True) as req:
-        req.raise_for_status()  # Will raise exception if status != 200.
+    with requests.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as req:  # noqa: E501
+        if offset > 0 and req.status_code == 416:  # Range Not Satisfiable.
+            os.remove(part_file_path)
+            return None
+        req.raise_for_status()  # Will raise exception if status != 2XX.
 
-        total_size = int(req.headers.get('content-length', 0))  # in bytes.
+        content_range = req.headers.get('content-range', "")
+        if req.status_code != 206 or not content_range.startswith("bytes {}-".format(offset)):  # noqa: E501
+            offset = 0  # The server sends the whole file.
+        total_size = response_size(req)  # in bytes.
         block_size = 1 * 1024 * 1024
+        progress.reset(offset, offset + (total_size or 0))
 
-        desc = str(desc or "Downloading file")
-        if six.PY2:  # pragma: no cover
-            desc = desc.decode('utf-8', 'replace')
-        desc = unidecode(desc)  # Remove non-ASCII characters.
-        progress_bar = tqdm(desc=desc, total=total_size, unit='B', unit_scale=True)  # noqa: E501
+        # Hash the data downloaded by the previous attempts.
         sha256 = hashlib.sha256()
-        with open(output_file_path, 'wb') as g:
+        if offset > 0:
+            with open(part_file_path, 'rb') as f:
+                for data in iter(lambda: f.read(block_size), b""):
+                    sha256.update(data)
+
+        num_bytes = 0
+        with open(part_file_path, 'ab' if offset > 0 else 'wb') as g:
             for data in data_iterator(req.raw, block_size):
                 if not data:  # pragma: no cover
                     continue
                 g.write(data)
                 sha256.update(data)
-                progress_bar.update(len(data))
+                progress.update(len(data))
+                num_bytes += len(data)
             g.flush()
-        progress_bar.close()
+        check_response_size(num_bytes, total_size)
+    return sha256.hexdigest()
 
-        sha256 = sha256.hexdigest()
-        if expected_sha256 is not None and expected_sha256 != sha256:
-            raise RuntimeError(
-                    "Downloaded file is corrupt. SHA256 = {}".format(sha256)
-            )
 
+def response_size(response):
+    """
+    Returns the size (in bytes) of the body of a streamed response, as
+    announced by the Content-Length header, or None if it is not known.
+    """
+    content_length = response.headers.get('content-length')
+    if content_length is None:
+        return None
+    return int(content_length)
+
+
+def check_response_size(num_bytes, expected_size):
+    """
+    Raises an IncompleteDownloadError if `num_bytes` bytes were received
+    instead of `expected_size` (see `response_size`, None means unknown).
+    """
+    if expected_size is not None and num_bytes != expected_size:
+        raise IncompleteDownloadError(
+                "Received {} bytes instead of {}".format(num_bytes, expected_size)  # noqa: E501
+        )
 
-def download_file_if_missing(url, output_file_path, expected_sha256=None, desc=None):  # noqa: E501
+
+def is_retryable_error(e):
+    """
+    Checks if a download that failed with the exception `e` can be retried.
+
+    Connection errors, timeouts, truncated responses and server errors
+    (5XX) are transient. Other errors (e.g. 404) are not retried.
+    """
+    import requests
+    import urllib3
+
+    if isinstance(e, requests.exceptions.HTTPError):
+        return e.response is not None and e.response.status_code >= 500
+    return isinstance(e, (
+        IncompleteDownloadError,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+        urllib3.exceptions.ProtocolError,
+        urllib3.exceptions.ReadTimeoutError
+    ))
+
+
+def download_file_if_missing(url, output_file_path, expected_sha256=None, desc=None, progress_bar=None):  # noqa: E501
     """
     Downloads the resource from `url` and saves it locally only if missing.
 
@@ -87,6 +264,8 @@ def download_file_if_missing(url, output_file_path, expected_sha256=None, desc=N
     Note: `desc` is a description to be shown during the download process.
     If None, a generic message will be shown. The description must not contain
     special Unicode characters (e.g. must be ASCII decodable).
+
+    Note: see `download_file` for the semantics of `progress_bar`.
     """
     assert(isinstance(url, string_types))
     assert(isinstance(output_file_path, string_types))
@@ -101,4 +280,222 @@ def download_file_if_missing(url, output_file_path, expected_sha256=None, desc=N
         return  # The file could be found locally.
 
     # Otherwise, download the data from the provided URL.
-    download_file(url, output_file_path, expected_sha256, desc)
+    download_file(url, output_file_path, expected_sha256, desc, progress_bar)
+
+
+def download_and_extract_tar(url, outdir, expected_sha256=None,
+                             archive_path=None, desc=None, progress_bar=None,
+                             max_retries=5, backoff_factor=1.0):
+    """
+    Downloads a tarball from `url` and extracts it in `outdir` on the fly.
+
+    The downloaded data is hashed and decompressed as it arrives, so the
+    archive is never read back from the disk. The archive itself is saved
+    at `archive_path` only if provided (otherwise, it is not stored at all).
+
+    The members are first extracted in a temporary directory (inside
+    `outdir`) which is merged into `outdir` only if the download is not
+    corrupted. If the SHA256 of the data does not match `expected_sha256`,
+    then nothing is written to `outdir` and a RuntimeError is raised.
+
+    If `archive_path` is provided, the data is first written to
+    `archive_path + ".part"`. A download interrupted by a transient error
+    (or a partial file left by a previous call) is then resumed with an
+    HTTP range request: the partial file is extracted again, followed by
+    the missing data. Otherwise, the download is restarted. See
+    `download_file` for the semantics of `max_retries`, `backoff_factor`,
+    `desc` and `progress_bar`. Any tar compression supported by `tarfile`
+    can be used (e.g. .tar.gz or .tar.bz2).
+    """
+    assert(isinstance(url, string_types))
+    assert(isinstance(outdir, string_types))
+    assert(expected_sha256 is None or isinstance(expected_sha256, string_types))  # noqa: E501
+    assert(archive_path is None or isinstance(archive_path, string_types))
+    assert(max_retries >= 0)
+
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir, mode=0o755)
+    shared_progress_bar = progress_bar is not None
+    if not shared_progress_bar:
+        progress_bar = new_progress_bar(desc)
+
+    part_file_path = None
+    if archive_path is not None:
+        part_file_path = archive_path + PARTIAL_DOWNLOAD_SUFFIX
+    progress = DownloadProgress(progress_bar)
+    num_retries = 0
+    try:
+        while True:
+            staging_dir = tempfile.mkdtemp(prefix=".extracting-", dir=outdir)
+            try:
+                sha256 = stream_tar(url, staging_dir, part_file_path, progress)  # noqa: E501
+                if sha256 is not None:
+                    break
+                shutil.rmtree(staging_dir)
+            except Exception as e:  # pylint: disable=broad-except
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                if not is_retryable_error(e) or num_retries >= max_retries:
+                    if not is_retryable_error(e) and is_corrupt_archive_error(e):  # noqa: E501
+                        if part_file_path is not None and os.path.isfile(part_file_path):  # noqa: E501
+                            os.remove(part_file_path)  # Do not resume from it.
+                    raise
+                num_retries += 1
+                time.sleep(backoff_factor * (2 ** (num_retries - 1)))
+    finally:
+        if not shared_progress_bar:
+            progress_bar.close()
+
+    if expected_sha256 is not None and expected_sha256 != sha256:
+        shutil.rmtree(staging_dir)  # Roll back the extraction.
+        if part_file_path is not None:
+            os.remove(part_file_path)
+        raise RuntimeError(
+                "Downloaded file is corrupt. SHA256 = {}".format(sha256)
+        )
+    merge_directory(staging_dir, outdir)
+    if part_file_path is not None:
+        if os.path.isfile(archive_path):
+            os.remove(archive_path)
+        os.rename(part_file_path, archive_path)
+
+
+class HashingReader(object):
+    """
+    A file-like object reading from `raw` which hashes the data read.
+
+    The data is also written to `copy_file` (if not None) and counted
+    by `progress` (a `DownloadProgress`). If `prefix_file` is provided, its
+    first `prefix_size` bytes (the data downloaded by a previous attempt)
+    are read (and hashed) before the data of `raw`.
+    """
+
+    def __init__(self, raw, copy_file, progress, prefix_file=None,
+                 prefix_size=0):
+        self.raw = raw
+        self.copy_file = copy_file
+        self.progress = progress
+        self.prefix_file = prefix_file
+        self.prefix_size = prefix_size
+        self.num_bytes = 0  # Read from `raw`.
+        self.eof = False  # True once `raw` returned less data than asked.
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        prefix = b""
+        if self.prefix_size > 0:
+            n = self.prefix_size if size < 0 else min(size, self.prefix_size)
+            prefix = self.prefix_file.read(n)
+            if len(prefix) != n:
+                raise IOError("The partial download has been truncated")
+            self.prefix_size -= n
+            self.sha256.update(prefix)
+            if size >= 0:
+                size -= n
+                if size == 0:
+                    return prefix
+        data = self.raw.read(size)
+        if size < 0 or len(data) < size:
+            self.eof = True
+        if data:
+            self.sha256.update(data)
+            if self.copy_file is not None:
+                self.copy_file.write(data)
+            self.progress.update(len(data))
+            self.num_bytes += len(data)
+        return prefix + data
+
+
+def stream_tar(url, outdir, copy_file_path, progress):
+    """
+    Extracts the tarball from `url` in `outdir` while it is downloaded.
+
+    The raw data is also written to `copy_file_path` (if not None). If this
+    (partial) file is not empty, only the missing data is requested (just
+    like `download_to_part_file`) and the extraction reads the partial file
+    first. Returns the SHA256 (hex) of the whole archive or None if the
+    partial file could not be resumed (it is removed and the download must
+    be restarted).
+    """
+    import requests
+
+    offset = 0
+    if copy_file_path is not None and os.path.isfile(copy_file_path):
+        offset = os.path.getsize(copy_file_path)
+    headers = {}
+    if offset > 0:
+        headers["Range"] = "bytes={}-".format(offset)
+
+    with requests.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as req:  # noqa: E501
+        if offset > 0 and req.status_code == 416:  # Range Not Satisfiable.
+            os.remove(copy_file_path)
+            return None
+        req.raise_for_status()  # Will raise exception if status != 2XX.
+
+        content_range = req.headers.get('content-range', "")
+        if req.status_code != 206 or not content_range.startswith("bytes {}-".format(offset)):  # noqa: E501
+            offset = 0  # The server sends the whole file.
+        total_size = response_size(req)  # in bytes.
+        progress.reset(offset, offset + (total_size or 0))
+
+        prefix_file, copy_file = None, None
+        if offset > 0:
+            prefix_file = open(copy_file_path, "rb")
+        try:
+            if copy_file_path is not None:
+                copy_file = open(copy_file_path, "ab" if offset > 0 else "wb")  # noqa: E501
+            # See `download_to_part_file` for why Response.raw is used.
+            reader = HashingReader(req.raw, copy_file, progress,
+                                   prefix_file, offset)
+            try:
+                with tarfile.open(fileobj=reader, mode="r|*") as archive:
+                    extract_tar_members(archive, outdir)
+                # The end of the archive (e.g. padding) is hashed as well.
+                while reader.read(1024 * 1024):
+                    pass
+            except Exception as e:  # pylint: disable=broad-except
+                # An archive cut by a dropped connection looks corrupt.
+                if is_corrupt_archive_error(e) and reader.eof:
+                    check_response_size(reader.num_bytes, total_size)
+                raise
+        finally:
+            for f in [prefix_file, copy_file]:
+                if f is not None:
+                    f.close()
+        check_response_size(reader.num_bytes, total_size)
+    return reader.sha256.hexdigest()
+
+
+def is_corrupt_archive_error(e):
+    """
+    Checks if `stream_tar` failed with the exception `e` because of the data
+    (e.g. an invalid archive) rather than because of the request.
+    """
+    import requests
+    import urllib3
+
+    return not isinstance(e, (
+        IncompleteDownloadError,
+        requests.exceptions.RequestException,
+        urllib3.exceptions.HTTPError
+    ))
+
+
+def merge_directory(src, dst):
+    """
+    Moves the contents of the directory `src` into `dst` and removes `src`.
+
+    Files from `src` replace the files with the same relative path from
+    `dst`. Directories present in both are merged recursively.
+    """
+    for name in os.listdir(src):
+        src_path = os.path.join(src, name)
+        dst_path = os.path.join(dst, name)
+        if os.path.isdir(src_path) and os.path.isdir(dst_path):
+            merge_directory(src_path, dst_path)
+            continue
+        if os.path.isdir(dst_path):
+            shutil.rmtree(dst_path)
+        elif os.path.lexists(dst_path):
+            os.remove(dst_path)
+        os.rename(src_path, dst_path)
+    os.rmdir(src)
@@ -0,0 +1,80 @@
+from six import integer_types
+
+
+class Shard(object):
+    """
+    A deterministic part of a dataset split, for data-parallel training.
+
+    A split is made of units (the lines of a JSON lines file, the passage
+    files of a RACE split, the subjects of a DROP split, ...) which are
+    divided in `num_shards` contiguous ranges of (almost) equal sizes. The
+    shard `shard_index` is made of the units of the range `shard_index`.
+    If `seed` is not None, the units are shuffled before they are divided
+    (the permutation only depends on the seed and on the number of units),
+    so each shard is a random sample of the split, in random order.
+
+    The shards of a split are disjoint and their union is the whole split,
+    so N ranks loading the shards 0, 1, ..., N - 1 (with the same seed) see
+    every question exactly once. `Shard()` is the whole split, in order.
+    """
+
+    def __init__(self, shard_index=None, num_shards=None, seed=None):
+        assert((shard_index is None) == (num_shards is None)), \
+            "`shard_index` and `num_shards` must be given together"
+        if num_shards is None:
+            shard_index, num_shards = 0, 1
+        assert(isinstance(num_shards, integer_types) and num_shards >= 1)
+        assert(isinstance(shard_index, integer_types))
+        assert(0 <= shard_index < num_shards)
+        assert(seed is None or isinstance(seed, integer_types))
+        self.shard_index = shard_index
+        self.num_shards = num_shards
+        self.seed = seed
+
+    @property
+    def is_whole_split(self):
+        """
+        True if the shard is the whole split in its original order.
+        """
+        return self.num_shards == 1 and self.seed is None
+
+    def positions(self, num_units):
+        """
+        Returns the positions (in the split) of the units of the shard, in
+        the order in which they should be loaded.
+        """
+        start = self.shard_index * num_units // self.num_shards
+        end = (self.shard_index + 1) * num_units // self.num_shards
+        if self.seed is None:
+            return list(range(start, end))
+        import numpy as np
+
+        # RandomState streams are stable across NumPy versions.
+        permutation = np.random.RandomState(self.seed).permutation(num_units)  # noqa: E501
+        return permutation[start:end].tolist()
+
+
+def shard_lines(f, shard):
+    """
+    Returns the lines of the shard `shard` of the file `f` (see `Shard`).
+
+    Each line (from the current position of `f`) is a unit. If `shard` is
+    the whole split, `f` is returned (so the lines are streamed). Otherwise,
+    the lines are counted first and only the lines of the shard are kept in
+    memory.
+    """
+    if shard.is_whole_split:
+        return f
+    start = f.tell()
+    num_lines = sum(1 for _ in f)
+    positions = shard.positions(num_lines)
+    slots = {position: i for i, position in enumerate(positions)}
+    lines = [None] * len(positions)
+    f.seek(start)
+    for position, line in enumerate(f):
+        if len(slots) == 0:
+            break
+        i = slots.pop(position, None)
+        if i is not None:
+            lines[i] = line
+    return lines
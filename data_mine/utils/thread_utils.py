@@ -0,0 +1,49 @@
+import threading
+
+
+def thread_map(fn, items, num_threads):
+    """
+    Applies `fn` to every item using (at most) `num_threads` threads.
+
+    Returns the list of results in the order of the items. The threads pull
+    the items from a shared counter so both many cheap items and few
+    expensive items are balanced across the threads. If `fn` raises an
+    exception, the remaining items are not started and the (first)
+    exception is re-raised once all the running calls finish.
+
+    Plain threads are used instead of `multiprocessing.pool.ThreadPool`
+    because the latter communicates through OS pipes.
+    """
+    assert(num_threads >= 1)
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    next_index = [0]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if len(errors) > 0:
+                    return
+                index = next_index[0]
+                next_index[0] += 1
+            if index >= len(items):
+                return
+            try:
+                results[index] = fn(items[index])
+            except Exception as e:  # pylint: disable=broad-except
+                with lock:
+                    errors.append(e)
+                return
+
+    num_threads = max(1, min(num_threads, len(items)))
+    threads = [threading.Thread(target=worker) for _ in range(0, num_threads)]  # noqa: E501
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if len(errors) > 0:
+        raise errors[0]
+    return results
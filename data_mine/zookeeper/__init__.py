@@ -3,4 +3,9 @@ from __future__ import absolute_import
 from .config import load_datasets_config
 from .integrity import check_deep_integrity
 from .integrity import check_shallow_integrity
+from .integrity import deep_integrity_failures
 from .download_center import download_dataset
+from .download_center import invalidate_ready_datasets
+from .split_cache import clear_split_cache
+from .split_cache import read_split_cache
+from .split_cache import write_split_cache
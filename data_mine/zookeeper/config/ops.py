@@ -2,33 +2,72 @@ import json
 import os
 
 from data_mine.constants import PROJECT_ROOT
-from jsonschema import validate
+from data_mine.zookeeper.integrity_manifest import file_signature
 
 CONFIG_FILE = os.path.join(PROJECT_ROOT, "zookeeper", "config", "config.json")
 CONFIG_SCHEMA_FILE = os.path.join(PROJECT_ROOT, "zookeeper", "config", "config_schema.json")  # noqa: E501
 
+# The last parsed (and validated) configuration and the schema validator,
+# keyed by the stat signatures of the files they were loaded from.
+_CONFIG_CACHE = {}
+_VALIDATOR_CACHE = {}
+
+
+def clear_datasets_config_cache():
+    """
+    Forgets the parsed configuration and the compiled schema validator.
+
+    The next call of `load_datasets_config` reads both files again.
+    """
+    _CONFIG_CACHE.clear()
+    _VALIDATOR_CACHE.clear()
+
+
+def schema_validator():
+    """
+    Returns a validator for `config_schema.json`.
+
+    The schema is checked and compiled once and the validator is reused
+    until the schema file changes.
+    """
+    from jsonschema.validators import validator_for
+
+    key = file_signature(CONFIG_SCHEMA_FILE)
+    if _VALIDATOR_CACHE.get("key") != key or key is None:
+        schema = None
+        with open(CONFIG_SCHEMA_FILE, "rt") as f:
+            schema = json.load(f)
+        assert(schema is not None)
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        _VALIDATOR_CACHE.clear()
+        _VALIDATOR_CACHE.update(key=key, validator=cls(schema))
+    return _VALIDATOR_CACHE["validator"]
+
 
 def load_datasets_config():
     """
     Parses the JSON file containing the datasets configuration.
 
     Moreover, it validates the loaded object against the defined schema.
+    The result is memoized: the files are read (and the configuration
+    validated) again only if `config.json` or `config_schema.json` was
+    modified (see `file_signature`). Callers must not modify the result.
 
     Returns:
         config (dict): dictionary of (dataset_id) -> configuration.
     """
+    key = [file_signature(CONFIG_FILE), file_signature(CONFIG_SCHEMA_FILE)]
+    if _CONFIG_CACHE.get("key") == key and None not in key:
+        return _CONFIG_CACHE["config"]
+
     obj = None
     with open(CONFIG_FILE, "rt") as f:
         obj = json.load(f)
     assert(obj is not None)
 
-    schema = None
-    with open(CONFIG_SCHEMA_FILE, "rt") as f:
-        schema = json.load(f)
-    assert(schema is not None)
-
     # Throws if the object does not obey the schema.
-    validate(instance=obj, schema=schema)
+    schema_validator().validate(obj)
 
     config = {}
     for entry in obj:
@@ -36,4 +75,6 @@ def load_datasets_config():
         assert(dataset not in config)
         config[dataset] = entry["config"]
 
+    _CONFIG_CACHE.clear()
+    _CONFIG_CACHE.update(key=key, config=config)
     return config
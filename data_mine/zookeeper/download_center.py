@@ -1,18 +1,54 @@
 import os
+import threading
 
 from data_mine import Collection
 from data_mine.utils import msg
 from data_mine.utils import (
         datamine_cache_dir,
+        download_and_extract_tar,
         download_file_if_missing,
         extract_archive,
         is_archive,
+        thread_map,
         url_to_filename
 )
 from data_mine.zookeeper.config import load_datasets_config
 
+# The maximum number of requirements of a dataset downloaded at once.
+MAX_CONCURRENT_DOWNLOADS = 4
 
-def download_dataset(dataset_id, integrity_check):
+# Requirements with these extensions are extracted while they download.
+TARBALL_EXTENSIONS = [".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz"]
+
+# The (dataset ID, cache directory, integrity check) triples for which the
+# integrity check passed in the current process. See `download_dataset`.
+_READY_DATASETS = set()
+_READY_DATASETS_LOCK = threading.Lock()
+
+
+def is_tarball_filename(filename):
+    return any([filename.lower().endswith(ext) for ext in TARBALL_EXTENSIONS])
+
+
+def invalidate_ready_datasets(dataset_id=None):
+    """
+    Forgets that the local copy of a dataset passed its integrity check.
+
+    The next `download_dataset` call for the dataset runs the integrity
+    check again. Call this function after modifying or deleting the files
+    of a dataset in the cache directory of a running process. If
+    `dataset_id` is None, all the datasets are forgotten.
+    """
+    assert(dataset_id is None or isinstance(dataset_id, Collection))
+    with _READY_DATASETS_LOCK:
+        if dataset_id is None:
+            _READY_DATASETS.clear()
+        else:
+            for key in [k for k in _READY_DATASETS if k[0] == dataset_id]:
+                _READY_DATASETS.remove(key)
+
+
+def download_dataset(dataset_id, integrity_check, keep_archives=True):
     """
     Downloads a dataset identified by it's dataset ID (Collection).
 
@@ -23,9 +59,29 @@ def download_dataset(dataset_id, integrity_check):
     Returns a code (int): with the following semantics:
     * 1: dataset is available locally and the integrity check passed;
     * 2: the dataset has been downloaded (was not available locally).
+
+    The requirements of the dataset are downloaded concurrently (with one
+    progress bar for all of them) and each archive is unpacked as soon as
+    its download finishes. Tarballs which are not available locally are
+    extracted while they download. Like the other requirements, they are
+    first written to a ".part" file, so an interrupted download is resumed
+    by the next call. If `keep_archives` is False, a tarball is removed once
+    extracted (saves disk space but a new download requires the whole
+    tarball again).
+
+    A passed integrity check is remembered for the lifetime of the process
+    (per dataset, cache directory and integrity check) so repeated calls
+    do not walk the dataset files again. Use `invalidate_ready_datasets`
+    to force a new check.
     """
     assert(isinstance(dataset_id, Collection))
+    key = (dataset_id, datamine_cache_dir(), integrity_check)
+    with _READY_DATASETS_LOCK:
+        if key in _READY_DATASETS:
+            return 1
     if integrity_check(dataset_id):  # Dataset is already downloaded.
+        with _READY_DATASETS_LOCK:
+            _READY_DATASETS.add(key)
         return 1
     msg.info("Downloading {} ...".format(dataset_id.name))
     config = load_datasets_config()[dataset_id.name]
@@ -33,8 +89,15 @@ def download_dataset(dataset_id, integrity_check):
     if not os.path.exists(dataset_dir):
         os.makedirs(dataset_dir, mode=0o755)
 
-    # Download all the requirements.
-    for requirement in config["requirements"]:
+    from tqdm import tqdm
+
+    # All the requirements share the same progress bar.
+    progress_bar = tqdm(
+            desc="Downloading {}".format(dataset_id.name),
+            total=0, unit='B', unit_scale=True
+    )
+
+    def download_requirement(requirement):
         url = requirement["URL"]
         expected_sha256 = requirement["SHA256"]
 
@@ -44,16 +107,40 @@ def download_dataset(dataset_id, integrity_check):
         assert(filename is not None and len(filename) > 0)
         filepath = os.path.join(dataset_dir, filename)
 
+        if is_tarball_filename(filename) and not os.path.isfile(filepath):
+            download_and_extract_tar(
+                    url, dataset_dir,
+                    expected_sha256=expected_sha256,
+                    archive_path=filepath,
+                    progress_bar=progress_bar
+            )
+            if not keep_archives:
+                os.remove(filepath)
+            return
+
         download_file_if_missing(
                 url, filepath,
                 expected_sha256=expected_sha256,
-                desc="Downloading {}".format(filename)
+                progress_bar=progress_bar
         )
         assert(os.path.isfile(filepath))
 
-        # Unpack the file if it is archived or compressed.
+        # Unpack the file if it is archived or compressed. This is done as
+        # soon as the file is available (other files may still download).
+        # The archive does not need to be validated again as its SHA256
+        # has been verified.
         if is_archive(filepath):
             msg.info("Unpacking {} ...".format(filename))
-            extract_archive(filepath, outdir=dataset_dir)
+            extract_archive(filepath, outdir=dataset_dir, verified=True)
+
+    # Download all the requirements (concurrently).
+    try:
+        thread_map(
+                download_requirement,
+                config["requirements"],
+                MAX_CONCURRENT_DOWNLOADS
+        )
+    finally:
+        progress_bar.close()
     msg.info("{} has been downloaded.".format(dataset_id.name))
     return 2
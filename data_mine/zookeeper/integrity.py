@@ -1,12 +1,23 @@
+import multiprocessing
 import os
+import threading
 
 from data_mine import Collection
 from data_mine.constants import PROJECT_ROOT
 from data_mine.utils import datamine_cache_dir
 from data_mine.utils import file_sha256
+from data_mine.utils import msg
+from data_mine.utils import thread_map
 from data_mine.zookeeper import load_datasets_config
+from data_mine.zookeeper.integrity_manifest import file_signature
+from data_mine.zookeeper.integrity_manifest import load_integrity_manifest
+from data_mine.zookeeper.integrity_manifest import save_integrity_manifest
 from data_mine.zookeeper.utils import load_integrity_file
 
+# Failure reasons reported by `deep_integrity_failures`.
+INTEGRITY_FILE_MISSING = "missing file"
+INTEGRITY_SHA256_MISMATCH = "SHA256 mismatch"
+
 
 def check_shallow_integrity(dataset_id):
     """
@@ -29,7 +40,7 @@ def check_shallow_integrity(dataset_id):
     return True
 
 
-def check_deep_integrity(dataset_id):
+def check_deep_integrity(dataset_id, force=False, num_workers=None):
     """
     Verifies if the dataset's local copy is valid in a deep way.
 
@@ -37,18 +48,83 @@ def check_deep_integrity(dataset_id):
     checksums are valid. This function can read a large amount of data from
     the disk (to compute file hashes) and it can be slow. If you want
     a more shallow of integrity verification please refer to the alternative
-    function: `check_deep_integrity`.
+    function: `check_shallow_integrity`.
+
+    The verified checksums are recorded in the integrity manifest of the
+    dataset together with the stat signature (size, mtime, inode) of each
+    file. Files whose signature did not change since they were verified are
+    not hashed again, unless `force` is True.
+
+    The files are hashed by a pool of `num_workers` threads and the check
+    stops at the first invalid file, which is reported as a warning. Use
+    `deep_integrity_failures` to get all the invalid files.
 
     Returns:
         result (bool): True if the dataset is valid, False otherwise.
     """
+    failures = deep_integrity_failures(
+            dataset_id,
+            force=force,
+            num_workers=num_workers,
+            stop_early=True
+    )
+    for expected_file, reason in failures:
+        msg.warning("{}: {} ({})".format(dataset_id.name, expected_file, reason))  # noqa: E501
+    return len(failures) == 0
+
+
+def deep_integrity_failures(dataset_id, force=False, num_workers=None,
+                            stop_early=False):
+    """
+    Returns the files of the dataset's local copy that are not valid.
+
+    The result is a list of (relative-file-path, reason) tuples, in the
+    order of the expected files of the dataset, where reason is either
+    `INTEGRITY_FILE_MISSING` or `INTEGRITY_SHA256_MISMATCH`. An empty list
+    means that the local copy is valid.
+
+    The files are hashed concurrently by a pool of `num_workers` threads
+    (hashlib releases the GIL while hashing). By default, the number of
+    workers depends on the number of CPUs. If `stop_early` is True, the
+    files that have not been verified when the first failure is found are
+    skipped so at least one (but not necessarily all) of the failures is
+    returned. See `check_deep_integrity` for the semantics of `force`.
+
+    The integrity manifest is updated only if the local copy is valid.
+    """
     assert(isinstance(dataset_id, Collection))
+    if num_workers is None:
+        num_workers = min(32, multiprocessing.cpu_count() + 4)
+    assert(num_workers >= 1)
     config = load_datasets_config()[dataset_id.name]
     cache_dir = os.path.join(datamine_cache_dir(), dataset_id.name)
-    for sha256, expected_file in load_integrity_file(os.path.join(PROJECT_ROOT, config["expectedFiles"])):  # noqa: E501
-        expected_file = os.path.join(cache_dir, expected_file)
-        if not os.path.isfile(expected_file):
-            return False
-        if file_sha256(expected_file) != sha256:
-            return False
-    return True
+    manifest = {} if force else load_integrity_manifest(dataset_id)
+    expected_files = list(load_integrity_file(os.path.join(PROJECT_ROOT, config["expectedFiles"])))  # noqa: E501
+    failed = threading.Event()
+
+    def verify(item):
+        # Returns (relative-file-path, manifest entry or None, failure reason).
+        sha256, expected_file = item
+        if stop_early and failed.is_set():
+            return expected_file, None, None  # Skipped.
+        file_path = os.path.join(cache_dir, expected_file)
+        signature = file_signature(file_path)
+        if signature is None:
+            failed.set()
+            return expected_file, None, INTEGRITY_FILE_MISSING
+        entry = manifest.get(expected_file)
+        if entry is not None and entry["signature"] == signature and entry["SHA256"] == sha256:  # noqa: E501
+            return expected_file, entry, None
+        if file_sha256(file_path) != sha256:
+            failed.set()
+            return expected_file, None, INTEGRITY_SHA256_MISMATCH
+        return expected_file, {"signature": signature, "SHA256": sha256}, None  # noqa: E501
+
+    results = thread_map(verify, expected_files, num_workers)
+
+    failures = [(path, reason) for path, _, reason in results if reason is not None]  # noqa: E501
+    if len(failures) == 0:
+        new_manifest = dict([(path, entry) for path, entry, _ in results])
+        if new_manifest != manifest:
+            save_integrity_manifest(dataset_id, new_manifest)
+    return failures
@@ -0,0 +1,83 @@
+import json
+import os
+
+from data_mine import Collection
+from data_mine.utils import datamine_cache_dir, msg
+
+INTEGRITY_MANIFEST_FILENAME = ".integrity_manifest.json"
+
+
+def integrity_manifest_file(dataset_id):
+    """
+    Returns the path of the integrity manifest of a dataset.
+
+    Example: `DATAMINE_CACHE_DIR/RACE/.integrity_manifest.json`.
+    """
+    assert(isinstance(dataset_id, Collection))
+    return os.path.join(datamine_cache_dir(), dataset_id.name, INTEGRITY_MANIFEST_FILENAME)  # noqa: E501
+
+
+def file_signature(file_path):
+    """
+    Returns the stat signature of a file: [size, mtime (ns), inode].
+
+    If the signature of a file did not change since its SHA256 was computed,
+    then the file is assumed to be unchanged. Returns None if the file does
+    not exist.
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    mtime_ns = getattr(st, "st_mtime_ns", None)
+    if mtime_ns is None:  # pragma: no cover (Python 2)
+        mtime_ns = int(st.st_mtime * 1e9)
+    return [st.st_size, mtime_ns, st.st_ino]
+
+
+def load_integrity_manifest(dataset_id):
+    """
+    Loads the integrity manifest of a dataset.
+
+    Returns a dictionary from the relative path of a file (as stored in the
+    expected files of the dataset) to a dictionary with the keys:
+    * `signature`: the stat signature (see `file_signature`) of the file;
+    * `SHA256`: the SHA256 of the file (hex) when it had that signature.
+
+    A missing or corrupted manifest is treated as an empty one.
+    """
+    path = integrity_manifest_file(dataset_id)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, "rt") as f:
+            manifest = json.load(f)
+        assert(isinstance(manifest, dict))
+        for entry in manifest.values():
+            assert(isinstance(entry["signature"], list))
+            assert(len(entry["signature"]) == 3)
+            assert(len(entry["SHA256"]) == 64)
+        return manifest
+    except Exception:  # pylint: disable=broad-except
+        msg.warning("Ignoring corrupted integrity manifest: {}".format(path))
+    return {}
+
+
+def save_integrity_manifest(dataset_id, manifest):
+    """
+    Stores the integrity manifest of a dataset (see `load_integrity_manifest`).
+
+    The manifest is first written to a temporary file which is then renamed
+    so that readers never observe a partially written manifest.
+    """
+    assert(isinstance(manifest, dict))
+    path = integrity_manifest_file(dataset_id)
+    if not os.path.isdir(os.path.dirname(path)):
+        return  # The dataset is not downloaded.
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp_path, "wt") as g:
+        json.dump(manifest, g, sort_keys=True)
+        g.flush()
+    if os.path.isfile(path):
+        os.remove(path)
+    os.rename(temp_path, path)
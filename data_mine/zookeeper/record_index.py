@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+from data_mine import Collection
+from data_mine.utils import get_json_loads
+from data_mine.zookeeper.integrity_manifest import file_signature
+from data_mine.zookeeper.split_cache import split_cache_dir
+
+# Bump this when the layout of the record index changes.
+RECORD_INDEX_FORMAT_VERSION = 1
+
+# The indexes loaded by this process, keyed by the path of the index file.
+_LOADED_INDEXES = {}
+
+
+def record_id_hash(record_id):
+    # A stable 64-bit hash of a record ID (first 8 bytes of SHA1).
+    return struct.unpack(">Q", hashlib.sha1(record_id.encode("utf-8")).digest()[:8])[0]  # noqa: E501
+
+
+class RecordIndex(object):
+    """
+    A map from record IDs to their positions in the raw data of a split.
+
+    A position is a pair of integers (start, end), usually the byte range
+    of the record in the data file (see `data_mine.utils.read_json_range`).
+    Splits stored in many files (e.g. RACE) also use `names`, the list of
+    files, and store the index of the file in `start`.
+
+    Only 64-bit hashes of the IDs are stored (sorted, next to the
+    positions), so a lookup may return positions of other records if two
+    IDs collide: the caller must check the ID of the records it reads.
+    """
+
+    def __init__(self, hashes, starts, ends, names=()):
+        import numpy as np
+
+        assert(len(hashes) == len(starts) == len(ends))
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.names = [str(name) for name in names]
+
+    @classmethod
+    def build(cls, entries, names=()):
+        """
+        Builds an index from (record_id, start, end) tuples.
+
+        Records with the same ID keep their relative order.
+        """
+        import numpy as np
+
+        entries = list(entries)
+        hashes = np.array([record_id_hash(e[0]) for e in entries], dtype=np.uint64)  # noqa: E501
+        starts = np.array([e[1] for e in entries], dtype=np.int64)
+        ends = np.array([e[2] for e in entries], dtype=np.int64)
+        order = np.argsort(hashes, kind="mergesort")
+        return cls(hashes[order], starts[order], ends[order], names)
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as data:
+            assert(int(data["format_version"]) == RECORD_INDEX_FORMAT_VERSION)
+            return cls(
+                    data["hashes"], data["starts"], data["ends"],
+                    data["names"].tolist()
+            )
+
+    def save(self, path):
+        """
+        Saves the index at `path` (a `.npz` file).
+
+        The index is written to a temporary file which is then renamed, so
+        readers never observe a partially written index.
+        """
+        import numpy as np
+
+        parent_dir = os.path.dirname(path)
+        if not os.path.isdir(parent_dir):
+            os.makedirs(parent_dir, mode=0o755)
+        fd, temp_path = tempfile.mkstemp(prefix=".building-", suffix=".npz", dir=parent_dir)  # noqa: E501
+        try:
+            with os.fdopen(fd, "wb") as g:
+                np.savez(
+                        g,
+                        format_version=np.int64(RECORD_INDEX_FORMAT_VERSION),
+                        hashes=self.hashes,
+                        starts=self.starts,
+                        ends=self.ends,
+                        names=np.array(self.names, dtype=np.str_)
+                )
+            os.rename(temp_path, path)
+        finally:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def positions(self, record_id):
+        """
+        Returns the (start, end) positions of the records whose ID hash is
+        equal to the hash of `record_id`, in the order of the raw data.
+        """
+        import numpy as np
+
+        key = np.uint64(record_id_hash(record_id))
+        first = int(np.searchsorted(self.hashes, key, side="left"))
+        last = int(np.searchsorted(self.hashes, key, side="right"))
+        return list(zip(
+                self.starts[first:last].tolist(),
+                self.ends[first:last].tolist()
+        ))
+
+
+def record_index_file(dataset_id, split, source, kind="record_index"):
+    """
+    Returns the path of the index of a split whose raw data is `source`.
+
+    `source` is the data file of the split (or its directory for splits
+    stored in many files). The name depends on the format version and on
+    the stat signature of `source` (see `file_signature`), so new raw data
+    gets a new index. `kind` tells apart several indexes of the same split
+    (e.g. by question and by passage). Example:
+    `DATAMINE_CACHE_DIR/.split_cache/CSQA/TRAIN.record_index.0c3f9a1b2d4e5f60.npz`.
+    """  # noqa: E501
+    assert(isinstance(dataset_id, Collection))
+    signature = file_signature(source)
+    assert(signature is not None), "Missing file: {}".format(source)
+    key = hashlib.sha256(json.dumps([RECORD_INDEX_FORMAT_VERSION, signature]).encode()).hexdigest()[:16]  # noqa: E501
+    filename = "{}.{}.{}.npz".format(split.name, kind, key)
+    return os.path.join(split_cache_dir(dataset_id), filename)
+
+
+def load_record_index(dataset_id, split, source, build, kind="record_index"):
+    """
+    Returns the index of a split, building it on the first call.
+
+    `build` is a function with no arguments returning the `RecordIndex` of
+    `source` and `kind` is the kind of index (see `record_index_file`). The
+    index is saved in the split cache and kept in memory for the lifetime
+    of the process. Indexes of older versions of the raw data of the split
+    are removed when a new index is built.
+
+    Processes building the same index at once (e.g. the ranks of a data
+    parallel job on a cold cache) all write the same complete file, which
+    is renamed atomically.
+    """
+    path = record_index_file(dataset_id, split, source, kind)
+    index = _LOADED_INDEXES.get(path)
+    if index is not None:
+        return index
+    if os.path.isfile(path):
+        index = RecordIndex.load(path)
+    else:
+        index = build()
+        assert(isinstance(index, RecordIndex))
+        index.save(path)
+        prefix = "{}.{}.".format(split.name, kind)
+        parent_dir = os.path.dirname(path)
+        for name in os.listdir(parent_dir):
+            if name.startswith(prefix) and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(parent_dir, name))
+                except OSError:
+                    pass  # Removed by another process.
+    _LOADED_INDEXES[path] = index
+    return index
+
+
+def index_jsonl_file(file_path, record_id):
+    """
+    Builds the index of a JSON lines file (one record per line).
+
+    `record_id` is a function which returns the ID of a decoded line. The
+    positions are the byte ranges of the lines.
+    """
+    def entries():
+        loads = get_json_loads()
+        with open(file_path, "rb") as f:
+            start = 0
+            for line in f:
+                end = start + len(line)
+                if len(line.strip()) > 0:
+                    yield record_id(loads(line)), start, end
+                start = end
+
+    return RecordIndex.build(entries())
+
+
+def lookup_records(index, ids, read, id_key="id"):
+    """
+    Returns the records with the given IDs, in the order of `ids`.
+
+    `read(start, end)` parses and returns the list of records stored at a
+    position of `index` (usually a single record). The records are matched
+    by their `id_key` value (so hash collisions are harmless). A KeyError is
+    raised if an ID is missing.
+    """
+    records = []
+    for record_id in ids:
+        record = None
+        for start, end in index.positions(record_id):
+            matches = [r for r in read(start, end) if r[id_key] == record_id]  # noqa: E501
+            if len(matches) > 0:
+                record = matches[0]
+                break
+        if record is None:
+            raise KeyError(record_id)
+        records.append(record)
+    return records
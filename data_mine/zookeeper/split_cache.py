@@ -0,0 +1,153 @@
+import hashlib
+import os
+import pickle
+import shutil
+
+from data_mine import Collection
+from data_mine.utils import datamine_cache_dir, msg
+from data_mine.zookeeper.config import load_datasets_config
+
+SPLIT_CACHE_DIR_NAME = ".split_cache"
+
+
+def split_cache_dir(dataset_id):
+    """
+    Returns the directory holding the processed splits of a dataset.
+
+    The directory lives under the DataMine cache directory (not inside the
+    dataset directory) so that it never interferes with the expected files
+    of the dataset. Example: `DATAMINE_CACHE_DIR/.split_cache/RACE`.
+    """
+    assert(isinstance(dataset_id, Collection))
+    return os.path.join(datamine_cache_dir(), SPLIT_CACHE_DIR_NAME, dataset_id.name)  # noqa: E501
+
+
+def split_cache_key(dataset_id, split, loader_version, variant=None):
+    """
+    Computes the key (hex string) of a processed split.
+
+    The key depends on the dataset, the split, the version of the loader,
+    an optional variant (for loaders with options that change the output)
+    and the SHA256 values of the dataset requirements. Any change in the
+    raw data (a new config) or in the parsing logic (a version bump) leads
+    to a different key and thus the old processed split is never used.
+    """
+    assert(isinstance(dataset_id, Collection))
+    import pandas as pd
+
+    config = load_datasets_config()[dataset_id.name]
+    parts = [
+            dataset_id.name,
+            split.name,
+            str(loader_version),
+            str(variant or ""),
+            pd.__version__,  # Pickled frames are not portable across versions.
+            str(pickle.HIGHEST_PROTOCOL)
+    ]
+    parts.extend(sorted([req["SHA256"] for req in config["requirements"]]))
+    sha256 = hashlib.sha256()
+    sha256.update("\n".join(parts).encode())
+    return sha256.hexdigest()
+
+
+def split_cache_file(dataset_id, split, loader_version, variant=None):
+    """
+    Returns the path of the file storing the processed split.
+
+    Example: `DATAMINE_CACHE_DIR/.split_cache/CSQA/TRAIN.3ea1c0c9d4e5b6f7.pkl`
+    """
+    key = split_cache_key(dataset_id, split, loader_version, variant)
+    filename = "{}.{}.pkl".format(split_cache_stem(split, variant), key[:16])
+    return os.path.join(split_cache_dir(dataset_id), filename)
+
+
+def split_cache_stem(split, variant=None):
+    # The part of the file name that does not depend on the cache key.
+    if variant:
+        return "{}-{}".format(split.name, variant)
+    return split.name
+
+
+def read_split_cache(dataset_id, split, loader_version, variant=None):
+    """
+    Loads a processed split (Pandas DataFrame) from the split cache.
+
+    Returns None if the split has not been cached yet. A corrupted cache
+    entry is removed and treated as missing.
+    """
+    path = split_cache_file(dataset_id, split, loader_version, variant)
+    return read_cached_frame(path)
+
+
+def write_split_cache(dataset_id, split, loader_version, df, variant=None):
+    """
+    Stores a processed split (Pandas DataFrame) in the split cache.
+
+    The data is first written to a temporary file which is then renamed
+    so that readers never observe a partially written file. Stale entries
+    of the same split (older loader versions or older configurations) are
+    removed.
+    """
+    path = split_cache_file(dataset_id, split, loader_version, variant)
+    write_cached_frame(path, df)
+
+    cache_dir = os.path.dirname(path)
+    stem = split_cache_stem(split, variant)
+    for filename in os.listdir(cache_dir):
+        if not filename.endswith(".pkl"):
+            continue  # E.g. temporary files of concurrent writers.
+        if filename.split(".")[0] == stem and filename != os.path.basename(path):  # noqa: E501
+            os.remove(os.path.join(cache_dir, filename))
+
+
+def read_cached_frame(path):
+    """
+    Loads a Pandas DataFrame stored with `write_cached_frame`.
+
+    Returns None if the file does not exist. A corrupted file is removed
+    and treated as missing.
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception:  # pylint: disable=broad-except
+        msg.warning("Removing corrupted cache entry: {}".format(path))
+        os.remove(path)
+    return None
+
+
+def write_cached_frame(path, df):
+    """
+    Stores a Pandas DataFrame (pickle) at `path`, creating the parent dirs.
+
+    The data is first written to a temporary file which is then renamed
+    so that readers never observe a partially written file.
+    """
+    cache_dir = os.path.dirname(path)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, mode=0o755)
+
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp_path, "wb") as g:
+        pickle.dump(df, g, protocol=pickle.HIGHEST_PROTOCOL)
+        g.flush()
+    if os.path.isfile(path):
+        os.remove(path)
+    os.rename(temp_path, path)
+
+
+def clear_split_cache(dataset_id=None):
+    """
+    Removes all the processed splits of a dataset from the split cache.
+
+    If `dataset_id` is None, the processed splits of all datasets are removed.
+    """
+    assert(dataset_id is None or isinstance(dataset_id, Collection))
+    if dataset_id is None:
+        path = os.path.join(datamine_cache_dir(), SPLIT_CACHE_DIR_NAME)
+    else:
+        path = split_cache_dir(dataset_id)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
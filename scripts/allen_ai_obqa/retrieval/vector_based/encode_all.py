@@ -1,8 +1,7 @@
 import data_mine as dm
 import pandas as pd
-import pickle
 
-from data_mine.nlp.allen_ai_obqa import OBQAFacts, OBQAType
+from data_mine.nlp.allen_ai_obqa import EmbeddingStore, OBQAFacts, OBQAType
 from sentence_transformers import SentenceTransformer
 
 
@@ -14,7 +13,7 @@ def get_all_sentences():
         for answer in row.answers:
             sentences.append(row.question + " " + answer)
         sentences.append(row.question + " " + ", ".join(row.answers))
-    return list(set(sentences))
+    return sorted(set(sentences))
 
 
 def main():
@@ -22,11 +21,8 @@ def main():
     sentences = get_all_sentences()
     sentence_embeddings = model.encode(sentences, show_progress_bar=True)
     assert(len(sentence_embeddings) == len(sentences))
-    data = {}
-    for sentence, embedding in zip(sentences, sentence_embeddings):
-        data[sentence] = embedding
-    pickle.dump(data, open("embeddings.pkl", "wb"))
-    print("Embeddings written to embeddings.pkl")
+    EmbeddingStore.create("embeddings", sentences, sentence_embeddings)
+    print("Embeddings written to embeddings.npy (+ embeddings.sentences.json)")  # noqa: E501
 
 
 if __name__ == "__main__":
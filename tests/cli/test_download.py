@@ -76,6 +76,20 @@ class TestDownloadCommand(unittest.TestCase):
                 Collection.from_str("RACE"), ANY
         )
 
+    @patch("data_mine.cli.download_cmd.check_deep_integrity")
+    @patch("data_mine.cli.download_cmd.download_dataset")
+    def test_force_flag(self, mock_download, mock_check):
+        mock_download.return_value = 1
+        with patch('sys.argv', ["data_mine download", "--force", "RACE"]):
+            with patch('sys.stdout', new_callable=StringIO):
+                download()
+        mock_download.assert_called_once_with(
+                Collection.from_str("RACE"), ANY
+        )
+        integrity_check = mock_download.call_args[0][1]
+        integrity_check(Collection.RACE)
+        mock_check.assert_called_once_with(Collection.RACE, force=True)
+
 
 if __name__ == '__main__':
     unittest.main()
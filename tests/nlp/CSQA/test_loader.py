@@ -7,7 +7,7 @@ import sys
 import unittest
 
 from data_mine import Collection
-from data_mine.nlp.CSQA import CSQAType
+from data_mine.nlp.CSQA import CSQAType, iter_csqa
 from data_mine.nlp.CSQA.utils import type_to_data_file
 from data_mine.utils import datamine_cache_dir
 from pyfakefs.fake_filesystem_unittest import TestCase
@@ -258,6 +258,156 @@ class TestCSQADatasetLoader(TestCase):
             dm.CSQA(CSQAType.DEV)
         mock_download_dataset.assert_called_once_with(Collection.CSQA, ANY)
 
+    @patch('data_mine.zookeeper.split_cache.load_datasets_config')
+    @patch('data_mine.nlp.CSQA.loader.download_dataset')
+    def test_split_cache(self, mock_download_dataset, mock_config):
+        mock_config.return_value = {"CSQA": {"requirements": [
+            {"URL": "http://fake-website.com/x.jsonl", "SHA256": "a" * 64}
+        ]}}
+        self.write_questions(CSQAType.TRAIN, [TRAIN_QUESTION1])
+        df = dm.CSQA(CSQAType.TRAIN, use_cache=True)
+        self.assertEqual(len(df), 1)
+
+        # The second call is served from the split cache.
+        self.write_questions(CSQAType.TRAIN, [
+            TRAIN_QUESTION1, TRAIN_QUESTION2
+        ])
+        pd.testing.assert_frame_equal(
+                dm.CSQA(CSQAType.TRAIN, use_cache=True), df
+        )
+        self.assertEqual(len(dm.CSQA(CSQAType.TRAIN)), 2)
+        self.assertEqual(mock_download_dataset.call_count, 3)
+
+    @patch('data_mine.zookeeper.split_cache.load_datasets_config')
+    @patch('data_mine.nlp.CSQA.loader.download_dataset')
+    def test_columns_and_where(self, mock_download_dataset, mock_config):
+        mock_config.return_value = {"CSQA": {"requirements": [
+            {"URL": "http://fake-website.com/x.jsonl", "SHA256": "a" * 64}
+        ]}}
+        self.write_questions(CSQAType.TRAIN, [
+            TRAIN_QUESTION1, TRAIN_QUESTION2
+        ])
+        for use_cache in [False, True, True]:
+            df = dm.CSQA(
+                    CSQAType.TRAIN, use_cache=use_cache,
+                    columns=["correct", "id"], where={"correct": "A"}
+            )
+            pd.testing.assert_frame_equal(df, pd.DataFrame([
+                {"correct": "A", "id": "6c84e79d0595efd99596faa07c4961d0"}
+            ]))
+
+        # The split cache stores the whole split.
+        self.assertEqual(len(dm.CSQA(CSQAType.TRAIN, use_cache=True)), 2)
+
+    @patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True)
+    @patch('data_mine.nlp.CSQA.loader.download_dataset')
+    def test_get_by_ids(self, mock_download_dataset):
+        self.write_questions(CSQAType.TRAIN, [
+            TRAIN_QUESTION1, TRAIN_QUESTION2
+        ])
+        df = dm.CSQA(CSQAType.TRAIN)
+        records = dm.get_by_ids(Collection.CSQA, CSQAType.TRAIN, [
+            df.iloc[1]["id"], df.iloc[0]["id"]
+        ])
+        self.assertListEqual(records, [
+            df.iloc[1].to_dict(), df.iloc[0].to_dict()
+        ])
+        self.assertListEqual(dm.get_by_ids(Collection.CSQA, CSQAType.TRAIN, []), [])  # noqa: E501
+        with self.assertRaises(KeyError):
+            dm.get_by_ids(Collection.CSQA, CSQAType.TRAIN, ["missing"])
+        with self.assertRaises(AssertionError):
+            dm.get_by_ids(Collection.CSQA, CSQAType.TRAIN, df.iloc[0]["id"])  # noqa: E501
+
+    def test_get_by_ids_of_unsupported_collection(self):
+        with self.assertRaises(ValueError) as context:
+            dm.get_by_ids(Collection.TRIVIA_QA, None, ["id"])
+        self.assertIn("TRIVIA_QA", str(context.exception))
+        self.assertIn("CSQA", str(context.exception))
+
+    @patch('data_mine.nlp.CSQA.loader.download_dataset')
+    def test_shards(self, mock_download_dataset):
+        questions = []
+        for i in range(0, 7):
+            question = json.loads(json.dumps(TRAIN_QUESTION1))
+            question["id"] = "q{}".format(i)
+            questions.append(question)
+        self.write_questions(CSQAType.TRAIN, questions)
+        df = dm.CSQA(CSQAType.TRAIN)
+        for seed in [None, 13]:
+            shards = [
+                dm.CSQA(CSQAType.TRAIN, shard_index=i, num_shards=3, seed=seed)  # noqa: E501
+                for i in range(0, 3)
+            ]
+            self.assertListEqual([len(shard) for shard in shards], [2, 2, 3])
+            all_ids = sum([list(shard["id"]) for shard in shards], [])
+            if seed is None:
+                pd.testing.assert_frame_equal(
+                        pd.concat(shards, ignore_index=True), df
+                )
+            else:
+                self.assertNotEqual(all_ids, list(df["id"]))
+                self.assertListEqual(sorted(all_ids), sorted(df["id"]))
+        shuffled = dm.CSQA(CSQAType.TRAIN, seed=13, columns=["id"])
+        self.assertListEqual(list(shuffled["id"]), all_ids)
+        with self.assertRaises(AssertionError):
+            dm.CSQA(CSQAType.TRAIN, shard_index=0)
+        with self.assertRaises(AssertionError):
+            dm.CSQA(CSQAType.TRAIN, use_cache=True, shard_index=0, num_shards=2)  # noqa: E501
+
+    @patch('data_mine.nlp.CSQA.loader.download_dataset')
+    def test_iter_batches(self, mock_download_dataset):
+        questions = []
+        for i in range(0, 7):
+            question = json.loads(json.dumps(TRAIN_QUESTION1))
+            question["id"] = "q{}".format(i)
+            questions.append(question)
+        self.write_questions(CSQAType.TRAIN, questions)
+        df = dm.CSQA(CSQAType.TRAIN)
+        self.assertListEqual(list(iter_csqa(CSQAType.TRAIN)), df.to_dict("records"))  # noqa: E501
+
+        batches = list(dm.iter_batches(Collection.CSQA, CSQAType.TRAIN, batch_size=3))  # noqa: E501
+        self.assertListEqual([len(b["id"]) for b in batches], [3, 3, 1])
+        self.assertListEqual(list(batches[0]), list(df.columns))
+        self.assertListEqual(sum([b["id"] for b in batches], []), list(df["id"]))  # noqa: E501
+        self.assertListEqual(batches[1]["answers"], list(df["answers"][3:6]))
+
+        # Deterministic shuffling, columns and shards.
+        def shuffled_ids(**kwargs):
+            batches = dm.iter_batches(
+                    Collection.CSQA, CSQAType.TRAIN, batch_size=2,
+                    shuffle_buffer_size=3, columns=["id"], **kwargs
+            )
+            return [b["id"] for b in batches]
+
+        ids = shuffled_ids(seed=5, prefetch_batches=0)
+        self.assertListEqual(shuffled_ids(seed=5), ids)
+        self.assertListEqual(sorted(sum(ids, [])), sorted(df["id"]))
+        self.assertNotEqual(sum(ids, []), list(df["id"]))
+        self.assertListEqual(
+                sorted(sum(shuffled_ids(shard_index=0, num_shards=2), [])),
+                sorted(df["id"][:3])
+        )
+        # The seed of a sharded call also shuffles the lines of the split.
+        seeded_shard = dm.CSQA(CSQAType.TRAIN, shard_index=0, num_shards=2, seed=5)  # noqa: E501
+        self.assertListEqual(
+                sorted(sum(shuffled_ids(shard_index=0, num_shards=2, seed=5), [])),  # noqa: E501
+                sorted(seeded_shard["id"])
+        )
+        self.assertEqual(len(shuffled_ids(drop_last=True)), 3)
+        with self.assertRaises(ValueError) as context:
+            dm.iter_batches(Collection.TRIVIA_QA, None)
+        self.assertIn("TRIVIA_QA", str(context.exception))
+        self.assertIn("CSQA", str(context.exception))
+
+    @patch.dict('data_mine.utils.json_utils._JSON_LOADS', clear=True)
+    @patch('data_mine.nlp.CSQA.loader.download_dataset')
+    def test_json_backends(self, mock_download_dataset):
+        self.write_questions(CSQAType.TRAIN, [TRAIN_QUESTION1, TRAIN_QUESTION2])  # noqa: E501
+        with patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "json"}):
+            expected = dm.CSQA(CSQAType.TRAIN)
+        with patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "auto"}):
+            pd.testing.assert_frame_equal(dm.CSQA(CSQAType.TRAIN), expected)
+
 
 if __name__ == '__main__':
     unittest.main()
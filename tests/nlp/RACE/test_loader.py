@@ -2,11 +2,14 @@ import data_mine as dm
 import os
 import pandas as pd
 import random
+import shutil
 import sys
+import tempfile
 import unittest
 
 from data_mine import Collection
-from data_mine.nlp.RACE import RACEType
+from data_mine.nlp.RACE import RACEType, get_race_by_ids, iter_race
+from data_mine.nlp.RACE.loader import load_race_index
 from data_mine.utils import datamine_cache_dir
 from pyfakefs.fake_filesystem_unittest import TestCase
 if sys.version_info >= (3, 3):
@@ -142,6 +145,156 @@ class TestRACEDatasetLoader(TestCase):
         self.assertEqual(index_count['1-id2'], 1)
         mock_download_dataset.assert_called_once_with(Collection.RACE, ANY)
 
+    @patch('data_mine.nlp.RACE.loader.download_dataset')
+    def test_normalized(self, mock_download_dataset):
+        df = dm.RACE(RACEType.TRAIN_MIDDLE)
+        passages, questions = dm.RACE(RACEType.TRAIN_MIDDLE, normalized=True)
+        self.assertEqual(passages.shape, (2, 1))
+        self.assertSetEqual(
+                set(passages["article"]),
+                {"article - id1", "article - id2"}
+        )
+        self.assertEqual(questions.shape, (4, 5))
+        self.assertListEqual(
+                list(questions.columns),
+                ["passage_idx", "question", "answers", "correct", "id"]
+        )
+        articles = {row["id"]: row["article"] for _, row in df.iterrows()}
+        for _, question in questions.iterrows():
+            self.assertEqual(
+                    passages["article"][question["passage_idx"]],
+                    articles[question["id"]]
+            )
+        self.assertEqual(mock_download_dataset.call_count, 2)
+
+    @patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True)
+    @patch('data_mine.nlp.RACE.loader.download_dataset')
+    def test_get_race_by_ids(self, mock_download_dataset):
+        df = dm.RACE(RACEType.TRAIN_MIDDLE)
+        rows = {row["id"]: row.to_dict() for _, row in df.iterrows()}
+        ids = ["3-id1", "1-id2", "1-id1", "2-id1"]
+        self.assertListEqual(
+                get_race_by_ids(RACEType.TRAIN_MIDDLE, ids),
+                [rows[q_id] for q_id in ids]
+        )
+        for q_id in ["4-id1", "1-id3", "id1"]:
+            with self.assertRaises(KeyError):
+                get_race_by_ids(RACEType.TRAIN_MIDDLE, [q_id])
+
+
+class TestRACEDatasetParallelLoader(unittest.TestCase):
+
+    # The worker processes do not share the fake file system of pyfakefs so
+    # we use a real temporary directory instead.
+    def setUp(self):
+        self.dataset_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dataset_dir)
+        for i in range(0, 60):
+            path, contents = FAKE_FILES[i % len(FAKE_FILES)]
+            # Some passages share their ID (the counter continues).
+            contents = contents.replace('"id":"id', '"id":"{}-id'.format(i % 7))  # noqa: E501
+            with open(os.path.join(self.dataset_dir, "{}-{}".format(i, path)), "wt") as g:  # noqa: E501
+                g.write(contents)
+                g.flush()
+
+    @patch('data_mine.nlp.RACE.loader.type_to_data_directory')
+    @patch('data_mine.nlp.RACE.loader.download_dataset')
+    def test_same_output_as_serial_load(self, mock_download, mock_dirpath):
+        mock_dirpath.return_value = self.dataset_dir
+        serial = dm.RACE(RACEType.TRAIN_HIGH)
+        self.assertEqual(len(serial), 120)
+        self.assertEqual(len(set(serial["id"])), 120)
+        for num_workers in [2, 3, 8]:
+            parallel = dm.RACE(RACEType.TRAIN_HIGH, num_workers=num_workers)
+            pd.testing.assert_frame_equal(parallel, serial)
+        self.assertEqual(mock_download.call_count, 4)
+
+    @patch('data_mine.nlp.RACE.loader.type_to_data_directory')
+    @patch('data_mine.nlp.RACE.loader.download_dataset')
+    def test_shards(self, mock_download, mock_dirpath):
+        mock_dirpath.return_value = self.dataset_dir
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        with patch.dict(os.environ, {"DATAMINE_CACHE_DIR": cache_dir}), \
+                patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True):  # noqa: E501
+            serial = dm.RACE(RACEType.TRAIN_HIGH)
+            shards = [
+                dm.RACE(RACEType.TRAIN_HIGH, shard_index=i, num_shards=4, num_workers=1 + i % 2)  # noqa: E501
+                for i in range(0, 4)
+            ]
+            # The IDs are the ones of a full load (passage IDs are shared).
+            self.assertTrue(all(len(shard) > 0 for shard in shards))
+            pd.testing.assert_frame_equal(
+                    pd.concat(shards, ignore_index=True), serial
+            )
+            shuffled = dm.RACE(RACEType.TRAIN_HIGH, seed=5)
+            self.assertNotEqual(list(shuffled["id"]), list(serial["id"]))
+            pd.testing.assert_frame_equal(
+                    shuffled.sort_values("id").reset_index(drop=True),
+                    serial.sort_values("id").reset_index(drop=True)
+            )
+            with self.assertRaises(AssertionError):
+                dm.RACE(RACEType.TRAIN_HIGH, use_cache=True, seed=5)
+
+    @patch('data_mine.nlp.RACE.loader.type_to_data_directory')
+    def test_index_built_in_parallel(self, mock_dirpath):
+        mock_dirpath.return_value = self.dataset_dir
+        indexes = []
+        for num_workers in [1, 3]:
+            cache_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, cache_dir)
+            with patch.dict(os.environ, {"DATAMINE_CACHE_DIR": cache_dir}), \
+                    patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True):  # noqa: E501
+                indexes.append(load_race_index(RACEType.TRAIN_HIGH, num_workers))  # noqa: E501
+        self.assertEqual(len(indexes[0]), 120)
+        self.assertListEqual(indexes[1].names, indexes[0].names)
+        for field in ["hashes", "starts", "ends"]:
+            self.assertListEqual(
+                    getattr(indexes[1], field).tolist(),
+                    getattr(indexes[0], field).tolist()
+            )
+
+    @patch('data_mine.nlp.RACE.loader.type_to_data_directory')
+    @patch('data_mine.nlp.RACE.loader.download_dataset')
+    def test_iter_race(self, mock_download, mock_dirpath):
+        mock_dirpath.return_value = self.dataset_dir
+        serial = dm.RACE(RACEType.TRAIN_HIGH, columns=["id", "correct"])
+        for num_workers in [1, 3]:
+            records = iter_race(
+                    RACEType.TRAIN_HIGH, num_workers=num_workers,
+                    columns=["id", "correct"]
+            )
+            self.assertListEqual(list(records), serial.to_dict("records"))
+        # The pool is terminated if the iteration stops early.
+        records = iter_race(RACEType.TRAIN_HIGH, num_workers=3)
+        self.assertEqual(next(records)["id"], serial["id"][0])
+        records.close()
+        batches = dm.iter_batches(
+                Collection.RACE, RACEType.TRAIN_HIGH, batch_size=50,
+                num_workers=2
+        )
+        self.assertListEqual([len(b["id"]) for b in batches], [50, 50, 20])
+
+        # Shuffling a whole split does not need the index of the split.
+        with patch('data_mine.nlp.RACE.loader.load_race_index') as mock_index:  # noqa: E501
+            batches = dm.iter_batches(
+                    Collection.RACE, RACEType.TRAIN_HIGH, batch_size=50,
+                    shuffle_buffer_size=30, seed=3
+            )
+            ids = sum([b["id"] for b in batches], [])
+            mock_index.assert_not_called()
+        self.assertNotEqual(ids, list(serial["id"]))
+        self.assertListEqual(sorted(ids), sorted(serial["id"]))
+
+    @patch('data_mine.nlp.RACE.loader.type_to_data_directory')
+    @patch('data_mine.nlp.RACE.loader.download_dataset')
+    def test_invalid_file_raises_error(self, mock_download, mock_dirpath):
+        mock_dirpath.return_value = self.dataset_dir
+        with open(os.path.join(self.dataset_dir, "bad.json"), "wt") as g:
+            g.write('{"id": "bad"}')
+        with self.assertRaises(AssertionError):
+            dm.RACE(RACEType.TRAIN_HIGH, num_workers=2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -6,7 +6,7 @@ import sys
 import unittest
 
 from data_mine import Collection
-from data_mine.nlp.allen_ai_drop import DROPType
+from data_mine.nlp.allen_ai_drop import DROPType, get_drop_by_ids
 from data_mine.utils import datamine_cache_dir
 from pyfakefs.fake_filesystem_unittest import TestCase
 if sys.version_info >= (3, 3):
@@ -619,6 +619,25 @@ class TestAllenAIDropDatasetLoader(TestCase):
         pd.testing.assert_frame_equal(df, expected_df)
         mock_download_dataset.assert_called_once_with(Collection.ALLEN_AI_DROP, ANY)  # noqa: E501
 
+    @patch('data_mine.nlp.allen_ai_drop.loader.download_dataset')
+    def test_normalized(self, mock_download_dataset):
+        with open(self.file_path, "wt") as g:
+            g.write(VALID_QUESTIONS)
+            g.flush()
+
+        df = dm.ALLEN_AI_DROP(DROPType.DEV)
+        passages, questions = dm.ALLEN_AI_DROP(DROPType.DEV, normalized=True)
+        pd.testing.assert_frame_equal(
+                passages,
+                pd.DataFrame({"passage": ["Passage 1", "Passage 2"]})
+        )
+        self.assertListEqual(list(questions["passage_idx"]), [0] * 6 + [1] * 3)
+        pd.testing.assert_frame_equal(
+                questions.drop(columns=["passage_idx"]),
+                df.drop(columns=["passage"])
+        )
+        self.assertEqual(mock_download_dataset.call_count, 2)
+
     @patch('data_mine.nlp.allen_ai_drop.loader.download_dataset')
     def test_invalid_questions(self, mock_download_dataset):
         invalid_questions = [
@@ -645,6 +664,93 @@ class TestAllenAIDropDatasetLoader(TestCase):
                 len(invalid_questions)
         )
 
+    @patch('data_mine.nlp.allen_ai_drop.loader.download_dataset')
+    def test_columns_and_where(self, mock_download_dataset):
+        with open(self.file_path, "wt") as g:
+            g.write(VALID_QUESTIONS)
+            g.flush()
+
+        df = dm.ALLEN_AI_DROP(DROPType.DEV)
+        numbers = dm.ALLEN_AI_DROP(
+                DROPType.DEV, columns=["query_id", "parsed_answer"],
+                where={"answer_type": "number"}
+        )
+        expected = df[df["answer_type"] == "number"]
+        self.assertGreater(len(expected), 0)
+        self.assertLess(len(expected), len(df))
+        pd.testing.assert_frame_equal(
+                numbers,
+                expected[["query_id", "parsed_answer"]].reset_index(drop=True)
+        )
+        passages, questions = dm.ALLEN_AI_DROP(
+                DROPType.DEV, normalized=True,
+                columns=["passage", "question"],
+                where={"answer_type": ["date", "spans"]}
+        )
+        self.assertListEqual(list(questions.columns), ["passage_idx", "question"])  # noqa: E501
+        self.assertEqual(len(questions), len(df) - len(expected))
+        with self.assertRaises(AssertionError):
+            dm.ALLEN_AI_DROP(DROPType.DEV, normalized=True, columns=["question"])  # noqa: E501
+        self.assertEqual(mock_download_dataset.call_count, 3)
+
+    @patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True)
+    @patch('data_mine.nlp.allen_ai_drop.loader.download_dataset')
+    def test_get_drop_by_ids(self, mock_download_dataset):
+        with open(self.file_path, "wt") as g:
+            g.write(VALID_QUESTIONS)
+            g.flush()
+
+        df = dm.ALLEN_AI_DROP(DROPType.DEV)
+        rows = [df.iloc[i] for i in reversed(range(0, len(df)))]
+        records = get_drop_by_ids(DROPType.DEV, [r["query_id"] for r in rows])  # noqa: E501
+        self.assertListEqual(records, [r.to_dict() for r in rows])
+        with self.assertRaises(KeyError):
+            get_drop_by_ids(DROPType.DEV, ["missing"])
+        self.assertEqual(mock_download_dataset.call_count, 3)
+
+    @patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True)
+    @patch('data_mine.nlp.allen_ai_drop.loader.download_dataset')
+    def test_shards(self, mock_download_dataset):
+        with open(self.file_path, "wt") as g:
+            g.write(VALID_QUESTIONS)
+            g.flush()
+
+        df = dm.ALLEN_AI_DROP(DROPType.DEV)
+        first = dm.ALLEN_AI_DROP(DROPType.DEV, shard_index=0, num_shards=2)
+        second = dm.ALLEN_AI_DROP(DROPType.DEV, shard_index=1, num_shards=2)
+        # One subject (with all its questions) per shard.
+        self.assertSetEqual(set(first["passage"]), {"Passage 1"})
+        self.assertSetEqual(set(second["passage"]), {"Passage 2"})
+        pd.testing.assert_frame_equal(
+                pd.concat([first, second], ignore_index=True), df
+        )
+        passages, questions = dm.ALLEN_AI_DROP(
+                DROPType.DEV, normalized=True, shard_index=1, num_shards=2
+        )
+        self.assertListEqual(list(passages["passage"]), ["Passage 2"])
+        self.assertEqual(len(questions), len(second))
+        self.assertEqual(len(dm.ALLEN_AI_DROP(DROPType.DEV, shard_index=0, num_shards=3)), 0)  # noqa: E501
+
+    @patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True)
+    @patch('data_mine.nlp.allen_ai_drop.loader.download_dataset')
+    def test_shards_only_decode_their_subjects(self, mock_download_dataset):
+        with open(self.file_path, "wt") as g:
+            g.write(VALID_QUESTIONS)
+            g.flush()
+
+        df = dm.ALLEN_AI_DROP(DROPType.DEV)
+        with patch('data_mine.nlp.allen_ai_drop.loader.json_load') as mock_load:  # noqa: E501
+            first = dm.ALLEN_AI_DROP(DROPType.DEV, shard_index=0, num_shards=2)  # noqa: E501
+            # The index of the subjects is built once.
+            with patch('data_mine.nlp.allen_ai_drop.loader.iter_json_object') as mock_iter:  # noqa: E501
+                second = dm.ALLEN_AI_DROP(DROPType.DEV, shard_index=1, num_shards=2)  # noqa: E501
+                mock_iter.assert_not_called()
+            mock_load.assert_not_called()  # The file is never decoded at once.
+        self.assertSetEqual(set(first["passage"]), {"Passage 1"})
+        pd.testing.assert_frame_equal(
+                pd.concat([first, second], ignore_index=True), df
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
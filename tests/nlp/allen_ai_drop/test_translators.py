@@ -1,11 +1,20 @@
 import json
+import os
 import pandas as pd
 import random
+import sys
 import unittest
 
+from data_mine import Collection
 from data_mine.nlp.allen_ai_drop import DROP2MC
 from data_mine.nlp.allen_ai_drop.translators import hash_as_int32
+from data_mine.zookeeper.split_cache import split_cache_dir
 from faker import Faker
+from pyfakefs.fake_filesystem_unittest import TestCase
+if sys.version_info >= (3, 3):
+    from unittest.mock import patch
+else:
+    from mock import patch
 
 MOCK_QUESTIONS_DF = pd.DataFrame([
     {
@@ -563,6 +572,75 @@ class TestAllenAIDropTranslators(unittest.TestCase):
             df = DROP2MC(MOCK_QUESTIONS_DF)
             pd.testing.assert_frame_equal(df, expected_df)
 
+    def test_drop_2_multiple_choice_depends_only_on_the_row(self):
+        expected_df = DROP2MC(MOCK_QUESTIONS_DF).set_index("query_id")
+        shuffled_df = MOCK_QUESTIONS_DF.sample(frac=1.0, random_state=13)
+        for df in [shuffled_df, MOCK_QUESTIONS_DF.iloc[::3]]:
+            df = DROP2MC(df).set_index("query_id")
+            pd.testing.assert_frame_equal(df, expected_df.loc[df.index])
+
+    def test_drop_2_multiple_choice_with_multiple_workers(self):
+        expected_df = DROP2MC(MOCK_QUESTIONS_DF)
+        for num_workers in [2, 3, 64]:
+            df = DROP2MC(MOCK_QUESTIONS_DF, num_workers=num_workers)
+            pd.testing.assert_frame_equal(df, expected_df)
+        with self.assertRaises(AssertionError):
+            DROP2MC(MOCK_QUESTIONS_DF, num_workers=0)
+
+    def test_drop_2_multiple_choice_for_empty_dataframe(self):
+        self.assertEqual(len(DROP2MC(MOCK_QUESTIONS_DF.iloc[:0])), 0)
+        self.assertEqual(len(DROP2MC(MOCK_QUESTIONS_DF.iloc[:1])), 0)  # Spans.
+
+
+class TestDROP2MCCache(TestCase):
+
+    def setUp(self):
+        self.expected_df = DROP2MC(MOCK_QUESTIONS_DF)  # Before faking the fs.
+        self.setUpPyfakefs()
+
+    def cached_files(self):
+        cache_dir = split_cache_dir(Collection.ALLEN_AI_DROP)
+        if not os.path.isdir(cache_dir):
+            return []
+        return sorted(os.listdir(cache_dir))
+
+    def test_cache_hit(self):
+        df = DROP2MC(MOCK_QUESTIONS_DF, use_cache=True)
+        pd.testing.assert_frame_equal(df, self.expected_df)
+        self.assertEqual(len(self.cached_files()), 1)
+        with patch('data_mine.nlp.allen_ai_drop.translators.translate_rows') as mock_translate:  # noqa: E501
+            df = DROP2MC(MOCK_QUESTIONS_DF, use_cache=True)
+            df_parallel = DROP2MC(MOCK_QUESTIONS_DF, num_workers=2, use_cache=True)  # noqa: E501
+            mock_translate.assert_not_called()
+        pd.testing.assert_frame_equal(df, self.expected_df)
+        pd.testing.assert_frame_equal(df_parallel, self.expected_df)
+
+    def test_cache_is_not_used_by_default(self):
+        DROP2MC(MOCK_QUESTIONS_DF)
+        self.assertEqual(self.cached_files(), [])
+
+    def test_cache_miss_on_changed_input(self):
+        DROP2MC(MOCK_QUESTIONS_DF, use_cache=True)
+        changed_df = MOCK_QUESTIONS_DF.copy()
+        changed_df.loc[1, "parsed_answer"] = "-5"
+        df = DROP2MC(changed_df, use_cache=True)
+        self.assertEqual(len(self.cached_files()), 2)
+        pd.testing.assert_frame_equal(df, DROP2MC(changed_df))
+        self.assertNotEqual(df.loc[0, "answers"], self.expected_df.loc[0, "answers"])  # noqa: E501
+
+    def test_cache_miss_on_version_bump(self):
+        DROP2MC(MOCK_QUESTIONS_DF, use_cache=True)
+        old_files = self.cached_files()
+        self.assertTrue(old_files[0].startswith("DROP2MC.v"))
+        with patch('data_mine.nlp.allen_ai_drop.translators.DROP2MC_VERSION', 1000):  # noqa: E501
+            with patch('data_mine.nlp.allen_ai_drop.translators.translate_rows', return_value=[]) as mock_translate:  # noqa: E501
+                df = DROP2MC(MOCK_QUESTIONS_DF, use_cache=True)
+                mock_translate.assert_called_once()
+            self.assertEqual(len(df), 0)
+            new_files = self.cached_files()
+        self.assertEqual(len(new_files), 1)  # The old version is removed.
+        self.assertTrue(new_files[0].startswith("DROP2MC.v1000."))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,140 @@
+import math
+import numpy as np
+import os
+import sys
+import unittest
+
+from collections import Counter
+from data_mine.nlp.allen_ai_obqa import BM25Index, OBQAFactsBM25
+from data_mine.nlp.allen_ai_obqa.bm25 import minimal_stem, tokenize
+from pyfakefs.fake_filesystem_unittest import TestCase
+if sys.version_info >= (3, 3):
+    from unittest.mock import patch
+else:
+    from mock import patch
+
+DOCUMENTS = [
+    "wind causes erosion",
+    "wind is a renewable resource",
+    "erosion is when the soil is moved by wind or water",
+    "plants' leaves absorb sunlight",
+    "the sun is a source of energy",
+    "water is a renewable resource",
+    "a plant needs water and sunlight to grow",
+    "the the the"
+]
+
+
+def bm25_score(query, documents, k1=1.2, b=0.75):
+    # Straightforward (slow) BM25 for checking the index.
+    docs = [tokenize(document) for document in documents]
+    avg_len = float(sum(map(len, docs))) / len(docs)
+    df = Counter(term for doc in docs for term in set(doc))
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in tokenize(query):
+            tf = doc.count(term)
+            if tf > 0:
+                idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))  # noqa: E501
+                score += idf * tf / (tf + k1 * (1 - b + b * len(doc) / avg_len))  # noqa: E501
+        scores.append(score)
+    return scores
+
+
+class TestBM25(TestCase):
+
+    def setUp(self):
+        self.setUpPyfakefs()
+
+    def test_tokenize(self):
+        self.assertListEqual(
+                tokenize("The plants' leaves ABSORB the Sun's energies!"),
+                ["plant", "leave", "absorb", "sun", "energy"]
+        )
+        self.assertListEqual(tokenize("it is a test"), ["test"])
+        self.assertListEqual(tokenize(""), [])
+        for word, stem in [("gas", "ga"), ("bus", "bus"), ("glass", "glass"),
+                           ("queries", "query"), ("toys", "toy"),
+                           ("shoes", "shoes"), ("is", "is"), ("wind", "wind")]:
+            self.assertEqual(minimal_stem(word), stem)
+
+    def test_scores(self):
+        index = BM25Index.build(DOCUMENTS)
+        self.assertEqual(len(index), len(DOCUMENTS))
+        queries = [
+            "renewable wind",
+            "wind wind erosion",
+            "what do plants need?",
+            "unknown words only",
+            ""
+        ]
+        scores = index.scores(queries)
+        self.assertEqual(scores.shape, (len(queries), len(DOCUMENTS)))
+        for query, row in zip(queries, scores):
+            np.testing.assert_allclose(row, bm25_score(query, DOCUMENTS), rtol=1e-5)  # noqa: E501
+        self.assertEqual(index.scores([]).shape, (0, len(DOCUMENTS)))
+
+    def test_search(self):
+        index = BM25Index.build(DOCUMENTS)
+        queries = ["renewable resource", "sunlight", "nothing matches"]
+        for batch_size in [1, 2, 1024]:
+            indices, scores = index.search(queries, k=3, batch_size=batch_size)  # noqa: E501
+            self.assertEqual(indices.shape, (3, 3))
+            # Equal scores are ordered by position.
+            self.assertListEqual(indices[0].tolist(), [1, 5, -1])
+            self.assertAlmostEqual(scores[0][0], scores[0][1], places=5)
+            self.assertEqual(scores[0][2], 0)
+            self.assertListEqual(indices[1].tolist(), [3, 6, -1])
+            self.assertGreater(scores[1][0], scores[1][1])
+            self.assertListEqual(indices[2].tolist(), [-1, -1, -1])
+            self.assertListEqual(scores[2].tolist(), [0, 0, 0])
+
+    def test_search_matches_brute_force(self):
+        rng = np.random.RandomState(13)
+        words = ["word{}".format(i) for i in range(0, 40)]
+        documents = [" ".join(rng.choice(words, size=rng.randint(1, 12))) for _ in range(0, 200)]  # noqa: E501
+        queries = [" ".join(rng.choice(words, size=rng.randint(1, 6))) for _ in range(0, 50)]  # noqa: E501
+        index = BM25Index.build(documents, k1=1.5, b=0.5)
+        for k in [1, 7, 200, 500]:
+            indices, scores = index.search(queries, k=k, batch_size=16)
+            self.assertEqual(indices.shape, (len(queries), k))
+            for query, row, row_scores in zip(queries, indices, scores):
+                expected = bm25_score(query, documents, k1=1.5, b=0.5)
+                order = sorted(range(0, len(documents)), key=lambda d: (-expected[d], d))  # noqa: E501
+                order = [d for d in order[:k] if expected[d] > 0]
+                np.testing.assert_allclose(row_scores[:len(order)], [expected[d] for d in order], rtol=1e-5)  # noqa: E501
+                self.assertTrue((row[len(order):] == -1).all())
+
+    def test_save_and_load(self):
+        index = BM25Index.build(DOCUMENTS)
+        os.makedirs("/indexes")
+        index.save("/indexes/facts")
+        self.assertTrue(os.path.isfile("/indexes/facts.npz"))
+        loaded = BM25Index.load("/indexes/facts.npz")
+        self.assertListEqual(loaded.documents.tolist(), DOCUMENTS)
+        queries = ["renewable wind", "plants and leaves"]
+        for a, b in zip(index.search(queries, k=4), loaded.search(queries, k=4)):  # noqa: E501
+            np.testing.assert_array_equal(a, b)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(AssertionError):
+            BM25Index.build([])
+        with self.assertRaises(AssertionError):
+            BM25Index.build(DOCUMENTS, b=2)
+        index = BM25Index.build(DOCUMENTS)
+        with self.assertRaises(AssertionError):
+            index.search(["wind"], k=0)
+
+    @patch('data_mine.nlp.allen_ai_obqa.bm25.OBQAFacts')
+    def test_obqa_facts_bm25(self, mock_facts):
+        mock_facts.return_value = iter(DOCUMENTS + DOCUMENTS[:2])
+        index = OBQAFactsBM25()
+        self.assertListEqual(index.documents.tolist(), sorted(DOCUMENTS))
+        indices, _ = index.search(["soil"], k=1)
+        self.assertEqual(index.documents[indices[0][0]], DOCUMENTS[2])
+        mock_facts.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import itertools
+import random
+import unittest
+
+from data_mine.nlp.allen_ai_obqa.context import pack_context, pack_contexts
+from data_mine.nlp.allen_ai_obqa.context import token_lengths, unique
+from six.moves import zip_longest
+
+
+def reference_merge(facts1, facts2, num_tokens):
+    # The original implementation from scripts/.../retrieval/merge.py.
+    facts = facts1[:5] + facts2[:5]
+    facts1 = facts1[5:]
+    facts2 = facts2[5:]
+    rem_facts = itertools.chain(*zip_longest(facts1, facts2))
+    rem_facts = list(filter(lambda x: x is not None, rem_facts))
+    num_total_tokens = sum([num_tokens(fact) for fact in facts])
+    for fact in rem_facts:
+        if num_total_tokens >= 512:
+            break
+        facts.append(fact)
+        num_total_tokens += num_tokens(fact)
+    unique_facts = []
+    for fact in facts:
+        if fact not in unique_facts:
+            unique_facts.append(fact)
+    return " . ".join(unique_facts)
+
+
+def random_facts(rng, num_facts):
+    words = ["wind", "causes", "erosion", "plants", "need", "water", "sun"]
+    facts = [" ".join(rng.choice(words) for _ in range(0, rng.randint(1, 40))) for _ in range(0, num_facts)]  # noqa: E501
+    return unique(facts)
+
+
+class CountingTokenizer(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return text.split()
+
+
+class TestContext(unittest.TestCase):
+
+    def test_unique(self):
+        self.assertListEqual(unique(["b", "a", "b", "c", "a"]), ["b", "a", "c"])  # noqa: E501
+        self.assertListEqual(unique([]), [])
+
+    def test_token_lengths(self):
+        tokenize = CountingTokenizer()
+        lengths = token_lengths(["a b", "c", "a b", "d e f", "c"], tokenize)
+        self.assertDictEqual(lengths, {"a b": 2, "c": 1, "d e f": 3})
+        self.assertEqual(tokenize.calls, 3)  # Once per distinct fact.
+        self.assertDictEqual(token_lengths(["a b", "c", "a b"], str.split, num_workers=2), {"a b": 2, "c": 1})  # noqa: E501
+        self.assertDictEqual(token_lengths([], str.split), {})
+
+    def test_pack_context(self):
+        facts1 = ["f1", "f2", "f3 a", "f4"]
+        facts2 = ["g1", "f2", "g3"]
+        lengths = token_lengths(facts1 + facts2, str.split)
+        self.assertEqual(
+                pack_context(facts1, facts2, lengths, num_head=1),
+                "f1 . g1 . f2 . f3 a . g3 . f4"
+        )
+        # Head facts are always kept, even over the limit.
+        self.assertEqual(
+                pack_context(facts1, facts2, lengths, max_tokens=1, num_head=1),  # noqa: E501
+                "f1 . g1"
+        )
+        # Duplicates count until removed, the last fact may exceed the limit.
+        self.assertEqual(
+                pack_context(facts1, facts2, lengths, max_tokens=5, num_head=1),  # noqa: E501
+                "f1 . g1 . f2 . f3 a"
+        )
+
+    def test_matches_reference(self):
+        rng = random.Random(13)
+        facts = random_facts(rng, 300)
+        fact_lists = []
+        for _ in range(0, 50):
+            facts1 = rng.sample(facts, rng.randint(0, 75))
+            facts2 = rng.sample(facts, 75)
+            fact_lists.append((facts1, facts2))
+        expected = [
+            reference_merge(facts1, facts2, lambda fact: len(fact.split()))
+            for facts1, facts2 in fact_lists
+        ]
+        self.assertListEqual(pack_contexts(fact_lists, str.split), expected)
+        for num_workers in [2, 3]:
+            contexts = pack_contexts(fact_lists, str.split, num_workers=num_workers)  # noqa: E501
+            self.assertListEqual(contexts, expected)
+
+    def test_tokenizes_each_fact_once(self):
+        rng = random.Random(7)
+        facts = random_facts(rng, 100)
+        fact_lists = [(rng.sample(facts, 20), rng.sample(facts, 20)) for _ in range(0, 30)]  # noqa: E501
+        tokenize = CountingTokenizer()
+        contexts = pack_contexts(fact_lists, tokenize)
+        self.assertEqual(len(contexts), 30)
+        self.assertEqual(tokenize.calls, len(unique(itertools.chain(*[a + b for a, b in fact_lists]))))  # noqa: E501
+        self.assertListEqual(pack_contexts([], tokenize, num_workers=2), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
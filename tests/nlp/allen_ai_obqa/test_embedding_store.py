@@ -0,0 +1,119 @@
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_mine.nlp.allen_ai_obqa import EmbeddingStore
+
+SENTENCES = [
+    "wind causes erosion",
+    "the sun is a source of energy",
+    "a plant needs water",
+    "What causes erosion?",
+    "What do plants need? water"
+]
+
+EMBEDDINGS = [
+    [1.0, 0.0, 0.0],
+    [0.0, 2.0, 0.0],
+    [0.0, 0.0, 3.0],
+    [0.9, 0.1, 0.0],
+    [0.1, 0.0, 0.5]
+]
+
+
+class FakeAnnoyIndex(object):
+    # Exact search with Annoy's interface (angular distances).
+
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors)
+        self.calls = 0
+
+    def get_nns_by_vector(self, vector, n, include_distances=False):
+        self.calls += 1
+        cosine = np.dot(self.vectors, vector) / np.linalg.norm(vector)
+        items = sorted(range(0, len(cosine)), key=lambda i: -cosine[i])[:n]
+        return items, np.sqrt(2 * (1 - cosine[items])).tolist()
+
+
+class TestEmbeddingStore(unittest.TestCase):
+
+    def setUp(self):
+        # Memory-mapping requires real files (not pyfakefs).
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, "embeddings")
+
+    def test_create_and_load(self):
+        store = EmbeddingStore.create(self.path, SENTENCES, EMBEDDINGS)
+        self.assertTrue(os.path.isfile(self.path + ".npy"))
+        self.assertTrue(os.path.isfile(self.path + ".sentences.json"))
+        for mmap in [True, False]:
+            store = EmbeddingStore.load(self.path, mmap=mmap)
+            self.assertEqual(isinstance(store.matrix, np.memmap), mmap)
+            self.assertEqual(store.matrix.dtype, np.float32)
+            self.assertEqual(len(store), 5)
+            self.assertEqual(store.dim, 3)
+            self.assertIn("a plant needs water", store)
+            self.assertNotIn("a plant", store)
+            np.testing.assert_allclose(np.linalg.norm(store.matrix, axis=1), 1.0, rtol=1e-6)  # noqa: E501
+            self.assertListEqual(store.rows(SENTENCES[::-1]).tolist(), [4, 3, 2, 1, 0])  # noqa: E501
+            np.testing.assert_allclose(store.vectors(["the sun is a source of energy"]), [[0, 1, 0]])  # noqa: E501
+            with self.assertRaises(KeyError):
+                store.vectors(["missing"])
+
+    def test_load_missing_store(self):
+        with self.assertRaises(RuntimeError):
+            EmbeddingStore.load(self.path)
+
+    def test_invalid_store(self):
+        with self.assertRaises(AssertionError):
+            EmbeddingStore.create(self.path, SENTENCES[:2], EMBEDDINGS)
+        with self.assertRaises(AssertionError):
+            EmbeddingStore.create(self.path, ["a", "a"], EMBEDDINGS[:2])
+
+    def test_exact_search(self):
+        store = EmbeddingStore.create(self.path, SENTENCES, EMBEDDINGS)
+        facts = SENTENCES[:3]
+        for batch_size in [1, 2, 1024]:
+            indices, similarities = store.search(
+                    store.vectors(SENTENCES[3:]), k=2,
+                    candidates=facts, batch_size=batch_size
+            )
+            self.assertListEqual(indices.tolist(), [[0, 1], [2, 0]])
+            self.assertAlmostEqual(similarities[0][0], 0.9 / np.sqrt(0.82), places=5)  # noqa: E501
+            self.assertAlmostEqual(similarities[0][1], 0.1 / np.sqrt(0.82), places=5)  # noqa: E501
+        # Not normalized queries and no candidates (all the sentences).
+        indices, similarities = store.search([2.0, 0.0, 0.0], k=10)
+        self.assertListEqual(indices[0].tolist(), [0, 3, 4, 1, 2, -1, -1, -1, -1, -1])  # noqa: E501
+        self.assertAlmostEqual(similarities[0][0], 1.0, places=5)
+        self.assertListEqual(similarities[0][5:].tolist(), [0] * 5)
+
+    def test_search_matches_brute_force(self):
+        rng = np.random.RandomState(13)
+        sentences = ["sentence {}".format(i) for i in range(0, 300)]
+        store = EmbeddingStore.create(self.path, sentences, rng.randn(300, 16))  # noqa: E501
+        queries = rng.randn(40, 16)
+        candidates = sentences[100:]
+        indices, similarities = store.search(queries, k=7, candidates=candidates, batch_size=16)  # noqa: E501
+        matrix = store.vectors(candidates)
+        for query, row, row_similarities in zip(queries, indices, similarities):  # noqa: E501
+            cosine = np.dot(matrix, query) / np.linalg.norm(query)
+            self.assertListEqual(row.tolist(), np.argsort(-cosine)[:7].tolist())  # noqa: E501
+            np.testing.assert_allclose(row_similarities, cosine[row], rtol=1e-4)  # noqa: E501
+
+    def test_approximate_search(self):
+        store = EmbeddingStore.create(self.path, SENTENCES, EMBEDDINGS)
+        facts = SENTENCES[:3]
+        ann_index = FakeAnnoyIndex(store.vectors(facts))
+        queries = store.vectors(SENTENCES[3:])
+        indices, similarities = store.search(queries, k=2, candidates=facts, ann_index=ann_index)  # noqa: E501
+        self.assertEqual(ann_index.calls, 2)
+        expected = store.search(queries, k=2, candidates=facts)
+        np.testing.assert_array_equal(indices, expected[0])
+        np.testing.assert_allclose(similarities, expected[1], rtol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
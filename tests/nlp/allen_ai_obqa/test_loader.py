@@ -7,7 +7,8 @@ import sys
 import unittest
 
 from data_mine import Collection
-from data_mine.nlp.allen_ai_obqa import OBQAFacts, OBQAType
+from data_mine.nlp.allen_ai_obqa import OBQAFacts, OBQAType, iter_obqa
+from data_mine.nlp.allen_ai_obqa.retrieved_facts import RetrievedFactsIndex
 from data_mine.nlp.allen_ai_obqa.utils import type_to_data_file
 from data_mine.utils import datamine_cache_dir
 from pyfakefs.fake_filesystem_unittest import TestCase
@@ -171,6 +172,9 @@ class TestOBQADatasetLoader(TestCase):
 
     def setUp(self):
         self.setUpPyfakefs()
+        patcher = patch.dict('data_mine.nlp.allen_ai_obqa.retrieved_facts._LOADED_INDEXES', clear=True)  # noqa: E501
+        self.addCleanup(patcher.stop)
+        patcher.start()
 
         dataset_dir = os.path.join(
                 datamine_cache_dir(),
@@ -373,6 +377,53 @@ class TestOBQADatasetLoader(TestCase):
         pd.testing.assert_frame_equal(df, expected_df)
         mock_download_dataset.assert_called_once_with(Collection.ALLEN_AI_OBQA, ANY)  # noqa: E501
 
+    @patch('data_mine.nlp.allen_ai_obqa.loader.RETRIEVED_FACTS_CHUNK_SIZE', 1)  # noqa: E501
+    @patch('data_mine.nlp.allen_ai_obqa.loader.download_dataset')
+    def test_facts_index_is_opened_once(self, mock_download_dataset):
+        facts_file = os.path.join(datamine_cache_dir(), "ALLEN_AI_OBQA", "extracted_facts.json")  # noqa: E501
+        with open(facts_file, "wt") as g:
+            json.dump(RETRIEVED_FACTS, g)
+        self.write_questions(OBQAType.TRAIN, [
+                GOOD_QUESTION1, GOOD_QUESTION2
+        ])
+        expected = dm.ALLEN_AI_OBQA(OBQAType.TRAIN, with_retrieved_facts=True)  # noqa: E501
+        original_init = RetrievedFactsIndex.__init__
+        with patch.object(RetrievedFactsIndex, '__init__', autospec=True, side_effect=original_init) as mock_init:  # noqa: E501
+            records = list(iter_obqa(OBQAType.TRAIN, with_retrieved_facts=True))  # noqa: E501
+            mock_init.assert_not_called()  # Opened by the first call.
+        self.assertListEqual(records, expected.to_dict("records"))
+
+    @patch('data_mine.nlp.allen_ai_obqa.loader.download_dataset')
+    def test_columns_and_where(self, mock_download_dataset):
+        self.write_questions(OBQAType.TRAIN, [
+                GOOD_QUESTION1, GOOD_QUESTION2, GOOD_QUESTION3
+        ])
+        # The retrieved facts are not needed (no lookups).
+        df = dm.ALLEN_AI_OBQA(
+                OBQAType.TRAIN, with_retrieved_facts=True,
+                columns=["id", "correct"], where={"correct": ["A", "D"]}
+        )
+        self.assertListEqual(df.values.tolist(), [["7-980", "D"], ["609", "A"]])  # noqa: E501
+
+        # Only the facts of the selected questions are read.
+        question = GOOD_QUESTION2["question"]["stem"]
+        facts_file = os.path.join(datamine_cache_dir(), "ALLEN_AI_OBQA", "extracted_facts.json")  # noqa: E501
+        with open(facts_file, "wt") as g:
+            json.dump({
+                query: facts for query, facts in RETRIEVED_FACTS.items()
+                if query.startswith(question)
+            }, g)
+        df = dm.ALLEN_AI_OBQA(
+                OBQAType.TRAIN, with_retrieved_facts=True,
+                columns=["retrieved_facts", "id"], where={"id": "1158"}
+        )
+        self.assertListEqual(list(df.columns), ["retrieved_facts", "id"])
+        self.assertListEqual(list(df["id"]), ["1158"])
+        self.assertEqual(len(df["retrieved_facts"][0]), 4)
+        with self.assertRaises(AssertionError):
+            dm.ALLEN_AI_OBQA(OBQAType.TRAIN, columns=["retrieved_facts"])
+        self.assertEqual(mock_download_dataset.call_count, 2)
+
 
 class TestOBQAFactsLoader(TestCase):
 
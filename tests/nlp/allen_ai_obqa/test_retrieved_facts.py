@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+import unittest
+
+from data_mine.nlp.allen_ai_obqa.retrieved_facts import RetrievedFactsIndex
+from data_mine.nlp.allen_ai_obqa.retrieved_facts import load_retrieved_facts_index  # noqa: E501
+from data_mine.nlp.allen_ai_obqa.retrieved_facts import retrieved_facts_index_dir  # noqa: E501
+from pyfakefs.fake_filesystem_unittest import TestCase
+if sys.version_info >= (3, 3):
+    from unittest.mock import patch
+else:
+    from mock import patch
+
+RETRIEVED_FACTS = {
+    "Question 1? answer A": {
+        "context": "fact 1 . fact 2",
+        "token_based": ["fact 1", "fact 2"],
+        "vector_based": ["fact 2", "fact 3"]
+    },
+    "Question 1? answer B": {
+        "context": "fact 3",
+        "token_based": [],
+        "vector_based": ["fact 3", u"fact \u00e9 4"]
+    },
+    "Question 2? answer A": {
+        "context": "fact 1",
+        "token_based": ["fact 1"],
+        "vector_based": ["fact 1"]
+    }
+}
+
+
+class TestRetrievedFacts(TestCase):
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        patcher = patch.dict('data_mine.nlp.allen_ai_obqa.retrieved_facts._LOADED_INDEXES', clear=True)  # noqa: E501
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        self.facts_file = "/data/extracted_facts.json"
+        self.write_facts(RETRIEVED_FACTS)
+
+    def write_facts(self, retrieved_facts):
+        if not os.path.isdir("/data"):
+            os.makedirs("/data")
+        with open(self.facts_file, "wt") as g:
+            json.dump(retrieved_facts, g)
+
+    def test_lookup(self):
+        index = load_retrieved_facts_index(self.facts_file)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(len(index.facts), 4)  # Each fact is stored once.
+        queries = ["Question 2? answer A", "Question 1? answer B", "Question 2? answer A"]  # noqa: E501
+        self.assertListEqual(
+                index.lookup(queries),
+                [RETRIEVED_FACTS[query] for query in queries]
+        )
+        self.assertListEqual(index.lookup([]), [])
+        with self.assertRaises(KeyError):
+            index.lookup(["Question 1? answer A", "Question 3? answer A"])
+
+    def test_index_is_built_once(self):
+        load_retrieved_facts_index(self.facts_file)
+        with patch.object(RetrievedFactsIndex, 'build') as mock_build:
+            index = load_retrieved_facts_index(self.facts_file)
+            mock_build.assert_not_called()
+        self.assertEqual(index.lookup(["Question 2? answer A"])[0]["context"], "fact 1")  # noqa: E501
+
+    def test_index_is_opened_once(self):
+        index = load_retrieved_facts_index(self.facts_file)
+        with patch.object(RetrievedFactsIndex, '__init__') as mock_init:
+            self.assertIs(load_retrieved_facts_index(self.facts_file), index)  # noqa: E501
+            mock_init.assert_not_called()
+
+    def test_index_is_rebuilt_for_new_facts_file(self):
+        old_dir = retrieved_facts_index_dir(self.facts_file)
+        load_retrieved_facts_index(self.facts_file)
+        self.assertTrue(os.path.isdir(old_dir))
+        os.remove(self.facts_file)
+        self.write_facts({"New query": RETRIEVED_FACTS["Question 2? answer A"]})  # noqa: E501
+        new_dir = retrieved_facts_index_dir(self.facts_file)
+        self.assertNotEqual(old_dir, new_dir)
+        index = load_retrieved_facts_index(self.facts_file)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.lookup(["New query"])[0]["token_based"], ["fact 1"])  # noqa: E501
+        self.assertFalse(os.path.isdir(old_dir))  # Stale index removed.
+        self.assertListEqual(os.listdir(os.path.dirname(new_dir)), [os.path.basename(new_dir)])  # noqa: E501
+
+    @patch('data_mine.nlp.allen_ai_obqa.retrieved_facts.query_hash', return_value=7)  # noqa: E501
+    def test_hash_collisions(self, mock_hash):
+        index = load_retrieved_facts_index(self.facts_file)
+        for query, expected in RETRIEVED_FACTS.items():
+            self.assertListEqual(index.lookup([query]), [expected])
+        with self.assertRaises(KeyError):
+            index.lookup(["Question 3? answer A"])
+
+    def test_missing_facts_file(self):
+        os.remove(self.facts_file)
+        with self.assertRaises(AssertionError):
+            load_retrieved_facts_index(self.facts_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -143,6 +143,29 @@ class TestCosmosQADatasetLoader(TestCase):
         pd.testing.assert_frame_equal(df, expected_df)
         mock_download.assert_called_once_with(Collection.COSMOS_QA, ANY)
 
+    @patch('data_mine.nlp.cosmos_qa.loader.download_dataset')
+    def test_normalized(self, mock_download):
+        same_context_question = dict(DEV_QUESTION, id="dev_question_2")
+        self.write_questions(CosmosQAType.DEV, [
+            DEV_QUESTION, TRAIN_QUESTION, same_context_question
+        ])
+        df = dm.COSMOS_QA(CosmosQAType.DEV)
+        contexts, questions = dm.COSMOS_QA(CosmosQAType.DEV, normalized=True)
+        self.assertListEqual(
+                list(contexts["context"]),
+                [DEV_QUESTION["context"], TRAIN_QUESTION["context"]]
+        )
+        self.assertListEqual(
+                list(questions.columns),
+                ["id", "question", "passage_idx", "answers", "correct"]
+        )
+        self.assertListEqual(list(questions["passage_idx"]), [0, 1, 0])
+        pd.testing.assert_frame_equal(
+                questions.drop(columns=["passage_idx"]),
+                df.drop(columns=["context"])
+        )
+        self.assertEqual(mock_download.call_count, 2)
+
     @patch('data_mine.nlp.cosmos_qa.loader.download_dataset')
     def test_invalid_correct_answer(self, mock_download):
         self.write_questions(CosmosQAType.TRAIN, [
@@ -7,7 +7,9 @@ import unittest
 
 from copy import deepcopy
 from data_mine import Collection
-from data_mine.nlp.hotpot_qa import HotpotQAType
+from data_mine.nlp.hotpot_qa import HotpotQAType, get_hotpot_qa_by_ids
+from data_mine.nlp.hotpot_qa import iter_hotpot_qa
+from data_mine.nlp.hotpot_qa.loader import parse_entry
 from data_mine.nlp.hotpot_qa.utils import type_to_data_file
 from data_mine.utils import datamine_cache_dir
 from pyfakefs.fake_filesystem_unittest import TestCase
@@ -418,6 +420,113 @@ class TestHotpotQADatasetLoader(TestCase):
             dm.HOTPOT_QA(HotpotQAType.TRAIN)
         mock_download_dataset.assert_called_once_with(Collection.HOTPOT_QA, ANY)  # noqa: E501
 
+    @patch('data_mine.nlp.hotpot_qa.loader.download_dataset')
+    def test_iter_hotpot_qa(self, mock_download_dataset):
+        similar_question = deepcopy(TRAIN_QUESTION)
+        similar_question["_id"] = "aaaabbbbccccdddd!2"
+        self.write_questions(HotpotQAType.TRAIN, [
+            TRAIN_QUESTION, similar_question
+        ])
+        records = iter_hotpot_qa(HotpotQAType.TRAIN)
+        mock_download_dataset.assert_called_once_with(Collection.HOTPOT_QA, ANY)  # noqa: E501
+        first = next(records)
+        self.assertEqual(first["id"], "5a899013554299515336131a")
+        self.assertListEqual(first["gold_paragraphs"], [
+            "Sent good 3.",
+            "Sent good 1.  Sent good 2."
+        ])
+        records = [first] + list(records)
+        self.assertEqual(len(records), 2)
+        pd.testing.assert_frame_equal(
+                pd.DataFrame(records),
+                dm.HOTPOT_QA(HotpotQAType.TRAIN)
+        )
+
+    @patch('data_mine.nlp.hotpot_qa.loader.download_dataset')
+    def test_iter_hotpot_qa_validates_records(self, mock_download_dataset):
+        self.write_questions(HotpotQAType.TEST_FULLWIKI, [
+            TEST_FULLWIKI_QUESTION, TRAIN_QUESTION
+        ])
+        records = iter_hotpot_qa(HotpotQAType.TEST_FULLWIKI)
+        self.assertEqual(next(records)["id"], "5ab5072e5542990594ba9cda")
+        with self.assertRaises(AssertionError):
+            next(records)
+        mock_download_dataset.assert_called_once_with(Collection.HOTPOT_QA, ANY)  # noqa: E501
+
+    @patch('data_mine.nlp.hotpot_qa.loader.download_dataset')
+    def test_columns_and_where(self, mock_download_dataset):
+        hard_question = deepcopy(TRAIN_QUESTION)
+        hard_question["_id"] = "aaaabbbbccccdddd!2"
+        hard_question["level"] = "hard"
+        self.write_questions(HotpotQAType.TRAIN, [
+            TRAIN_QUESTION, hard_question
+        ])
+        df = dm.HOTPOT_QA(
+                HotpotQAType.TRAIN, columns=["question", "answer"],
+                where={"question_level": "hard"}
+        )
+        self.assertListEqual(list(df.columns), ["question", "answer"])
+        self.assertListEqual(df.values.tolist(), [["Some question", "Dallas"]])  # noqa: E501
+        df = dm.HOTPOT_QA(HotpotQAType.TRAIN, where={"question_level": "easy"})  # noqa: E501
+        self.assertEqual(len(df), 0)
+        self.assertEqual(len(df.columns), 8)
+        records = list(iter_hotpot_qa(
+                HotpotQAType.TRAIN, columns=["id"],
+                where=lambda record: record["question_level"] != "hard"
+        ))
+        self.assertListEqual(records, [{"id": "5a899013554299515336131a"}])
+        with self.assertRaises(AssertionError):
+            dm.HOTPOT_QA(HotpotQAType.TRAIN, columns=["title"])
+
+    @patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True)
+    @patch('data_mine.nlp.hotpot_qa.loader.download_dataset')
+    def test_shards(self, mock_download_dataset):
+        questions = []
+        for i in range(0, 5):
+            question = deepcopy(TRAIN_QUESTION)
+            question["_id"] = "q{}".format(i)
+            questions.append(question)
+        self.write_questions(HotpotQAType.TRAIN, questions)
+        df = dm.HOTPOT_QA(HotpotQAType.TRAIN)
+        shards = [
+            dm.HOTPOT_QA(HotpotQAType.TRAIN, shard_index=i, num_shards=2)
+            for i in range(0, 2)
+        ]
+        self.assertListEqual(list(shards[0]["id"]), ["q0", "q1"])
+        pd.testing.assert_frame_equal(pd.concat(shards, ignore_index=True), df)  # noqa: E501
+        records = list(iter_hotpot_qa(HotpotQAType.TRAIN, columns=["id"], seed=1))  # noqa: E501
+        self.assertListEqual(sorted(r["id"] for r in records), list(df["id"]))  # noqa: E501
+        self.assertNotEqual([r["id"] for r in records], list(df["id"]))
+        with self.assertRaises(AssertionError):
+            dm.HOTPOT_QA(HotpotQAType.TRAIN, use_cache=True, seed=1)
+
+    def test_parse_entry_without_gold_paragraphs(self):
+        record = parse_entry(deepcopy(TRAIN_QUESTION), HotpotQAType.TRAIN, False)  # noqa: E501
+        self.assertIsNone(record["gold_paragraphs"])
+        self.assertEqual(record["question_level"], "medium")
+        invalid_question = deepcopy(TRAIN_QUESTION)
+        invalid_question["supporting_facts"] = [["Limitless (EP)", 0]]
+        with self.assertRaises(AssertionError):
+            parse_entry(invalid_question, HotpotQAType.TRAIN, False)
+
+    @patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True)
+    @patch('data_mine.nlp.hotpot_qa.loader.download_dataset')
+    def test_get_hotpot_qa_by_ids(self, mock_download_dataset):
+        similar_question = deepcopy(TRAIN_QUESTION)
+        similar_question["_id"] = "aaaabbbbccccdddd!2"
+        similar_question["question"] = u"Another question \u2713"
+        self.write_questions(HotpotQAType.TRAIN, [
+            TRAIN_QUESTION, similar_question
+        ])
+        records = list(iter_hotpot_qa(HotpotQAType.TRAIN))
+        ids = [records[1]["id"], records[0]["id"], records[1]["id"]]
+        self.assertListEqual(
+                get_hotpot_qa_by_ids(HotpotQAType.TRAIN, ids),
+                [records[1], records[0], records[1]]
+        )
+        with self.assertRaises(KeyError):
+            get_hotpot_qa_by_ids(HotpotQAType.TRAIN, ["missing"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+PACKAGES = [
+    "data_mine",
+    "data_mine.cli",
+    "data_mine.utils",
+    "data_mine.zookeeper",
+    "data_mine.nlp.allen_ai_arc",
+    "data_mine.nlp.allen_ai_drop",
+    "data_mine.nlp.allen_ai_obqa",
+    "data_mine.nlp.cosmos_qa",
+    "data_mine.nlp.CSQA",
+    "data_mine.nlp.hotpot_qa",
+    "data_mine.nlp.RACE",
+    "data_mine.nlp.trivia_qa"
+]
+
+# Dependencies that should only be imported when they are first used.
+HEAVY_MODULES = [
+    "jsonschema", "more_itertools", "numpy", "pandas", "patoolib",
+    "pyhash", "requests", "tqdm", "unidecode", "urllib3"
+]
+
+
+class TestImportTime(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def run_python(self, code):
+        env = dict(os.environ)
+        env["DATAMINE_CACHE_DIR"] = self.cache_dir
+        output = subprocess.check_output(
+                [sys.executable, "-c", code],
+                env=env, stderr=subprocess.STDOUT
+        )
+        return output.decode("utf-8")
+
+    def test_no_heavy_imports(self):
+        code = "\n".join(
+            ["import sys"] +
+            ["import {}".format(package) for package in PACKAGES] +
+            ["print(' '.join(sorted(sys.modules)))"]
+        )
+        modules = set(self.run_python(code).split())
+        for package in PACKAGES:
+            self.assertIn(package, modules)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+
+    def test_no_cache_dir_at_import(self):
+        code = "\n".join(["import {}".format(p) for p in PACKAGES])
+        self.run_python(code)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
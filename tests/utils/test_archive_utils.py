@@ -1,14 +1,20 @@
+import gzip
+import io
 import json
 import os
+import patoolib
 import random
 import shutil
 import six
 import sys
+import tarfile
 import unittest
+import zipfile
 import numpy as np
 
 from PIL import Image
 from data_mine.utils import extract_archive, is_archive
+from data_mine.utils.archive_utils import native_archive_format
 from faker import Faker
 from pyfakefs.fake_filesystem_unittest import TestCase
 try:
@@ -74,6 +80,10 @@ class TestArchiveUtils(TestCase):
             g.write(self.fake.zip(num_files=21, min_file_size=1024))
             g.flush()
 
+    def create_gzip(self):  # A single compressed file.
+        with gzip.open("/facts.json.gz", "wb") as g:
+            g.write(b'{"fact": "The sun is a star."}')
+
     #####################################################################
     #                         Non-archive formats                       #
     #####################################################################
@@ -188,6 +198,74 @@ class TestArchiveUtils(TestCase):
         extract_archive("/arch.zip", self.OUTDIR)
         self.assertEqual(self.num_extracted_files(), 21)
 
+    def test_native_archive_format(self):
+        self.create_tar()
+        self.create_tar_bzip2()
+        self.create_tar_gzip()
+        self.create_zip()
+        self.create_gzip()
+        self.create_json()
+        self.assertEqual(native_archive_format("/arch.tar"), "tar")
+        self.assertEqual(native_archive_format("/arch.tar.bz2"), "tar")
+        self.assertEqual(native_archive_format("/arch.tar.gz"), "tar")
+        self.assertEqual(native_archive_format("/arch.zip"), "zip")
+        self.assertEqual(native_archive_format("/facts.json.gz"), "gzip")
+        self.assertIsNone(native_archive_format("/file.json"))
+
+    def test_extract_archive_for_gzip(self):
+        self.create_gzip()
+        self.assertTrue(is_archive("/facts.json.gz"))
+        extract_archive("/facts.json.gz", self.OUTDIR)
+        self.assertEqual(self.num_extracted_files(), 1)
+        with open(os.path.join(self.OUTDIR, "facts.json"), "rb") as f:
+            self.assertEqual(f.read(), b'{"fact": "The sun is a star."}')
+
+    def test_extract_zip_in_parallel(self):
+        files = {}
+        with zipfile.ZipFile("/arch.zip", "w", zipfile.ZIP_DEFLATED) as g:
+            for i in range(0, 50):
+                name = "dir{}/sub/file{}.txt".format(i % 4, i)
+                files[name] = self.fake.text().encode() * (i + 1)
+                g.writestr(name, files[name])
+        for num_workers in [1, 3, 8, 100]:
+            extract_archive("/arch.zip", self.OUTDIR, num_workers=num_workers)  # noqa: E501
+            self.assertEqual(self.num_extracted_files(), 50)
+            for name, contents in files.items():
+                with open(os.path.join(self.OUTDIR, name), "rb") as f:
+                    self.assertEqual(f.read(), contents)
+            shutil.rmtree(self.OUTDIR)
+
+        os.makedirs(self.OUTDIR, mode=0o755)  # Removed by `tearDown`.
+
+    def test_extract_verified_archive(self):
+        self.create_tar_gzip()
+        with patch('data_mine.utils.archive_utils.is_archive') as mock_is_archive:  # noqa: E501
+            extract_archive("/arch.tar.gz", self.OUTDIR, verified=True)
+        mock_is_archive.assert_not_called()
+        self.assertEqual(self.num_extracted_files(), 15)
+
+    @unittest.skipIf(six.PY2, "Skipping due to tarfile issue in pyfakefs.")
+    def test_extract_tar_with_unsafe_path(self):
+        with tarfile.open("/unsafe.tar.gz", "w:gz") as g:
+            data = b"Outside of the output directory."
+            info = tarfile.TarInfo("../../escaped.txt")
+            info.size = len(data)
+            g.addfile(info, io.BytesIO(data))
+        with self.assertRaises(Exception):
+            extract_archive("/unsafe.tar.gz", self.OUTDIR)
+        self.assertFalse(os.path.isfile("/escaped.txt"))
+
+    @patch.object(patoolib, 'extract_archive')
+    def test_patool_fallback(self, mock_patool_extract):
+        self.create_zip()
+        with patch('data_mine.utils.archive_utils.native_archive_format') as mock_format:  # noqa: E501
+            mock_format.return_value = None
+            extract_archive("/arch.zip", self.OUTDIR)
+        mock_patool_extract.assert_called_once_with(
+                "/arch.zip", verbosity=-1, outdir=self.OUTDIR,
+                interactive=False
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import unittest
+
+from data_mine.utils import batch_records, prefetch, shuffle_records
+
+
+class TestShuffleRecords(unittest.TestCase):
+
+    def test_shuffle_records(self):
+        records = list(range(0, 100))
+        shuffled = list(shuffle_records(iter(records), 10, seed=3))
+        self.assertNotEqual(shuffled, records)
+        self.assertListEqual(sorted(shuffled), records)
+        self.assertListEqual(list(shuffle_records(records, 10, seed=3)), shuffled)  # noqa: E501
+        self.assertNotEqual(list(shuffle_records(records, 10, seed=4)), shuffled)  # noqa: E501
+        # A record is yielded at most `buffer_size` positions too early.
+        for position, record in enumerate(shuffled):
+            self.assertLessEqual(record, position + 10)
+
+    def test_small_inputs(self):
+        self.assertListEqual(list(shuffle_records([], 10)), [])
+        self.assertListEqual(sorted(shuffle_records([2, 1, 3], 10)), [1, 2, 3])  # noqa: E501
+        self.assertListEqual(list(shuffle_records([2, 1, 3], 1)), [2, 1, 3])
+        with self.assertRaises(AssertionError):
+            list(shuffle_records([1], 0))
+
+
+class TestBatchRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [{"id": i, "question": "q{}".format(i)} for i in range(0, 5)]  # noqa: E501
+
+    def test_batch_records(self):
+        batches = list(batch_records(self.records, 2))
+        self.assertListEqual(batches, [
+            {"id": [0, 1], "question": ["q0", "q1"]},
+            {"id": [2, 3], "question": ["q2", "q3"]},
+            {"id": [4], "question": ["q4"]}
+        ])
+        self.assertListEqual([list(b) for b in batches], [["id", "question"]] * 3)  # noqa: E501
+        self.assertEqual(len(list(batch_records(self.records, 2, drop_last=True))), 2)  # noqa: E501
+        self.assertEqual(len(list(batch_records(self.records, 5))), 1)
+        self.assertListEqual(list(batch_records([], 2)), [])
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def test_items_in_order(self):
+        for size in [1, 2, 100]:
+            self.assertListEqual(list(prefetch(iter(range(0, 50)), size)), list(range(0, 50)))  # noqa: E501
+        self.assertListEqual(list(prefetch([])), [])
+
+    def test_runs_ahead(self):
+        produced = []
+        second_produced = threading.Event()
+
+        def items():
+            for i in range(0, 10):
+                produced.append(i)
+                if i == 1:
+                    second_produced.set()
+                yield i
+
+        prefetched = prefetch(items(), 1)
+        self.assertEqual(next(prefetched), 0)
+        # The next item is produced while the consumer works on this one.
+        self.assertTrue(second_produced.wait(5))
+        self.assertLessEqual(len(produced), 3)
+        prefetched.close()
+
+    def test_errors_are_raised_by_the_consumer(self):
+        def items():
+            yield 1
+            yield 2
+            raise ValueError("Bad record")
+
+        prefetched = prefetch(items(), 1)
+        self.assertEqual(next(prefetched), 1)
+        self.assertEqual(next(prefetched), 2)
+        with self.assertRaises(ValueError):
+            next(prefetched)
+
+    def test_base_exceptions_are_raised_by_the_consumer(self):
+        def items():
+            yield 1
+            raise SystemExit("Stopped by the worker")
+
+        prefetched = prefetch(items(), 1)
+        self.assertEqual(next(prefetched), 1)
+        with self.assertRaises(SystemExit):
+            next(prefetched)
+
+    def test_early_stop(self):
+        def items():
+            i = 0
+            while True:  # Never ends.
+                yield i
+                i += 1
+
+        prefetched = prefetch(items(), 2)
+        self.assertListEqual([next(prefetched) for _ in range(0, 3)], [0, 1, 2])  # noqa: E501
+        prefetched.close()
+        threads = [t for t in threading.enumerate() if t.daemon]
+        for thread in threads:
+            thread.join(5)
+        self.assertFalse(any(t.is_alive() for t in threads))
+
+
+if __name__ == '__main__':
+    unittest.main()
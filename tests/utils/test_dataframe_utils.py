@@ -0,0 +1,139 @@
+import pandas as pd
+import pickle
+import unittest
+
+from data_mine.utils import RecordSelector, normalize_column
+
+
+class TestNormalizeColumn(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame([
+            {"id": "q1", "passage": "P1", "answers": ["a", "b"]},
+            {"id": "q2", "passage": "P2", "answers": ["c", "d"]},
+            {"id": "q3", "passage": "P1", "answers": ["e", "f"]},
+            {"id": "q4", "passage": "P3", "answers": ["g", "h"]},
+            {"id": "q5", "passage": "P2", "answers": ["i", "j"]},
+        ])
+
+    def test_normalize_column(self):
+        passages, questions = normalize_column(self.df, "passage", "pidx")
+        self.assertListEqual(list(passages.columns), ["passage"])
+        self.assertListEqual(list(passages["passage"]), ["P1", "P2", "P3"])
+        self.assertListEqual(list(questions.columns), ["id", "pidx", "answers"])  # noqa: E501
+        self.assertListEqual(list(questions["pidx"]), [0, 1, 0, 2, 1])
+        self.assertListEqual(list(questions["id"]), list(self.df["id"]))
+        self.assertListEqual(list(questions["answers"]), list(self.df["answers"]))  # noqa: E501
+
+        # The original DataFrame can be recovered.
+        restored = questions.copy()
+        restored["passage"] = passages["passage"].values[restored["pidx"]]
+        restored = restored.drop(columns=["pidx"])[list(self.df.columns)]
+        pd.testing.assert_frame_equal(restored, self.df, check_dtype=False)
+
+        # The input is not modified.
+        self.assertIn("passage", self.df.columns)
+        self.assertNotIn("pidx", self.df.columns)
+
+    def test_serialized_size_drops(self):
+        passages = ["x" * 10000 + str(i) for i in range(0, 10)]
+        # Equal strings are copied (as when parsed from disk) so that
+        # pickle cannot deduplicate them by object identity.
+        df = pd.DataFrame([
+            {"id": str(i), "passage": "".join(list(passages[i % 10]))}
+            for i in range(0, 200)
+        ])
+        normalized = normalize_column(df, "passage", "passage_idx")
+        self.assertLess(
+                len(pickle.dumps(normalized)) * 10,
+                len(pickle.dumps(df))
+        )
+
+    def test_empty_dataframe(self):
+        passages, questions = normalize_column(pd.DataFrame([]), "passage", "pidx")  # noqa: E501
+        self.assertEqual(len(passages), 0)
+        self.assertEqual(len(questions), 0)
+        self.assertListEqual(list(passages.columns), ["passage"])
+        self.assertListEqual(list(questions.columns), ["pidx"])
+
+    def test_invalid_columns(self):
+        with self.assertRaises(AssertionError):
+            normalize_column(self.df, "missing", "pidx")
+        with self.assertRaises(AssertionError):
+            normalize_column(self.df, "passage", "id")
+
+
+class TestRecordSelector(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = ["id", "level", "context"]
+        self.records = [
+            {"id": "q1", "level": "hard", "context": ["a", "b"]},
+            {"id": "q2", "level": "easy", "context": ["c"]},
+            {"id": "q3", "level": "medium", "context": []},
+            {"id": "q4", "level": "hard", "context": ["d"]}
+        ]
+
+    def select_all(self, selector):
+        records = [selector.select(record) for record in self.records]
+        return [record for record in records if record is not None]
+
+    def test_default_keeps_everything(self):
+        selector = RecordSelector(self.columns)
+        self.assertListEqual(self.select_all(selector), self.records)
+        self.assertListEqual(selector.columns, self.columns)
+        for column in self.columns:
+            self.assertTrue(selector.needs(column))
+
+    def test_columns(self):
+        selector = RecordSelector(self.columns, columns=["level", "id"])
+        self.assertListEqual(self.select_all(selector), [
+            {"level": "hard", "id": "q1"},
+            {"level": "easy", "id": "q2"},
+            {"level": "medium", "id": "q3"},
+            {"level": "hard", "id": "q4"}
+        ])
+        self.assertFalse(selector.needs("context"))
+        df = selector.frame(self.select_all(selector))
+        self.assertListEqual(list(df.columns), ["level", "id"])
+        self.assertListEqual(list(selector.frame([]).columns), ["level", "id"])  # noqa: E501
+
+    def test_where(self):
+        selector = RecordSelector(self.columns, ["id"], {"level": "hard"})
+        self.assertListEqual(self.select_all(selector), [{"id": "q1"}, {"id": "q4"}])  # noqa: E501
+        self.assertTrue(selector.needs("level"))
+        self.assertFalse(selector.needs("context"))
+        selector = RecordSelector(self.columns, ["id"], {"level": ["easy", "medium"]})  # noqa: E501
+        self.assertListEqual(self.select_all(selector), [{"id": "q2"}, {"id": "q3"}])  # noqa: E501
+        selector = RecordSelector(self.columns, ["id"], {"level": "hard", "id": "q4"})  # noqa: E501
+        self.assertListEqual(self.select_all(selector), [{"id": "q4"}])
+        selector = RecordSelector(self.columns, ["id"], lambda r: len(r["context"]) == 1)  # noqa: E501
+        self.assertListEqual(self.select_all(selector), [{"id": "q2"}, {"id": "q4"}])  # noqa: E501
+        self.assertTrue(selector.needs("context"))
+
+    def test_apply(self):
+        df = pd.DataFrame(self.records)
+        selector = RecordSelector(self.columns, ["context", "id"], {"level": "hard"})  # noqa: E501
+        pd.testing.assert_frame_equal(
+                selector.apply(df),
+                selector.frame(self.select_all(selector))
+        )
+        selector = RecordSelector(self.columns, where={"level": "unknown"})
+        self.assertEqual(len(selector.apply(df)), 0)
+        self.assertListEqual(list(selector.apply(df).columns), self.columns)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(AssertionError):
+            RecordSelector(self.columns, columns=["unknown"])
+        with self.assertRaises(AssertionError):
+            RecordSelector(self.columns, columns="id")
+        with self.assertRaises(AssertionError):
+            RecordSelector(self.columns, columns=["id", "id"])
+        with self.assertRaises(AssertionError):
+            RecordSelector(self.columns, where={"unknown": 1})
+        with self.assertRaises(AssertionError):
+            RecordSelector(self.columns, where="level == 'hard'")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+import io
+import json
+import os
+import random
+import sys
+import unittest
+
+from data_mine.utils import get_json_loads, json_backend, json_load, json_loads
+from data_mine.utils import iter_json_array, iter_json_object, read_json_range
+from faker import Faker
+from pyfakefs.fake_filesystem_unittest import TestCase
+
+if sys.version_info >= (3, 3):
+    from unittest.mock import patch
+else:
+    from mock import patch
+
+
+class TestIterJsonArray(TestCase):
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self.fake = Faker()
+
+    def write(self, contents):
+        with open("/data.json", "wt") as g:
+            g.write(contents)
+            g.flush()
+
+    def parse(self, chunk_size):
+        return list(iter_json_array("/data.json", chunk_size=chunk_size))
+
+    def test_empty_array(self):
+        for contents in ["[]", "  [ \n ] \n", "[\n\n]"]:
+            self.write(contents)
+            for chunk_size in [1, 2, 1024]:
+                self.assertEqual(self.parse(chunk_size), [])
+
+    def test_same_result_as_json_load(self):
+        data = []
+        for _ in range(0, 50):
+            data.append({
+                "id": self.fake.pystr(min_chars=5, max_chars=10),
+                "text": self.fake.text(),
+                "numbers": [random.randint(-1000, 1000) for _ in range(5)],
+                "nested": [[self.fake.name(), [self.fake.sentence()]]],
+                "missing": None,
+                "flag": random.choice([True, False]),
+                "score": random.random()
+            })
+        for indent in [None, 4]:
+            self.write(json.dumps(data, indent=indent))
+            for chunk_size in [1, 7, 64, 1024 * 1024]:
+                self.assertEqual(self.parse(chunk_size), data)
+
+    def test_scalars_split_across_chunks(self):
+        self.write('[12345, 6.5e3, true, null, "str", false, -1]')
+        for chunk_size in range(1, 12):
+            self.assertEqual(
+                    self.parse(chunk_size),
+                    [12345, 6.5e3, True, None, "str", False, -1]
+            )
+
+    def test_unicode(self):
+        data = [{"text": u"Université de Montréal"}, u"✓"]
+        self.write(json.dumps(data, ensure_ascii=False))
+        self.assertEqual(self.parse(3), data)
+
+    def test_elements_are_lazily_decoded(self):
+        self.write('[{"a": 1}, {"b": 2}, this is not JSON')
+        elements = iter_json_array("/data.json", chunk_size=4)
+        self.assertEqual(next(elements), {"a": 1})
+        self.assertEqual(next(elements), {"b": 2})
+        with self.assertRaises(ValueError):
+            next(elements)
+
+    def test_invalid_contents(self):
+        invalid = [
+                "",
+                "{}",
+                '{"a": [1, 2]}',
+                "[1, 2",
+                "[1, 2,",
+                "[1 2]",
+                "[1, 2]]",
+                "[1, 2] [3]",
+                "[1, {]",
+        ]
+        for contents in invalid:
+            self.write(contents)
+            for chunk_size in [1, 3, 1024]:
+                with self.assertRaises(ValueError):
+                    self.parse(chunk_size)
+
+    def test_offsets(self):
+        data = [{"text": u"Universit\u00e9 de Montr\u00e9al"}, 12, u"\u2713", [1, [2]]]  # noqa: E501
+        for indent in [None, 4]:
+            contents = json.dumps(data, indent=indent, ensure_ascii=False)
+            with open("/data.json", "wb") as g:
+                g.write(contents.replace("\n", "\r\n").encode("utf-8"))
+            for chunk_size in [1, 5, 1024]:
+                elements = list(iter_json_array("/data.json", chunk_size, with_offsets=True))  # noqa: E501
+                self.assertEqual([value for value, _, _ in elements], data)
+                with open("/data.json", "rb") as f:
+                    for value, start, end in elements:
+                        self.assertEqual(read_json_range(f, start, end), value)  # noqa: E501
+
+
+class TestIterJsonObject(TestCase):
+
+    def setUp(self):
+        self.setUpPyfakefs()
+
+    def write(self, contents):
+        with open("/data.json", "wt") as g:
+            g.write(contents)
+            g.flush()
+
+    def test_same_result_as_json_load(self):
+        data = {
+            "b": {"passage": u"P\u00e9", "qa_pairs": [{"id": 1}, {"id": 2}]},
+            "a": [1, 2.5, None],
+            u"\u2713": "x",
+            "c": 7
+        }
+        for indent in [None, 4]:
+            self.write(json.dumps(data, indent=indent))
+            for chunk_size in [1, 3, 1024]:
+                items = list(iter_json_object("/data.json", chunk_size))
+                self.assertEqual([key for key, _ in items], list(data.keys()))  # noqa: E501
+                self.assertEqual(dict(items), data)
+                items = iter_json_object("/data.json", chunk_size, with_offsets=True)  # noqa: E501
+                with open("/data.json", "rb") as f:
+                    for key, value, start, end in items:
+                        self.assertEqual(read_json_range(f, start, end), data[key])  # noqa: E501
+        self.write("{ }")
+        self.assertEqual(list(iter_json_object("/data.json")), [])
+
+    def test_invalid_contents(self):
+        invalid = [
+                "",
+                "[]",
+                '{"a" 1}',
+                '{"a": 1,}',
+                '{"a": 1 "b": 2}',
+                '{1: 2}',
+                '{"a": 1',
+                '{"a": 1}}',
+        ]
+        for contents in invalid:
+            self.write(contents)
+            for chunk_size in [1, 3, 1024]:
+                with self.assertRaises(ValueError):
+                    list(iter_json_object("/data.json", chunk_size))
+
+
+@patch.dict('data_mine.utils.json_utils._JSON_LOADS', clear=True)
+class TestJsonBackend(unittest.TestCase):
+
+    @patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "json"})
+    def test_stdlib_backend(self):
+        self.assertEqual(json_backend(), "json")
+        self.assertDictEqual(json_loads('{"a": [1, 2.5, null]}'), {"a": [1, 2.5, None]})  # noqa: E501
+        self.assertDictEqual(json_loads(u'{"\u00e9": "\u0103"}'.encode("utf-8")), {u"\u00e9": u"\u0103"})  # noqa: E501
+        with self.assertRaises(ValueError):
+            json_loads(b'{"a": ')
+
+    @patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "orjson"})
+    def test_orjson_backend(self):
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            self.skipTest("orjson is not installed")
+        self.assertEqual(json_backend(), "orjson")
+        document = {"id": "x", "choices": [{"label": "A", "text": u"\u00e9t\u00e9"}]}  # noqa: E501
+        encoded = json.dumps(document)
+        self.assertDictEqual(json_loads(encoded), document)
+        self.assertDictEqual(json_loads(encoded.encode("utf-8")), document)
+        self.assertDictEqual(json_load(io.BytesIO(encoded.encode("utf-8"))), document)  # noqa: E501
+        with self.assertRaises(ValueError):
+            json_loads(b'{"a": ')
+
+    @patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "ujson"})
+    def test_missing_backend(self):
+        try:
+            import ujson  # noqa: F401
+            self.skipTest("ujson is installed")
+        except ImportError:
+            pass
+        with self.assertRaises(ImportError):
+            get_json_loads()
+
+    @patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "simplejson"})
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            get_json_loads()
+
+    def test_auto_backend(self):
+        def only_stdlib(name):
+            if name != "json":
+                raise ImportError("No module named {}".format(name))
+            return json.loads
+
+        with patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "auto"}):
+            with patch('data_mine.utils.json_utils.load_json_backend', side_effect=only_stdlib):  # noqa: E501
+                self.assertEqual(json_backend(), "json")
+                self.assertIs(get_json_loads(), json.loads)
+        with patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": ""}):
+            # Memoized: the previous selection is reused.
+            self.assertEqual(json_backend(), "json")
+
+    def test_selection_follows_the_environment(self):
+        with patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "json"}):
+            self.assertEqual(json_backend(), "json")
+        with patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "simplejson"}):
+            with self.assertRaises(ValueError):
+                json_backend()
+        with patch.dict(os.environ, {"DATAMINE_JSON_BACKEND": "json"}):
+            self.assertEqual(json_backend(), "json")
+
+
+if __name__ == '__main__':
+    unittest.main()
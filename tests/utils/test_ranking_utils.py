@@ -0,0 +1,46 @@
+import numpy as np
+import unittest
+
+from data_mine.utils import top_k
+from data_mine.utils.ranking_utils import top_k_columns
+
+
+class TestRankingUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.scores = np.array([
+            [1, 3, 3, 2, 3],
+            [0, 0, 0, 0, 0],
+            [5, 4, 3, 2, 1]
+        ])
+
+    def test_top_k_columns(self):
+        self.assertListEqual(top_k_columns(self.scores, 2).tolist(), [[1, 2], [0, 1], [0, 1]])  # noqa: E501
+        self.assertListEqual(top_k_columns(self.scores, 4).tolist(), [[1, 2, 3, 4], [0, 1, 2, 3], [0, 1, 2, 3]])  # noqa: E501
+        self.assertEqual(top_k_columns(self.scores, 5).shape, (3, 5))
+        with self.assertRaises(AssertionError):
+            top_k_columns(self.scores, 6)
+        with self.assertRaises(AssertionError):
+            top_k_columns(self.scores, 0)
+
+    def test_top_k(self):
+        columns, values = top_k(self.scores, 3)
+        self.assertListEqual(columns.tolist(), [[1, 2, 4], [0, 1, 2], [0, 1, 2]])  # noqa: E501
+        self.assertListEqual(values.tolist(), [[3, 3, 3], [0, 0, 0], [5, 4, 3]])  # noqa: E501
+        columns, values = top_k(self.scores, 5)
+        self.assertListEqual(columns[0].tolist(), [1, 2, 4, 3, 0])
+        self.assertListEqual(values[2].tolist(), [5, 4, 3, 2, 1])
+
+    def test_matches_full_sort(self):
+        rng = np.random.RandomState(7)
+        scores = rng.randint(0, 10, size=(50, 40)).astype(np.float32)
+        for k in [1, 5, 39, 40]:
+            columns, values = top_k(scores, k)
+            for row, row_columns, row_values in zip(scores, columns, values):
+                expected = sorted(range(0, len(row)), key=lambda c: (-row[c], c))[:k]  # noqa: E501
+                self.assertListEqual(row_columns.tolist(), expected)
+                self.assertListEqual(row_values.tolist(), row[expected].tolist())  # noqa: E501
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,25 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import io
 import os
 import requests
 import responses
+import shutil
 import sys
+import tarfile
+import tempfile
+import threading
 import unittest
+import urllib3
 
+from data_mine.utils import download_and_extract_tar
 from data_mine.utils import download_file
 from data_mine.utils import download_file_if_missing
 from faker import Faker
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 from tempfile import mkstemp
+from tqdm import tqdm
 try:
     from StringIO import StringIO
 except ImportError:
@@ -146,6 +156,26 @@ class TestDownloadFileFn(unittest.TestCase):
             if temp_file_path:
                 os.remove(temp_file_path)
 
+    @responses.activate
+    def test_shared_progress_bar(self):
+        temp_fd, temp_file_path = mkstemp()
+        try:
+            data = b"Shared progress bar."
+            responses.add(responses.GET, FAKE_URL,
+                          body=data, status=200,
+                          headers={'content-length': str(len(data))},
+                          stream=True)
+            with patch('sys.stderr', new_callable=StringIO):
+                progress_bar = tqdm(total=10)
+                download_file(FAKE_URL, temp_file_path, progress_bar=progress_bar)  # noqa: E501
+                download_file(FAKE_URL, temp_file_path, progress_bar=progress_bar)  # noqa: E501
+                self.assertEqual(progress_bar.total, 10 + 2 * len(data))
+                self.assertEqual(progress_bar.n, 2 * len(data))
+                progress_bar.close()
+        finally:
+            os.close(temp_fd)
+            os.remove(temp_file_path)
+
 
 class TestDownloadFileIfMissingFn(unittest.TestCase):
 
@@ -271,5 +301,312 @@ class TestDownloadFileIfMissingFn(unittest.TestCase):
         os.remove(temp_file_path)
 
 
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    # Serves `server.data` and supports (open-ended) range requests. The
+    # first `server.drops` responses are cut after `server.drop_after` bytes.
+
+    def do_GET(self):
+        self.server.ranges.append(self.headers.get("Range"))
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"][len("bytes="):-len("-")])
+        body = self.server.data[start:]
+        self.send_response(206 if start > 0 else 200)
+        self.send_header("Content-Length", str(len(body)))
+        if start > 0:
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(
+                start, len(self.server.data) - 1, len(self.server.data)
+            ))
+        self.end_headers()
+        if self.server.drops > 0:
+            self.server.drops -= 1
+            body = body[:self.server.drop_after]
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestResumableDownloads(unittest.TestCase):
+
+    def setUp(self):
+        self.data = os.urandom(100000)
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+        self.temp_dir = tempfile.mkdtemp()
+        self.output_file_path = os.path.join(self.temp_dir, "data.bin")
+        self.part_file_path = self.output_file_path + ".part"
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        patcher = patch('data_mine.utils.requests_utils.time.sleep')
+        self.addCleanup(patcher.stop)
+        self.mock_sleep = patcher.start()
+        patcher = patch('sys.stderr', new_callable=StringIO)  # Progress bars.
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def start_server(self, drops=0, drop_after=0):
+        server = HTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+        server.data = self.data
+        server.drops = drops
+        server.drop_after = drop_after
+        server.ranges = []
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, "http://127.0.0.1:{}/data.bin".format(server.server_port)  # noqa: E501
+
+    def downloaded_data(self):
+        with open(self.output_file_path, "rb") as f:
+            return f.read()
+
+    def test_resumes_after_dropped_connections(self):
+        server, url = self.start_server(drops=2, drop_after=30000)
+        download_file(url, self.output_file_path, self.sha256)
+        self.assertEqual(self.downloaded_data(), self.data)
+        self.assertFalse(os.path.isfile(self.part_file_path))
+        self.assertListEqual(server.ranges, [None, "bytes=30000-", "bytes=60000-"])  # noqa: E501
+        self.assertListEqual(
+                [args[0][0] for args in self.mock_sleep.call_args_list],
+                [1.0, 2.0]
+        )
+
+    def test_gives_up_after_max_retries(self):
+        server, url = self.start_server(drops=3, drop_after=10)
+        with self.assertRaises(Exception):
+            download_file(url, self.output_file_path, self.sha256, max_retries=2)  # noqa: E501
+        self.assertEqual(len(server.ranges), 3)
+        self.assertFalse(os.path.isfile(self.output_file_path))
+
+        # The next call continues from the partial file.
+        download_file(url, self.output_file_path, self.sha256)
+        self.assertEqual(self.downloaded_data(), self.data)
+        self.assertEqual(server.ranges[-1], "bytes=30-")
+
+    def test_truncated_body_without_urllib3_checks(self):
+        # urllib3 1.x accepts a body shorter than its Content-Length.
+        ignored = property(lambda self: False, lambda self, value: None)
+        with patch.object(urllib3.response.HTTPResponse, "enforce_content_length", ignored, create=True):  # noqa: E501
+            server, url = self.start_server(drops=1, drop_after=40000)
+            download_file(url, self.output_file_path, self.sha256)
+        self.assertEqual(self.downloaded_data(), self.data)
+        self.assertListEqual(server.ranges, [None, "bytes=40000-"])
+        self.mock_sleep.assert_called_once_with(1.0)
+
+    def test_resumes_partial_file(self):
+        with open(self.part_file_path, "wb") as g:
+            g.write(self.data[:12345])
+        server, url = self.start_server()
+        download_file(url, self.output_file_path, self.sha256)
+        self.assertEqual(self.downloaded_data(), self.data)
+        self.assertListEqual(server.ranges, ["bytes=12345-"])
+
+    @responses.activate
+    def test_server_without_range_support(self):
+        with open(self.part_file_path, "wb") as g:
+            g.write(b"Some old data.")
+        responses.add(responses.GET, FAKE_URL,
+                      body=self.data, status=200,
+                      headers={'content-length': str(len(self.data))},
+                      stream=True)
+        download_file(FAKE_URL, self.output_file_path, self.sha256)
+        self.assertEqual(self.downloaded_data(), self.data)
+        self.assertEqual(responses.calls[0].request.headers["Range"], "bytes=14-")  # noqa: E501
+
+    @responses.activate
+    def test_range_not_satisfiable(self):
+        with open(self.part_file_path, "wb") as g:
+            g.write(self.data + b"Too much data.")
+        responses.add(responses.GET, FAKE_URL, status=416)
+        responses.add(responses.GET, FAKE_URL,
+                      body=self.data, status=200,
+                      headers={'content-length': str(len(self.data))},
+                      stream=True)
+        download_file(FAKE_URL, self.output_file_path, self.sha256)
+        self.assertEqual(self.downloaded_data(), self.data)
+        self.assertEqual(len(responses.calls), 2)
+        self.mock_sleep.assert_not_called()
+
+    def test_corrupted_partial_file_is_removed(self):
+        with open(self.part_file_path, "wb") as g:
+            g.write(b"Not a prefix of the data.")
+        server, url = self.start_server()
+        with self.assertRaises(RuntimeError):
+            download_file(url, self.output_file_path, self.sha256)
+        self.assertFalse(os.path.isfile(self.part_file_path))
+        self.assertFalse(os.path.isfile(self.output_file_path))
+
+        download_file(url, self.output_file_path, self.sha256)
+        self.assertEqual(self.downloaded_data(), self.data)
+
+    @responses.activate
+    def test_client_errors_are_not_retried(self):
+        responses.add(responses.GET, FAKE_URL, status=404)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            download_file(FAKE_URL, self.output_file_path)
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_server_errors_are_retried(self):
+        responses.add(responses.GET, FAKE_URL, status=503)
+        responses.add(responses.GET, FAKE_URL,
+                      body=self.data, status=200,
+                      headers={'content-length': str(len(self.data))},
+                      stream=True)
+        download_file(FAKE_URL, self.output_file_path, self.sha256)
+        self.assertEqual(self.downloaded_data(), self.data)
+        self.assertEqual(len(responses.calls), 2)
+        self.mock_sleep.assert_called_once_with(1.0)
+
+
+class TestDownloadAndExtractTar(unittest.TestCase):
+
+    def setUp(self):
+        self.members = {
+            "data/1.txt": b"First question.",
+            "data/inner/2.txt": b"Second question.",
+            "3.txt": os.urandom(50000)
+        }
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz") as g:
+            for name, contents in sorted(self.members.items()):
+                info = tarfile.TarInfo(name)
+                info.size = len(contents)
+                g.addfile(info, io.BytesIO(contents))
+        self.data = buf.getvalue()
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+        self.outdir = tempfile.mkdtemp()
+        self.archive_path = os.path.join(self.outdir, "archive.tar.gz")
+        self.addCleanup(shutil.rmtree, self.outdir)
+        patcher = patch('data_mine.utils.requests_utils.time.sleep')
+        self.addCleanup(patcher.stop)
+        self.mock_sleep = patcher.start()
+        patcher = patch('sys.stderr', new_callable=StringIO)  # Progress bars.
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def add_response(self):
+        responses.add(responses.GET, FAKE_URL,
+                      body=self.data, status=200,
+                      headers={'content-length': str(len(self.data))},
+                      stream=True)
+
+    def read(self, name):
+        with open(os.path.join(self.outdir, name), "rb") as f:
+            return f.read()
+
+    def assertExtracted(self):
+        for name, contents in self.members.items():
+            self.assertEqual(self.read(name), contents)
+
+    @responses.activate
+    def test_extract_and_keep_archive(self):
+        self.add_response()
+        download_and_extract_tar(FAKE_URL, self.outdir, self.sha256,
+                                 archive_path=self.archive_path)
+        self.assertExtracted()
+        self.assertEqual(self.read("archive.tar.gz"), self.data)
+        self.assertSetEqual(
+                set(os.listdir(self.outdir)),
+                {"data", "3.txt", "archive.tar.gz"}
+        )
+
+    @responses.activate
+    def test_extract_without_archive(self):
+        self.add_response()
+        download_and_extract_tar(FAKE_URL, self.outdir, self.sha256)
+        self.assertExtracted()
+        self.assertSetEqual(set(os.listdir(self.outdir)), {"data", "3.txt"})
+
+    @responses.activate
+    def test_rollback_on_wrong_checksum(self):
+        self.add_response()
+        with open(os.path.join(self.outdir, "3.txt"), "wb") as g:
+            g.write(b"Old data.")
+        with self.assertRaises(RuntimeError):
+            download_and_extract_tar(FAKE_URL, self.outdir, "a" * 64,
+                                     archive_path=self.archive_path)
+        self.assertListEqual(os.listdir(self.outdir), ["3.txt"])
+        self.assertEqual(self.read("3.txt"), b"Old data.")
+
+    def start_server(self, drops=0, drop_after=0):
+        server = HTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+        server.data = self.data
+        server.drops = drops
+        server.drop_after = drop_after
+        server.ranges = []
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, "http://127.0.0.1:{}/archive.tar.gz".format(server.server_port)  # noqa: E501
+
+    def test_resume_after_dropped_connection(self):
+        server, url = self.start_server(drops=1, drop_after=1000)
+        download_and_extract_tar(url, self.outdir, self.sha256,
+                                 archive_path=self.archive_path)
+        self.assertExtracted()
+        self.assertEqual(self.read("archive.tar.gz"), self.data)
+        self.assertListEqual(server.ranges, [None, "bytes=1000-"])
+        self.mock_sleep.assert_called_once_with(1.0)
+
+    def test_restart_without_archive(self):
+        server, url = self.start_server(drops=1, drop_after=1000)
+        download_and_extract_tar(url, self.outdir, self.sha256)
+        self.assertExtracted()
+        self.assertSetEqual(set(os.listdir(self.outdir)), {"data", "3.txt"})
+        self.assertListEqual(server.ranges, [None, None])
+
+    def test_resume_partial_archive(self):
+        with open(self.archive_path + ".part", "wb") as g:
+            g.write(self.data[:20000])
+        server, url = self.start_server()
+        download_and_extract_tar(url, self.outdir, self.sha256,
+                                 archive_path=self.archive_path)
+        self.assertExtracted()
+        self.assertEqual(self.read("archive.tar.gz"), self.data)
+        self.assertFalse(os.path.isfile(self.archive_path + ".part"))
+        self.assertListEqual(server.ranges, ["bytes=20000-"])
+
+    def test_truncated_body_without_urllib3_checks(self):
+        # urllib3 1.x accepts a body shorter than its Content-Length.
+        ignored = property(lambda self: False, lambda self, value: None)
+        with patch.object(urllib3.response.HTTPResponse, "enforce_content_length", ignored, create=True):  # noqa: E501
+            server, url = self.start_server(drops=1, drop_after=20000)
+            download_and_extract_tar(url, self.outdir, self.sha256,
+                                     archive_path=self.archive_path)
+        self.assertExtracted()
+        self.assertEqual(self.read("archive.tar.gz"), self.data)
+        self.assertListEqual(server.ranges, [None, "bytes=20000-"])
+
+    def test_corrupted_partial_archive_is_removed(self):
+        with open(self.archive_path + ".part", "wb") as g:
+            g.write(b"Not a prefix of the archive.")
+        server, url = self.start_server()
+        with self.assertRaises(Exception):
+            download_and_extract_tar(url, self.outdir, self.sha256,
+                                     archive_path=self.archive_path)
+        self.assertListEqual(os.listdir(self.outdir), [])
+
+        download_and_extract_tar(url, self.outdir, self.sha256,
+                                 archive_path=self.archive_path)
+        self.assertExtracted()
+        self.assertListEqual(server.ranges, ["bytes=28-", None])
+
+    @responses.activate
+    def test_merge_with_existing_files(self):
+        self.add_response()
+        os.makedirs(os.path.join(self.outdir, "data", "inner"))
+        with open(os.path.join(self.outdir, "data", "old.txt"), "wb") as g:
+            g.write(b"Kept.")
+        with open(os.path.join(self.outdir, "data", "1.txt"), "wb") as g:
+            g.write(b"Replaced.")
+        download_and_extract_tar(FAKE_URL, self.outdir, self.sha256)
+        self.assertExtracted()
+        self.assertEqual(self.read("data/old.txt"), b"Kept.")
+        self.assertSetEqual(set(os.listdir(self.outdir)), {"data", "3.txt"})
+
+
 if __name__ == '__main__':
     unittest.main()
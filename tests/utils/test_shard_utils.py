@@ -0,0 +1,83 @@
+import io
+import unittest
+
+from data_mine.utils import Shard, shard_lines
+
+
+class TestShard(unittest.TestCase):
+
+    def test_whole_split(self):
+        shard = Shard()
+        self.assertTrue(shard.is_whole_split)
+        self.assertListEqual(shard.positions(5), [0, 1, 2, 3, 4])
+        self.assertListEqual(shard.positions(0), [])
+        self.assertTrue(Shard(0, 1).is_whole_split)
+        self.assertFalse(Shard(0, 2).is_whole_split)
+        self.assertFalse(Shard(seed=7).is_whole_split)
+
+    def test_contiguous_ranges(self):
+        self.assertListEqual(Shard(0, 3).positions(10), [0, 1, 2])
+        self.assertListEqual(Shard(1, 3).positions(10), [3, 4, 5])
+        self.assertListEqual(Shard(2, 3).positions(10), [6, 7, 8, 9])
+        self.assertListEqual(Shard(3, 4).positions(2), [1])
+        self.assertListEqual(Shard(0, 4).positions(2), [])
+
+    def test_shards_partition_the_split(self):
+        for num_units in [0, 1, 7, 100]:
+            for num_shards in [1, 2, 3, 8]:
+                for seed in [None, 0, 42]:
+                    positions = [
+                        Shard(i, num_shards, seed).positions(num_units)
+                        for i in range(0, num_shards)
+                    ]
+                    sizes = [len(p) for p in positions]
+                    self.assertLessEqual(max(sizes) - min(sizes), 1)
+                    all_positions = sum(positions, [])
+                    self.assertEqual(len(all_positions), num_units)
+                    self.assertSetEqual(set(all_positions), set(range(0, num_units)))  # noqa: E501
+
+    def test_seed(self):
+        shuffled = Shard(seed=1).positions(50)
+        self.assertListEqual(Shard(seed=1).positions(50), shuffled)
+        self.assertNotEqual(shuffled, list(range(0, 50)))
+        self.assertNotEqual(Shard(seed=2).positions(50), shuffled)
+        self.assertListEqual(Shard(1, 2, seed=1).positions(50), shuffled[25:])  # noqa: E501
+
+    def test_invalid_arguments(self):
+        for args, kwargs in [
+            ((0, None), {}),
+            ((None, 2), {}),
+            ((2, 2), {}),
+            ((-1, 2), {}),
+            ((0, 0), {}),
+            ((0.0, 1), {}),
+            ((0, 1), {"seed": "1"})
+        ]:
+            with self.assertRaises(AssertionError):
+                Shard(*args, **kwargs)
+
+
+class TestShardLines(unittest.TestCase):
+
+    def test_shard_lines(self):
+        f = io.StringIO(u"".join(u"line {}\n".format(i) for i in range(0, 10)))  # noqa: E501
+        self.assertIs(shard_lines(f, Shard()), f)
+        self.assertListEqual(shard_lines(f, Shard(1, 3)), [
+            u"line 3\n", u"line 4\n", u"line 5\n"
+        ])
+        shard = Shard(0, 2, seed=3)
+        f.seek(0)
+        self.assertListEqual(
+                shard_lines(f, shard),
+                [u"line {}\n".format(i) for i in shard.positions(10)]
+        )
+        self.assertListEqual(shard_lines(io.StringIO(u""), Shard(0, 2)), [])
+
+    def test_lines_from_the_current_position(self):
+        f = io.StringIO(u"a\nb\nc\nd")
+        f.readline()
+        self.assertListEqual(shard_lines(f, Shard(1, 2)), [u"c\n", u"d"])
+
+
+if __name__ == '__main__':
+    unittest.main()
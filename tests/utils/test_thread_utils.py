@@ -0,0 +1,62 @@
+import threading
+import time
+import unittest
+
+from data_mine.utils import thread_map
+
+
+class TestThreadMapFn(unittest.TestCase):
+
+    def test_results_are_ordered(self):
+        def slow_square(x):
+            time.sleep(0.001 * (x % 3))
+            return x * x
+
+        for num_threads in [1, 2, 7, 100]:
+            self.assertListEqual(
+                    thread_map(slow_square, range(0, 50), num_threads),
+                    [x * x for x in range(0, 50)]
+            )
+        self.assertListEqual(thread_map(slow_square, [], 4), [])
+
+    def test_items_run_concurrently(self):
+        started = [threading.Event(), threading.Event()]
+
+        def wait_for_the_other(index):
+            started[index].set()
+            return started[1 - index].wait(5)
+
+        self.assertListEqual(thread_map(wait_for_the_other, [0, 1], 2), [True, True])  # noqa: E501
+
+    def test_at_most_num_threads_are_used(self):
+        thread_ids = set()
+        lock = threading.Lock()
+
+        def record_thread(x):
+            with lock:
+                thread_ids.add(threading.current_thread().ident)
+            time.sleep(0.001)
+            return x
+
+        thread_map(record_thread, range(0, 20), 3)
+        self.assertLessEqual(len(thread_ids), 3)
+
+    def test_exception_is_propagated(self):
+        calls = []
+
+        def fail_on_first(x):
+            calls.append(x)
+            if x == 0:
+                raise ValueError("First item.")
+            return x
+
+        with self.assertRaises(ValueError):
+            thread_map(fail_on_first, range(0, 100), 1)
+        self.assertListEqual(calls, [0])  # The other items are not started.
+
+        with self.assertRaises(AssertionError):
+            thread_map(fail_on_first, [1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,16 @@
 import jsonschema
+import json
 import os
+import shutil
 import six
 import sys
+import tempfile
 import unittest
 
 from data_mine import Collection
 from data_mine.constants import PROJECT_ROOT
 from data_mine.zookeeper import load_datasets_config
+from data_mine.zookeeper.config.ops import clear_datasets_config_cache
 if sys.version_info >= (3, 3):
     from unittest.mock import mock_open, patch
 else:
@@ -16,6 +20,8 @@ else:
 class TestDatasetsConfiguration(unittest.TestCase):
 
     def setUp(self):
+        clear_datasets_config_cache()
+        self.addCleanup(clear_datasets_config_cache)
         self.collection = set([d.name for d in Collection])
         self.assertIsInstance(self.collection, set)
 
@@ -72,6 +78,33 @@ class TestDatasetsConfiguration(unittest.TestCase):
             mk.assert_any_call(os.path.join(PROJECT_ROOT, "zookeeper", "config", "config_schema.json"), "rt")  # noqa: E501
             self.assertEqual(mk.call_count, 2)
 
+    def test_config_is_memoized(self):
+        config = load_datasets_config()
+        with patch(self.OPEN_METHOD) as mock_open_method:
+            self.assertIs(load_datasets_config(), config)
+            self.assertIs(load_datasets_config(), config)
+            mock_open_method.assert_not_called()
+
+    def test_modified_config_is_reloaded(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        config_file = os.path.join(temp_dir, "config.json")
+        from data_mine.zookeeper.config.ops import CONFIG_FILE
+        shutil.copyfile(CONFIG_FILE, config_file)
+        with patch('data_mine.zookeeper.config.ops.CONFIG_FILE', config_file):  # noqa: E501
+            config = load_datasets_config()
+            self.assertIs(load_datasets_config(), config)
+            with open(config_file, "rt") as f:
+                obj = json.load(f)
+            obj = [entry for entry in obj if entry["dataset"] != "RACE"]
+            with open(config_file, "wt") as g:
+                json.dump(obj, g, indent=4)  # Changes the size (and mtime).
+            new_config = load_datasets_config()
+            self.assertIsNot(new_config, config)
+            self.assertIn("RACE", config)
+            self.assertNotIn("RACE", new_config)
+            self.assertEqual(len(new_config), len(config) - 1)
+
 
 if __name__ == '__main__':
     unittest.main()
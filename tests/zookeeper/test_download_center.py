@@ -4,12 +4,17 @@ import json
 import os
 import responses
 import sys
+import tarfile
+import threading
+import time
 import unittest
 import zipfile
 
 from data_mine import Collection
+from data_mine.constants import DATAMINE_CACHE_DIR_ENV_VAR
 from data_mine.utils import datamine_cache_dir
 from data_mine.zookeeper import download_dataset
+from data_mine.zookeeper import invalidate_ready_datasets
 from pyfakefs.fake_filesystem_unittest import TestCase
 if sys.version_info >= (3, 3):
     from unittest.mock import patch
@@ -21,6 +26,8 @@ class TestDownloadDatasetFn(TestCase):
 
     def setUp(self):
         self.setUpPyfakefs()
+        invalidate_ready_datasets()
+        self.addCleanup(invalidate_ready_datasets)
         self.FAKE_DATASET = Collection.RACE
         self.FAKE_URL_DATA1 = self.fake_url_data()
         self.FAKE_URL_DATA2 = b"This is a JSON file."
@@ -71,6 +78,59 @@ class TestDownloadDatasetFn(TestCase):
         mock_fn.assert_not_called()
         self.assertEqual(return_code, 1)
 
+    def test_passed_integrity_check_is_memoized(self):
+        calls = []
+
+        def fake_integrity_check(dataset_id):
+            calls.append(dataset_id)
+            return True
+
+        for _ in range(0, 3):
+            self.assertEqual(download_dataset(Collection.RACE, fake_integrity_check), 1)  # noqa: E501
+        self.assertEqual(calls, [Collection.RACE])
+
+        # Other datasets and other integrity checks are not affected.
+        self.assertEqual(download_dataset(Collection.CSQA, fake_integrity_check), 1)  # noqa: E501
+        self.assertEqual(calls, [Collection.RACE, Collection.CSQA])
+        self.assertEqual(download_dataset(Collection.RACE, lambda _: True), 1)  # noqa: E501
+
+        # The check runs again after an invalidation.
+        invalidate_ready_datasets(Collection.RACE)
+        download_dataset(Collection.RACE, fake_integrity_check)
+        download_dataset(Collection.CSQA, fake_integrity_check)
+        self.assertEqual(calls, [Collection.RACE, Collection.CSQA, Collection.RACE])  # noqa: E501
+        invalidate_ready_datasets()
+        download_dataset(Collection.CSQA, fake_integrity_check)
+        self.assertEqual(len(calls), 4)
+
+    def test_memoization_depends_on_cache_dir(self):
+        calls = []
+
+        def fake_integrity_check(dataset_id):
+            calls.append(dataset_id)
+            return True
+
+        download_dataset(Collection.RACE, fake_integrity_check)
+        other_cache_dir = {DATAMINE_CACHE_DIR_ENV_VAR: "/other/cache"}
+        with patch.dict(os.environ, other_cache_dir):
+            download_dataset(Collection.RACE, fake_integrity_check)
+        download_dataset(Collection.RACE, fake_integrity_check)
+        self.assertEqual(len(calls), 2)
+
+    @patch('data_mine.zookeeper.download_center.load_datasets_config')
+    def test_failed_integrity_check_is_not_memoized(self, mock_config):
+        mock_config.side_effect = RuntimeError("Download attempted.")
+        results = [False, True]
+
+        def fake_integrity_check(_):
+            return results.pop(0)
+
+        with self.assertRaises(RuntimeError):
+            download_dataset(Collection.RACE, fake_integrity_check)
+        self.assertEqual(download_dataset(Collection.RACE, fake_integrity_check), 1)  # noqa: E501
+        self.assertEqual(download_dataset(Collection.RACE, fake_integrity_check), 1)  # noqa: E501
+        self.assertEqual(len(results), 0)
+
     @responses.activate
     @patch('data_mine.zookeeper.download_center.load_datasets_config')
     def test_dataset_is_downloaded_if_missing(self, mock_config):
@@ -106,7 +166,122 @@ class TestDownloadDatasetFn(TestCase):
 
     @responses.activate
     @patch('data_mine.zookeeper.download_center.load_datasets_config')
-    def test_exception_raised_if_url_not_reachable(self, mock_config):
+    def test_requirements_are_downloaded_concurrently(self, mock_config):
+        mock_config.return_value = self.FAKE_CONFIG
+        data_dir = os.path.join(datamine_cache_dir(), self.FAKE_DATASET.name)
+        json_requested = threading.Event()
+
+        def send_archive(request):
+            # The JSON file (second requirement) must be requested before the
+            # archive (first requirement) is sent.
+            self.assertTrue(json_requested.wait(5))
+            return (200, {}, self.FAKE_URL_DATA1)
+
+        def send_json_after_unpacking(request):
+            # The archive is unpacked while the JSON file still downloads.
+            json_requested.set()
+            deadline = time.time() + 5
+            while not os.path.isfile(os.path.join(data_dir, "dir/3.txt")):
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.01)
+            return (200, {}, self.FAKE_URL_DATA2)
+
+        responses.add_callback(
+                responses.GET, "http://fake-website.com/my2/file.json",
+                callback=send_json_after_unpacking
+        )
+        responses.add_callback(
+                responses.GET, "http://fake-website.com/my/files.zip",
+                callback=send_archive
+        )
+        self.assertEqual(download_dataset(Collection.RACE, lambda _: False), 2)  # noqa: E501
+        self.assertEqual(
+                open(os.path.join(data_dir, "file.json"), "rt").read(),
+                "This is a JSON file."
+        )
+
+    @responses.activate
+    @patch('data_mine.zookeeper.download_center.load_datasets_config')
+    def test_tarballs_are_extracted_while_downloading(self, mock_config):
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz") as g:
+            info = tarfile.TarInfo("dir/question.txt")
+            info.size = len(b"Tarball question")
+            g.addfile(info, io.BytesIO(b"Tarball question"))
+        data = buf.getvalue()
+        mock_config.return_value = {
+            self.FAKE_DATASET.name: {
+                "requirements": [{
+                    "URL": "http://fake-website.com/RACE.tar.gz",
+                    "SHA256": self.bytes_sha256(data)
+                }]
+            }
+        }
+        responses.add(responses.GET, "http://fake-website.com/RACE.tar.gz",
+                      body=data, status=200,
+                      headers={'content-length': str(len(data))},
+                      stream=True)
+        data_dir = os.path.join(datamine_cache_dir(), self.FAKE_DATASET.name)
+        with patch('data_mine.zookeeper.download_center.extract_archive') as mock_extract:  # noqa: E501
+            return_code = download_dataset(
+                    Collection.RACE, lambda _: False, keep_archives=False
+            )
+        self.assertEqual(return_code, 2)
+        mock_extract.assert_not_called()
+        self.assertListEqual(os.listdir(data_dir), ["dir"])
+        self.assertEqual(
+                open(os.path.join(data_dir, "dir/question.txt"), "rt").read(),
+                "Tarball question"
+        )
+
+        # The archive is kept by default.
+        download_dataset(Collection.RACE, lambda _: False)
+        self.assertTrue(os.path.isfile(os.path.join(data_dir, "RACE.tar.gz")))
+
+    @responses.activate
+    @patch('data_mine.zookeeper.download_center.load_datasets_config')
+    def test_partial_tarballs_are_resumed(self, mock_config):
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz") as g:
+            contents = os.urandom(20000)  # Not compressible.
+            info = tarfile.TarInfo("dir/question.bin")
+            info.size = len(contents)
+            g.addfile(info, io.BytesIO(contents))
+        data = buf.getvalue()
+        mock_config.return_value = {
+            self.FAKE_DATASET.name: {
+                "requirements": [{
+                    "URL": "http://fake-website.com/RACE.tar.gz",
+                    "SHA256": self.bytes_sha256(data)
+                }]
+            }
+        }
+        data_dir = os.path.join(datamine_cache_dir(), self.FAKE_DATASET.name)
+        os.makedirs(data_dir, mode=0o755)
+        with open(os.path.join(data_dir, "RACE.tar.gz.part"), "wb") as g:
+            g.write(data[:5000])  # Left by an interrupted download.
+
+        def send_missing_data(request):
+            self.assertEqual(request.headers["Range"], "bytes=5000-")
+            return (206, {
+                "Content-Range": "bytes 5000-{}/{}".format(len(data) - 1, len(data)),  # noqa: E501
+                "Content-Length": str(len(data) - 5000)
+            }, data[5000:])
+
+        responses.add_callback(
+                responses.GET, "http://fake-website.com/RACE.tar.gz",
+                callback=send_missing_data
+        )
+        download_dataset(Collection.RACE, lambda _: False, keep_archives=False)  # noqa: E501
+        self.assertEqual(len(responses.calls), 1)
+        self.assertListEqual(os.listdir(data_dir), ["dir"])
+        with open(os.path.join(data_dir, "dir/question.bin"), "rb") as f:
+            self.assertEqual(f.read(), contents)
+
+    @responses.activate
+    @patch('data_mine.utils.requests_utils.time.sleep')
+    @patch('data_mine.zookeeper.download_center.load_datasets_config')
+    def test_exception_raised_if_url_not_reachable(self, mock_config, mock_sleep):  # noqa: E501
         # We also check that the dataset directory is not created if existing.
         os.makedirs(
                 os.path.join(datamine_cache_dir(), self.FAKE_DATASET.name),
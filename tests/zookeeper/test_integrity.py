@@ -1,5 +1,7 @@
 import gzip
+import json
 import os
+import sys
 import unittest
 
 from data_mine import Collection
@@ -7,8 +9,17 @@ from data_mine.constants import PROJECT_ROOT
 from data_mine.utils import datamine_cache_dir
 from data_mine.zookeeper import check_deep_integrity
 from data_mine.zookeeper import check_shallow_integrity
+from data_mine.zookeeper import deep_integrity_failures
 from data_mine.zookeeper import load_datasets_config
+from data_mine.zookeeper.integrity import INTEGRITY_FILE_MISSING
+from data_mine.zookeeper.integrity import INTEGRITY_SHA256_MISMATCH
+from data_mine.zookeeper.integrity_manifest import integrity_manifest_file
+from data_mine.zookeeper.integrity_manifest import load_integrity_manifest
 from pyfakefs.fake_filesystem_unittest import TestCase
+if sys.version_info >= (3, 3):
+    from unittest.mock import patch
+else:
+    from mock import patch
 
 
 class TestDatasetIntegrityCheckFunctions(TestCase):
@@ -174,6 +185,103 @@ class TestDatasetIntegrityCheckFunctions(TestCase):
         self.assertFalse(check_deep_integrity(self.FAKE_DATASET))
         self.assertTrue(check_shallow_integrity(self.FAKE_DATASET))
 
+    @patch('data_mine.zookeeper.integrity.file_sha256')
+    def test_deep_integrity_skips_unchanged_files(self, mock_sha256):
+        shas = {
+            "file1.txt": self.FILE1_SHA,
+            "file2.txt": self.FILE2_SHA,
+            "file3.txt": self.FILE3_SHA
+        }
+        mock_sha256.side_effect = lambda path: shas[os.path.basename(path)]
+        self.fake_expected_files_with_correct_sha256()
+        self.assertTrue(check_deep_integrity(self.FAKE_DATASET))
+        self.assertEqual(mock_sha256.call_count, 3)
+        manifest = load_integrity_manifest(self.FAKE_DATASET)
+        self.assertSetEqual(
+                set(manifest.keys()),
+                {"file1.txt", "file2.txt", "data/file3.txt"}
+        )
+        self.assertEqual(manifest["file1.txt"]["SHA256"], self.FILE1_SHA)
+
+        # Nothing changed so nothing is hashed.
+        mock_sha256.reset_mock()
+        self.assertTrue(check_deep_integrity(self.FAKE_DATASET))
+        mock_sha256.assert_not_called()
+
+        # Only the modified file is hashed.
+        dataset_dir = os.path.join(self.CACHE_DIR, self.FAKE_DATASET.name)
+        with open(os.path.join(dataset_dir, "file2.txt"), "at") as g:
+            g.write("1")
+            g.flush()
+        self.assertTrue(check_deep_integrity(self.FAKE_DATASET))
+        mock_sha256.assert_called_once_with(os.path.join(dataset_dir, "file2.txt"))  # noqa: E501
+
+        # Everything is hashed when forced.
+        mock_sha256.reset_mock()
+        self.assertTrue(check_deep_integrity(self.FAKE_DATASET, force=True))
+        self.assertEqual(mock_sha256.call_count, 3)
+
+    def test_deep_integrity_manifest_is_not_trusted_for_other_sha(self):
+        self.fake_expected_files_with_correct_sha256()
+        self.assertTrue(check_deep_integrity(self.FAKE_DATASET))
+        self.fake_expected_files_with_wrong_sha256()
+        self.assertFalse(check_deep_integrity(self.FAKE_DATASET))
+
+    def test_deep_integrity_with_corrupted_manifest(self):
+        self.fake_expected_files_with_correct_sha256()
+        with open(integrity_manifest_file(self.FAKE_DATASET), "wt") as g:
+            g.write("{not json")
+            g.flush()
+        self.assertTrue(check_deep_integrity(self.FAKE_DATASET))
+        with open(integrity_manifest_file(self.FAKE_DATASET), "rt") as f:
+            self.assertEqual(len(json.load(f)), 3)
+
+    def test_deep_integrity_failures(self):
+        self.fake_expected_files_with_correct_sha256()
+        for num_workers in [1, 2, 3, 16]:
+            self.assertListEqual(deep_integrity_failures(
+                self.FAKE_DATASET, force=True, num_workers=num_workers
+            ), [])
+
+        dataset_dir = os.path.join(self.CACHE_DIR, self.FAKE_DATASET.name)
+        os.remove(os.path.join(dataset_dir, "file2.txt"))
+        with open(os.path.join(dataset_dir, "data/file3.txt"), "at") as g:
+            g.write("!")
+            g.flush()
+        for num_workers in [1, 2, 3, 16]:
+            self.assertListEqual(deep_integrity_failures(
+                self.FAKE_DATASET, num_workers=num_workers
+            ), [
+                ("file2.txt", INTEGRITY_FILE_MISSING),
+                ("data/file3.txt", INTEGRITY_SHA256_MISMATCH)
+            ])
+
+    @patch('data_mine.zookeeper.integrity.file_sha256')
+    def test_deep_integrity_stops_early(self, mock_sha256):
+        mock_sha256.return_value = "d" * 64
+        self.fake_expected_files_with_correct_sha256()
+        failures = deep_integrity_failures(
+                self.FAKE_DATASET, num_workers=1, stop_early=True
+        )
+        self.assertListEqual(failures, [
+            ("file1.txt", INTEGRITY_SHA256_MISMATCH)
+        ])
+        mock_sha256.assert_called_once()
+
+        mock_sha256.reset_mock()
+        with patch('data_mine.zookeeper.integrity.msg') as mock_msg:
+            self.assertFalse(check_deep_integrity(self.FAKE_DATASET, num_workers=1))  # noqa: E501
+        mock_sha256.assert_called_once()
+        mock_msg.warning.assert_called_once()
+        self.assertIn("file1.txt", mock_msg.warning.call_args[0][0])
+
+    @patch('data_mine.zookeeper.integrity.file_sha256')
+    def test_deep_integrity_propagates_errors(self, mock_sha256):
+        mock_sha256.side_effect = IOError("Read error.")
+        self.fake_expected_files_with_correct_sha256()
+        with self.assertRaises(IOError):
+            check_deep_integrity(self.FAKE_DATASET, num_workers=2)
+
 
 if __name__ == '__main__':
     unittest.main()
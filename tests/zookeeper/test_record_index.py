@@ -0,0 +1,113 @@
+import os
+import sys
+import unittest
+
+from data_mine import Collection
+from data_mine.nlp.CSQA import CSQAType
+from data_mine.zookeeper.record_index import RecordIndex, index_jsonl_file
+from data_mine.zookeeper.record_index import load_record_index, lookup_records
+from data_mine.zookeeper.record_index import record_index_file
+from data_mine.zookeeper.split_cache import split_cache_dir
+from pyfakefs.fake_filesystem_unittest import TestCase
+if sys.version_info >= (3, 3):
+    from unittest.mock import MagicMock, patch
+else:
+    from mock import MagicMock, patch
+
+LINES = [
+    b'{"id": "q1", "text": "first"}\n',
+    b'\n',
+    b'{"id": "q2", "text": "second \\u2713"}\n',
+    b'{"id": "q3", "text": "third"}'
+]
+
+
+class TestRecordIndex(TestCase):
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        patcher = patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True)  # noqa: E501
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.makedirs("/data")
+        with open("/data/train.jsonl", "wb") as g:
+            g.write(b"".join(LINES))
+
+    def test_build_and_positions(self):
+        index = RecordIndex.build([("a", 0, 5), ("b", 5, 9), ("a", 9, 12)])
+        self.assertEqual(len(index), 3)
+        self.assertListEqual(index.positions("a"), [(0, 5), (9, 12)])
+        self.assertListEqual(index.positions("b"), [(5, 9)])
+        self.assertListEqual(index.positions("c"), [])
+
+    def test_save_and_load(self):
+        index = RecordIndex.build([("a", 0, 1), ("b", 1, 0)], names=["x", "y"])  # noqa: E501
+        index.save("/indexes/index.npz")
+        self.assertListEqual(os.listdir("/indexes"), ["index.npz"])
+        loaded = RecordIndex.load("/indexes/index.npz")
+        self.assertListEqual(loaded.names, ["x", "y"])
+        self.assertListEqual(loaded.positions("b"), [(1, 0)])
+        self.assertListEqual(RecordIndex.build([]).positions("a"), [])
+
+    def test_index_jsonl_file(self):
+        index = index_jsonl_file("/data/train.jsonl", lambda entry: entry["id"])  # noqa: E501
+        self.assertEqual(len(index), 3)
+        with open("/data/train.jsonl", "rb") as f:
+            contents = f.read()
+        for record_id, line in [("q1", LINES[0]), ("q2", LINES[2]), ("q3", LINES[3])]:  # noqa: E501
+            [(start, end)] = index.positions(record_id)
+            self.assertEqual(contents[start:end], line)
+
+    def test_lookup_records(self):
+        index = RecordIndex.build([("q1", 0, 0), ("q2", 1, 0)])
+        data = [[{"id": "q1"}], [{"id": "x"}, {"id": "q2", "v": 2}]]
+
+        def read(start, end):
+            return data[start]
+
+        records = lookup_records(index, ["q2", "q1", "q2"], read)
+        self.assertListEqual(records, [{"id": "q2", "v": 2}, {"id": "q1"}, {"id": "q2", "v": 2}])  # noqa: E501
+        self.assertListEqual(lookup_records(index, [], read), [])
+        with self.assertRaises(KeyError):
+            lookup_records(index, ["q3"], read)
+
+    @patch('data_mine.zookeeper.record_index.record_id_hash', return_value=7)
+    def test_hash_collisions(self, mock_hash):
+        index = RecordIndex.build([("q1", 0, 0), ("q2", 1, 0)])
+        self.assertListEqual(index.positions("q2"), [(0, 0), (1, 0)])
+        records = lookup_records(index, ["q2"], lambda start, end: [{"id": "q{}".format(start + 1)}])  # noqa: E501
+        self.assertListEqual(records, [{"id": "q2"}])
+        with self.assertRaises(KeyError):
+            lookup_records(index, ["q3"], lambda start, end: [{"id": "q1"}])
+
+    def test_load_record_index(self):
+        def build_index():
+            return index_jsonl_file("/data/train.jsonl", lambda entry: entry["id"])  # noqa: E501
+        build = MagicMock(side_effect=build_index)
+
+        index = load_record_index(Collection.CSQA, CSQAType.TRAIN, "/data/train.jsonl", build)  # noqa: E501
+        self.assertEqual(build.call_count, 1)
+        path = record_index_file(Collection.CSQA, CSQAType.TRAIN, "/data/train.jsonl")  # noqa: E501
+        self.assertTrue(path.startswith(split_cache_dir(Collection.CSQA)))
+        self.assertTrue(os.path.isfile(path))
+
+        # Served from memory, then from disk.
+        self.assertIs(load_record_index(Collection.CSQA, CSQAType.TRAIN, "/data/train.jsonl", build), index)  # noqa: E501
+        with patch.dict('data_mine.zookeeper.record_index._LOADED_INDEXES', clear=True):  # noqa: E501
+            loaded = load_record_index(Collection.CSQA, CSQAType.TRAIN, "/data/train.jsonl", build)  # noqa: E501
+            self.assertIsNot(loaded, index)
+            self.assertListEqual(loaded.positions("q3"), index.positions("q3"))  # noqa: E501
+        self.assertEqual(build.call_count, 1)
+
+        # New raw data, new index (the old one is removed).
+        with open("/data/train.jsonl", "ab") as g:
+            g.write(b'\n{"id": "q4", "text": "fourth"}\n')
+        index = load_record_index(Collection.CSQA, CSQAType.TRAIN, "/data/train.jsonl", build)  # noqa: E501
+        self.assertEqual(build.call_count, 2)
+        self.assertEqual(len(index), 4)
+        self.assertFalse(os.path.isfile(path))
+        self.assertEqual(len(os.listdir(split_cache_dir(Collection.CSQA))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
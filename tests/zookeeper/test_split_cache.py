@@ -0,0 +1,117 @@
+import json
+import os
+import pandas as pd
+import sys
+import unittest
+
+from data_mine import Collection
+from data_mine.nlp.CSQA import CSQAType
+from data_mine.utils import datamine_cache_dir
+from data_mine.zookeeper import clear_split_cache
+from data_mine.zookeeper import read_split_cache
+from data_mine.zookeeper import write_split_cache
+from data_mine.zookeeper.split_cache import split_cache_dir
+from data_mine.zookeeper.split_cache import split_cache_file
+from pyfakefs.fake_filesystem_unittest import TestCase
+if sys.version_info >= (3, 3):
+    from unittest.mock import patch
+else:
+    from mock import patch
+
+
+def fake_config(sha256):
+    return {
+        "CSQA": json.loads("""{{
+            "requirements": [
+                {{
+                    "URL": "http://fake-website.com/train.jsonl",
+                    "SHA256": "{}"
+                }}
+            ]
+        }}""".format(sha256))
+    }  # We use double braces so as to force `format` ignore them.
+
+
+class TestSplitCache(TestCase):
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        patcher = patch('data_mine.zookeeper.split_cache.load_datasets_config')
+        self.addCleanup(patcher.stop)
+        self.mock_config = patcher.start()
+        self.mock_config.return_value = fake_config("a" * 64)
+        self.df = pd.DataFrame([
+            {"id": "q1", "answers": ["a1", "a2"], "correct": "A"},
+            {"id": "q2", "answers": ["b1", "b2"], "correct": None},
+        ])
+
+    def test_missing_entry(self):
+        self.assertIsNone(read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1))
+
+    def test_write_then_read(self):
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, self.df)
+        df = read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1)
+        pd.testing.assert_frame_equal(df, self.df)
+        self.assertIsInstance(df.iloc[0]["answers"], list)
+        self.assertIsNone(read_split_cache(Collection.CSQA, CSQAType.DEV, 1))
+
+    def test_cache_lives_under_datamine_cache_dir(self):
+        path = split_cache_file(Collection.CSQA, CSQAType.TRAIN, 1)
+        self.assertTrue(path.startswith(datamine_cache_dir()))
+        self.assertEqual(os.path.dirname(path), split_cache_dir(Collection.CSQA))  # noqa: E501
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, self.df)
+        self.assertTrue(os.path.isfile(path))
+
+    def test_loader_version_invalidates_entry(self):
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, self.df)
+        self.assertIsNone(read_split_cache(Collection.CSQA, CSQAType.TRAIN, 2))
+
+        # The stale entry is removed when the new version is written.
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 2, self.df)
+        self.assertEqual(len(os.listdir(split_cache_dir(Collection.CSQA))), 1)
+        self.assertIsNone(read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1))
+
+    def test_config_sha256_invalidates_entry(self):
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, self.df)
+        self.mock_config.return_value = fake_config("b" * 64)
+        self.assertIsNone(read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1))
+
+    def test_variants_are_independent(self):
+        other_df = self.df.head(1)
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, self.df)
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, other_df,
+                          variant="other")
+        pd.testing.assert_frame_equal(
+                read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1),
+                self.df
+        )
+        pd.testing.assert_frame_equal(
+                read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1,
+                                 variant="other"),
+                other_df
+        )
+
+    def test_corrupted_entry_is_removed(self):
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, self.df)
+        path = split_cache_file(Collection.CSQA, CSQAType.TRAIN, 1)
+        with open(path, "wb") as g:
+            g.write(b"definitely not a pickle")
+        with patch('data_mine.zookeeper.split_cache.msg') as mock_msg:
+            self.assertIsNone(read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1))  # noqa: E501
+        mock_msg.warning.assert_called_once()
+        self.assertFalse(os.path.isfile(path))
+
+    def test_clear_split_cache(self):
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, self.df)
+        clear_split_cache(Collection.RACE)
+        self.assertIsNotNone(read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1))  # noqa: E501
+        clear_split_cache(Collection.CSQA)
+        self.assertIsNone(read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1))
+
+        write_split_cache(Collection.CSQA, CSQAType.TRAIN, 1, self.df)
+        clear_split_cache()
+        self.assertIsNone(read_split_cache(Collection.CSQA, CSQAType.TRAIN, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()